@@ -0,0 +1,162 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Binary representations of request bodies.
+
+Bodies sent as ``application/msgpack`` or ``application/cbor`` are
+decoded into the same structure as JSON bodies. Libraries backing
+the codecs are optional, content type is supported only if its library
+is installed.
+"""
+
+from oslo_log import log
+from oslo_utils import importutils
+import six
+
+LOG = log.getLogger(__name__)
+
+MSGPACK_CONTENT_TYPE = 'application/msgpack'
+CBOR_CONTENT_TYPE = 'application/cbor'
+
+_CODECS = {}
+
+
+class BinaryCodec(object):
+    """Decodes and encodes documents in binary format.
+
+    Decoding errors are reported with :py:exc:`ValueError`
+    regardless of the library.
+
+    :param library: module of the library backing the codec
+    """
+
+    content_type = None
+
+    def __init__(self, library):
+        self._library = library
+
+    def loads(self, data):
+        """Decodes document.
+
+        :param bytes data: encoded document
+        :return: decoded document
+        """
+        try:
+            return self._loads(data)
+        except Exception as ex:
+            raise ValueError('Request body is not valid %s: %s'
+                             % (self.content_type, ex))
+
+    def dumps(self, obj):
+        """Encodes object.
+
+        :param obj: object to encode
+        :rtype: bytes
+        """
+        raise NotImplementedError()
+
+    def _loads(self, data):
+        raise NotImplementedError()
+
+
+class MsgpackCodec(BinaryCodec):
+    content_type = MSGPACK_CONTENT_TYPE
+
+    def _loads(self, data):
+        return self._library.unpackb(data, raw=False)
+
+    def dumps(self, obj):
+        return self._library.packb(obj, use_bin_type=True)
+
+
+class CborCodec(BinaryCodec):
+    content_type = CBOR_CONTENT_TYPE
+
+    def _loads(self, data):
+        return self._library.loads(data)
+
+    def dumps(self, obj):
+        return self._library.dumps(obj)
+
+
+_LIBRARIES = {
+    MSGPACK_CONTENT_TYPE: ('msgpack', MsgpackCodec),
+    CBOR_CONTENT_TYPE: ('cbor2', CborCodec),
+}
+
+CONTENT_TYPES = tuple(sorted(_LIBRARIES))
+
+
+def get_codec(content_type):
+    """Returns codec of binary content type.
+
+    :param str content_type: content type of request body
+    :return: codec or None if content type is not binary or its library
+             is not installed
+    :rtype: BinaryCodec
+    """
+    if content_type not in _LIBRARIES:
+        return None
+    try:
+        return _CODECS[content_type]
+    except KeyError:
+        pass
+    library_name, codec_class = _LIBRARIES[content_type]
+    library = importutils.try_import(library_name)
+    if library is None:
+        LOG.warning('%s is not installed, %s bodies are not accepted',
+                    library_name, content_type)
+        codec = None
+    else:
+        codec = codec_class(library)
+    _CODECS[content_type] = codec
+    return codec
+
+
+def supported_content_types():
+    """Returns binary content types whose libraries are installed.
+
+    :rtype: tuple
+    """
+    return tuple(content_type for content_type in CONTENT_TYPES
+                 if get_codec(content_type) is not None)
+
+
+def find_bytes(obj):
+    """Finds byte string within decoded document.
+
+    Byte strings (msgpack bin and CBOR byte string) have no JSON
+    representation, events holding them can be forwarded only in the
+    format they were received in.
+
+    :param obj: decoded document
+    :return: path to the first byte string (member or its name) or None
+             if there is none
+    :rtype: list
+    """
+    if isinstance(obj, six.binary_type):
+        return []
+    if isinstance(obj, dict):
+        items = six.iteritems(obj)
+    elif isinstance(obj, list):
+        items = enumerate(obj)
+    else:
+        return None
+    for key, value in items:
+        if isinstance(key, six.binary_type):
+            return [key]
+        path = find_bytes(value)
+        if path is not None:
+            return [key] + path
+    return None
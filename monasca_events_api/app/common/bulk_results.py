@@ -0,0 +1,104 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Outcome of each event of the bulk.
+
+Events are accepted unless they are rejected (i.e. they are malformed
+and resending them does not help) or fail to be published (they can
+be resent).
+"""
+
+ACCEPTED = 'accepted'
+REJECTED = 'rejected'
+FAILED = 'failed'
+
+
+class BulkResults(object):
+    """Collects outcome of events identified by index within the bulk."""
+
+    def __init__(self):
+        self._outcomes = {}
+
+    def reject(self, index, reason):
+        """Marks event as rejected.
+
+        :param int index: index of the event
+        :param str reason: why event has been rejected
+        """
+        self._outcomes[index] = (REJECTED, reason)
+
+    def fail(self, indexes, reason):
+        """Marks events as failed to be published.
+
+        :param list indexes: indexes of the events
+        :param str reason: why events have not been published
+        """
+        for index in indexes:
+            self._outcomes.setdefault(index, (FAILED, reason))
+
+    def status(self, index):
+        """Returns status of the event, one of ``ACCEPTED``, ``REJECTED``
+        or ``FAILED``."""
+        return self._outcomes.get(index, (ACCEPTED,))[0]
+
+    def shifted(self, offset):
+        """Returns view of results with indexes starting at offset.
+
+        Allows part of the bulk to be processed as if it was a bulk
+        on its own.
+
+        :param int offset: index of the first event of the part
+        """
+        return _ShiftedResults(self, offset)
+
+    def to_dict(self, size):
+        """Returns results of the bulk as response body.
+
+        :param int size: number of events in the bulk
+        :return: dict with number of events of each status and list
+                 with status (and reason) of each event
+        :rtype: dict
+        """
+        counts = {ACCEPTED: 0, REJECTED: 0, FAILED: 0}
+        results = []
+        for index in range(size):
+            outcome = self._outcomes.get(index)
+            if outcome is None:
+                counts[ACCEPTED] += 1
+                results.append({'status': ACCEPTED})
+            else:
+                counts[outcome[0]] += 1
+                results.append({'status': outcome[0], 'reason': outcome[1]})
+        counts['results'] = results
+        return counts
+
+
+class _ShiftedResults(object):
+
+    def __init__(self, results, offset):
+        self._results = results
+        self._offset = offset
+
+    def reject(self, index, reason):
+        self._results.reject(index + self._offset, reason)
+
+    def fail(self, indexes, reason):
+        self._results.fail([index + self._offset for index in indexes],
+                           reason)
+
+    def status(self, index):
+        return self._results.status(index + self._offset)
+
+    def shifted(self, offset):
+        return _ShiftedResults(self._results, self._offset + offset)
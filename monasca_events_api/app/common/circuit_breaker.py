@@ -0,0 +1,200 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import math
+import threading
+import time
+
+from oslo_log import log
+
+from monasca_events_api import conf
+
+LOG = log.getLogger(__name__)
+CONF = conf.CONF
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+_BREAKER = None
+_BREAKER_LOCK = threading.Lock()
+
+
+class CircuitOpenException(Exception):
+    """Call has been rejected without being attempted.
+
+    :param int retry_after: seconds after which the call may succeed
+    """
+
+    def __init__(self, retry_after):
+        super(CircuitOpenException, self).__init__(
+            'Kafka is unavailable, publishing is suspended '
+            'for %d seconds' % retry_after)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker(object):
+    """Stops calling a dependency that keeps failing.
+
+    Outcomes of the recent calls are kept in a window of fixed size.
+    Call fails if it raises or takes longer than slow_call_duration.
+    Once failure rate within the window reaches failure_rate (and the
+    window holds at least min_calls), breaker opens and rejects all calls
+    with :py:exc:`CircuitOpenException`. After open_duration breaker lets
+    a single call through (half-open state). If it succeeds, breaker
+    closes. Otherwise it opens again for twice as long, up to
+    max_open_duration.
+
+    :param int window_size: number of recent calls failure rate is
+                            computed from
+    :param int min_calls: minimal number of calls in the window
+                          to evaluate failure rate
+    :param float failure_rate: failure rate (0-1) opening the breaker
+    :param float slow_call_duration: calls taking longer (in seconds)
+                                     are counted as failed
+    :param float open_duration: how long (in seconds) breaker stays open
+                                after it opened for the first time
+    :param float max_open_duration: upper limit of open state duration
+    """
+
+    def __init__(self, window_size, min_calls, failure_rate,
+                 slow_call_duration, open_duration, max_open_duration):
+        self._min_calls = min_calls
+        self._failure_rate = failure_rate
+        self._slow_call_duration = slow_call_duration
+        self._open_duration = open_duration
+        self._max_open_duration = max_open_duration
+
+        self._lock = threading.Lock()
+        self._outcomes = collections.deque(maxlen=window_size)
+        self._failures = 0
+        self._state = STATE_CLOSED
+        self._opened_at = 0
+        self._current_open_duration = open_duration
+        self._probing = False
+
+    @property
+    def state(self):
+        """Current state, one of ``STATE_*`` constants."""
+        with self._lock:
+            if self._state == STATE_OPEN and not self._remaining():
+                return STATE_HALF_OPEN
+            return self._state
+
+    @property
+    def retry_after(self):
+        """Seconds until breaker lets a call through, 0 if not open."""
+        with self._lock:
+            if self._state != STATE_OPEN:
+                return 0
+            return int(math.ceil(self._remaining()))
+
+    def call(self, func, *args, **kwargs):
+        """Calls func unless breaker is open.
+
+        :exception: :py:exc:`CircuitOpenException` if call has been
+                    rejected, any exception raised by func
+        """
+        self._before_call()
+        started = time.time()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self._record(failed=True)
+            raise
+        self._record(failed=time.time() - started > self._slow_call_duration)
+        return result
+
+    def _before_call(self):
+        with self._lock:
+            if self._state == STATE_CLOSED:
+                return
+            remaining = self._remaining()
+            if remaining or self._probing:
+                raise CircuitOpenException(
+                    max(1, int(math.ceil(remaining))))
+            # first call after open state elapsed probes the dependency
+            self._state = STATE_HALF_OPEN
+            self._probing = True
+
+    def _record(self, failed):
+        with self._lock:
+            if self._state == STATE_HALF_OPEN:
+                self._probing = False
+                if failed:
+                    self._open(min(self._current_open_duration * 2,
+                                   self._max_open_duration))
+                else:
+                    LOG.info('Circuit breaker closed')
+                    self._state = STATE_CLOSED
+                    self._current_open_duration = self._open_duration
+                return
+            if self._state != STATE_CLOSED:
+                return
+
+            if len(self._outcomes) == self._outcomes.maxlen:
+                self._failures -= self._outcomes[0]
+            self._outcomes.append(failed)
+            self._failures += failed
+            calls = len(self._outcomes)
+            if (calls >= self._min_calls and
+                    self._failures >= self._failure_rate * calls):
+                self._open(self._open_duration)
+
+    def _open(self, duration):
+        LOG.warning('Circuit breaker opened for %.1f seconds', duration)
+        self._state = STATE_OPEN
+        self._opened_at = time.time()
+        self._current_open_duration = duration
+        self._outcomes.clear()
+        self._failures = 0
+
+    def _remaining(self):
+        return max(0, self._opened_at + self._current_open_duration -
+                   time.time())
+
+
+def get_breaker():
+    """Returns breaker guarding kafka publishing in this process.
+
+    Breaker is configured in ``[circuit_breaker]`` group.
+
+    :return: breaker or None if ``[circuit_breaker]enabled`` is not set
+    :rtype: CircuitBreaker
+    """
+    global _BREAKER
+    if not CONF.circuit_breaker.enabled:
+        return None
+    if _BREAKER is None:
+        with _BREAKER_LOCK:
+            if _BREAKER is None:
+                _BREAKER = CircuitBreaker(
+                    window_size=CONF.circuit_breaker.window_size,
+                    min_calls=CONF.circuit_breaker.min_calls,
+                    failure_rate=CONF.circuit_breaker.failure_rate,
+                    slow_call_duration=(
+                        CONF.circuit_breaker.slow_call_duration),
+                    open_duration=CONF.circuit_breaker.open_duration,
+                    max_open_duration=(
+                        CONF.circuit_breaker.max_open_duration))
+    return _BREAKER
+
+
+def reset_breaker():
+    """Drops breaker of this process, next :py:func:`get_breaker`
+    creates a new one."""
+    global _BREAKER
+    with _BREAKER_LOCK:
+        _BREAKER = None
@@ -0,0 +1,114 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+import time
+
+
+class _Batch(object):
+    """Messages of concurrent requests published together."""
+
+    def __init__(self):
+        self.messages = []
+        self.size = 0
+        self.closed = False
+        self.published = threading.Event()
+        self.error = None
+
+
+class Coalescer(object):
+    """Merges messages of concurrent requests into larger batches.
+
+    Request that finds no open batch opens one and becomes its leader.
+    Requests arriving within linger append their messages to the batch.
+    Leader publishes the batch once linger elapses or the batch reaches
+    max_bytes. Every request waits until the batch holding its messages
+    has been published and fails if the batch failed.
+
+    Only messages sharing partition key, acknowledgement level and
+    topics are merged.
+
+    :param callable publish_func: function publishing batch, accepts
+                                  messages, key, acks and topics
+    :param float linger: how long (in seconds) batch waits for messages
+                         of other requests
+    :param int max_bytes: size of the batch that is published without
+                          waiting for linger to elapse
+    :param int overhead: size accounted for each message on top of its
+                         length
+    """
+
+    def __init__(self, publish_func, linger, max_bytes, overhead=0):
+        self._publish_func = publish_func
+        self._linger = linger
+        self._max_bytes = max_bytes
+        self._overhead = overhead
+        self._cond = threading.Condition()
+        self._open = {}
+
+    def submit(self, messages, key=None, acks=None, topics=None):
+        """Publishes messages together with those of other requests.
+
+        Blocks until messages are published.
+
+        :param list messages: list of serialized messages
+        :param str key: partition key of messages
+        :param str acks: requested acknowledgement level
+        :param tuple topics: topics to publish to, all if None
+        :exception: any exception raised by publish_func
+        """
+        size = sum(len(message) for message in messages)
+        size += self._overhead * len(messages)
+        group = (key, acks, topics)
+
+        with self._cond:
+            batch = self._open.get(group)
+            if batch is not None and batch.size + size > self._max_bytes:
+                self._close(group, batch)
+                batch = None
+            leader = batch is None
+            if leader:
+                batch = self._open[group] = _Batch()
+            batch.messages.extend(messages)
+            batch.size += size
+            if batch.size >= self._max_bytes:
+                self._close(group, batch)
+
+            if leader:
+                deadline = time.time() + self._linger
+                while not batch.closed:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self._close(group, batch)
+                        break
+                    self._cond.wait(remaining)
+
+        if leader:
+            try:
+                self._publish_func(batch.messages, key, acks, topics)
+            except Exception as ex:
+                batch.error = ex
+                raise
+            finally:
+                batch.published.set()
+        else:
+            batch.published.wait()
+            if batch.error is not None:
+                raise batch.error
+
+    def _close(self, group, batch):
+        batch.closed = True
+        if self._open.get(group) is batch:
+            del self._open[group]
+        self._cond.notify_all()
@@ -0,0 +1,278 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Decompresses request bodies sent with ``Content-Encoding``.
+
+Body is decompressed while it is being read, compressed body is never
+held in memory as a whole. Output of every step is bounded, so a small
+body expanding to gigabytes (zip bomb) is rejected as soon as it
+exceeds the limit instead of being inflated first.
+"""
+
+import zlib
+
+from oslo_utils import importutils
+
+from monasca_events_api.app.common import metrics
+
+zstandard = importutils.try_import('zstandard')
+
+IDENTITY = 'identity'
+GZIP = 'gzip'
+DEFLATE = 'deflate'
+ZSTD = 'zstd'
+
+COMPRESSED_BYTES = 'compressed_bytes'
+DECOMPRESSED_BYTES = 'decompressed_bytes'
+REJECTED = 'decompression_rejected'
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class DecompressionError(ValueError):
+    """Body is not valid for its content encoding."""
+
+
+class DecompressedBodyTooLarge(Exception):
+    """Decompressed body exceeds allowed size.
+
+    :param int max_size: allowed size of decompressed body
+    """
+
+    def __init__(self, max_size):
+        super(DecompressedBodyTooLarge, self).__init__(
+            'Decompressed request body exceeds %d bytes' % max_size)
+        self.max_size = max_size
+
+
+def supported_encodings():
+    """Returns content encodings bodies can be decompressed from.
+
+    ``zstd`` is supported only if zstandard library is installed.
+
+    :rtype: tuple
+    """
+    if zstandard is None:
+        return IDENTITY, GZIP, DEFLATE
+    return IDENTITY, GZIP, DEFLATE, ZSTD
+
+
+def normalize_encoding(encoding):
+    """Returns lowercase encoding, None for identity or missing one."""
+    if encoding:
+        encoding = encoding.strip().lower()
+    if not encoding or encoding == IDENTITY:
+        return None
+    return encoding
+
+
+def open_stream(stream, encoding, max_size, chunk_size=_CHUNK_SIZE):
+    """Wraps stream of the request body so it is decompressed on read.
+
+    :param stream: file-like object holding the body
+    :param str encoding: value of ``Content-Encoding`` header
+    :param int max_size: limit of decompressed body size
+    :param int chunk_size: size of compressed chunks read from stream
+    :return: stream itself if body is not compressed, otherwise
+             file-like object decompressing it
+    :exception: :py:exc:`ValueError` if encoding is not supported
+    """
+    encoding = normalize_encoding(encoding)
+    if encoding is None:
+        return stream
+    if encoding not in supported_encodings():
+        raise ValueError('Content encoding %s is not supported' % encoding)
+    return DecompressingStream(stream, encoding, max_size, chunk_size)
+
+
+class DecompressingStream(object):
+    """File-like object decompressing body read from another one.
+
+    Compressed and decompressed sizes are counted in metrics
+    (``compressed_bytes`` and ``decompressed_bytes`` labelled with the
+    encoding) once the body has been read, see
+    :py:func:`compression_ratios`.
+
+    :param stream: file-like object holding the compressed body
+    :param str encoding: ``gzip``, ``deflate`` or ``zstd``
+    :param int max_size: limit of decompressed body size
+    :param int chunk_size: size of compressed chunks read from stream
+    """
+
+    def __init__(self, stream, encoding, max_size, chunk_size=_CHUNK_SIZE):
+        self._source = _CountingReader(stream)
+        self._encoding = encoding
+        self._max_size = max_size
+        self._chunk_size = chunk_size
+        self._decompressed = 0
+        self._eof = False
+        if encoding == ZSTD:
+            self._reader = _ZstdReader(self._source, chunk_size)
+        else:
+            self._reader = _ZlibReader(self._source, encoding, chunk_size)
+
+    @property
+    def encoding(self):
+        return self._encoding
+
+    def read(self, size=-1):
+        """Reads up to size bytes of decompressed body.
+
+        :param int size: maximal number of bytes, negative reads all
+        :return: decompressed data, empty at the end of the body
+        :rtype: bytes
+        :exception: :py:exc:`DecompressionError` if body is corrupted,
+                    :py:exc:`DecompressedBodyTooLarge` if body exceeds
+                    max_size
+        """
+        if size is None or size < 0:
+            parts = []
+            while True:
+                part = self.read(self._chunk_size)
+                if not part:
+                    return b''.join(parts)
+                parts.append(part)
+        if self._eof or not size:
+            return b''
+
+        # one byte over the limit is enough to reject the body
+        data = self._reader.read(
+            min(size, self._max_size - self._decompressed + 1))
+        if not data:
+            self._eof = True
+            metrics.increment(COMPRESSED_BYTES, self._encoding,
+                              self._source.size)
+            metrics.increment(DECOMPRESSED_BYTES, self._encoding,
+                              self._decompressed)
+            return data
+
+        self._decompressed += len(data)
+        if self._decompressed > self._max_size:
+            self._eof = True
+            metrics.increment(REJECTED, self._encoding)
+            raise DecompressedBodyTooLarge(self._max_size)
+        return data
+
+
+class _CountingReader(object):
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self.size += len(data)
+        return data
+
+
+class _ZlibReader(object):
+    """Inflates gzip (possibly multi-member) or deflate data.
+
+    ``deflate`` is supposed to be zlib wrapped, but some clients send
+    raw deflate data, format is recognized by the zlib header.
+    """
+
+    def __init__(self, source, encoding, chunk_size):
+        self._source = source
+        self._encoding = encoding
+        self._chunk_size = chunk_size
+        self._decompressor = None
+        self._pending = b''
+        self._members = 0
+
+    def read(self, limit):
+        while True:
+            if not self._pending:
+                self._pending = self._source.read(self._chunk_size)
+                if not self._pending:
+                    self._finish()
+                    return b''
+            if self._decompressor is None:
+                self._start()
+            decompressor = self._decompressor
+            try:
+                data = decompressor.decompress(self._pending, limit)
+            except zlib.error as ex:
+                raise DecompressionError('Cannot decompress request '
+                                         'body: %s' % ex)
+            self._pending = decompressor.unconsumed_tail
+            if _is_finished(decompressor):
+                self._pending = decompressor.unused_data
+                self._decompressor = None
+            if data:
+                return data
+
+    def _start(self):
+        if self._members and self._encoding != GZIP:
+            raise DecompressionError('Unexpected data after the end of '
+                                     'compressed request body')
+        self._members += 1
+        if self._encoding == GZIP:
+            wbits = 16 + zlib.MAX_WBITS
+        elif _is_zlib_header(self._pending):
+            wbits = zlib.MAX_WBITS
+        else:
+            wbits = -zlib.MAX_WBITS
+        self._decompressor = zlib.decompressobj(wbits)
+
+    def _finish(self):
+        truncated = (self._decompressor is not None and
+                     _is_finished(self._decompressor) is False)
+        if truncated or not self._members:
+            raise DecompressionError('Compressed request body is '
+                                     'truncated')
+
+
+def _is_finished(decompressor):
+    # python 2 does not tell if the stream is complete, only if there is
+    # data after its end, truncated stream cannot be recognized there
+    eof = getattr(decompressor, 'eof', None)
+    if eof is None:
+        return True if decompressor.unused_data else None
+    return eof
+
+
+def _is_zlib_header(data):
+    header = bytearray(data[:2])
+    return (len(header) == 2 and header[0] & 0x0f == 8 and
+            (header[0] << 8 | header[1]) % 31 == 0)
+
+
+class _ZstdReader(object):
+    """Inflates zstd frames, possibly concatenated."""
+
+    def __init__(self, source, chunk_size):
+        self._reader = zstandard.ZstdDecompressor().stream_reader(
+            source, read_size=chunk_size, read_across_frames=True)
+
+    def read(self, limit):
+        try:
+            return self._reader.read(limit)
+        except zstandard.ZstdError as ex:
+            raise DecompressionError('Cannot decompress request body: '
+                                     '%s' % ex)
+
+
+def compression_ratios():
+    """Returns ratio of decompressed to compressed bytes per encoding.
+
+    :return: dict mapping encoding to ratio
+    :rtype: dict
+    """
+    counters = metrics.snapshot()
+    compressed = counters.get(COMPRESSED_BYTES, {})
+    decompressed = counters.get(DECOMPRESSED_BYTES, {})
+    return {encoding: round(float(decompressed.get(encoding, 0)) / size, 2)
+            for encoding, size in compressed.items() if size}
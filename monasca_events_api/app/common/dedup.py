@@ -0,0 +1,322 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Suppression of events that have already been published.
+
+Agents retry whole bulks after timeouts, so the same event may be
+received several times. Each event is identified by digest of its
+``message_id`` or, if it has none, of the event itself. Digests of
+published events are remembered for a while and events with known
+digests are dropped.
+"""
+
+import collections
+import contextlib
+import fcntl
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+from oslo_log import log
+import six
+
+from monasca_events_api.app.common import metrics
+from monasca_events_api import conf
+
+LOG = log.getLogger(__name__)
+CONF = conf.CONF
+
+MESSAGE_ID_FIELD = 'message_id'
+
+_SLOT = struct.Struct('<Q')
+"""Header of shared filter: number of ttl long time slot it was rotated in"""
+_HASHES = struct.Struct('<QQ')
+
+_DEDUPLICATOR = None
+_DEDUPLICATOR_LOCK = threading.Lock()
+
+
+def event_key(envelope, event):
+    """Computes digest identifying the event.
+
+    Event is identified by its ``message_id``. Event without it is
+    identified by its content. Decoded event is serialized with sorted
+    keys first, so order of its members does not matter. Event received
+    in pass-through mode (bytes) is not decoded, it is identified by its
+    exact bytes.
+
+    :param envelope: envelope event has been received in
+    :type envelope: monasca_events_api.app.model.envelope.Envelope
+    :param event: event (dict) or serialized event (bytes)
+    :return: digest of the event
+    :rtype: bytes
+    """
+    received = envelope.event if envelope is not None else None
+    message_id = (received.get(MESSAGE_ID_FIELD)
+                  if isinstance(received, dict) else None)
+    digest = hashlib.sha1()
+    if message_id is not None:
+        digest.update(b'id:')
+        digest.update(six.text_type(message_id).encode('utf-8'))
+    elif isinstance(event, bytes):
+        digest.update(b'raw:')
+        digest.update(event)
+    else:
+        if not isinstance(event, dict):
+            event = dict(event)
+        digest.update(b'event:')
+        digest.update(json.dumps(event, sort_keys=True,
+                                 separators=(',', ':')).encode('utf-8'))
+    return digest.digest()
+
+
+class TTLCache(object):
+    """Set of keys forgetting them after ttl.
+
+    Number of keys is bounded, once it is reached the least recently
+    seen keys are forgotten first.
+
+    :param int max_entries: maximum number of keys
+    :param float ttl: how long (in seconds) keys are kept
+    """
+
+    def __init__(self, max_entries, ttl):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+
+    def __contains__(self, key):
+        with self._lock:
+            expires = self._entries.pop(key, None)
+            if expires is None or expires <= time.time():
+                return False
+            # reinserted key becomes the most recently seen one
+            self._entries[key] = expires
+            return True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, keys):
+        """Adds keys, renewing ttl of those already kept.
+
+        :param list keys: keys to add
+        """
+        expires = time.time() + self._ttl
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._entries[key] = expires
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+class SharedBloomFilter(object):
+    """Bloom filter mapped into memory of all processes using the file.
+
+    Filter is made of two generations. Keys are added to the current
+    one and looked up in both. Once ttl elapses, the older generation
+    is cleared and becomes the current one, so keys are kept for at
+    least ttl and at most twice as long.
+
+    Processes do not lock each other while setting bits. Bits set
+    concurrently within the same byte may be lost, which only makes
+    filter forget a key. Generations are rotated under file lock.
+
+    :param str path: file holding the filter, created if missing
+    :param int capacity: number of keys added within ttl the filter
+                         is sized for
+    :param float false_positive_rate: probability that key that has
+                                      not been added is found
+    :param float ttl: how long (in seconds) keys are kept at least
+    """
+
+    def __init__(self, path, capacity, false_positive_rate, ttl):
+        self._ttl = ttl
+        self._bits = int(math.ceil(-capacity * math.log(false_positive_rate) /
+                                   math.log(2) ** 2))
+        self._hashes = max(1, int(round(self._bits / float(capacity) *
+                                        math.log(2))))
+        self._generation_size = (self._bits + 7) // 8
+        size = _SLOT.size + 2 * self._generation_size
+
+        self._lock = threading.Lock()
+        self._slot = None
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            with self._file_lock():
+                if os.fstat(self._fd).st_size != size:
+                    LOG.info('Creating shared dedup filter %s of %d bytes',
+                             path, size)
+                    os.ftruncate(self._fd, 0)
+                    os.ftruncate(self._fd, size)
+            self._mmap = mmap.mmap(self._fd, size)
+        except Exception:
+            os.close(self._fd)
+            raise
+
+    def __contains__(self, key):
+        current = self._rotate()
+        offsets = self._offsets(key)
+        return (self._has_bits(current, offsets) or
+                self._has_bits(1 - current, offsets))
+
+    def add(self, keys):
+        """Adds keys to the current generation.
+
+        :param list keys: keys (bytes, at least 16 long) to add
+        """
+        base = _SLOT.size + self._rotate() * self._generation_size
+        mm = self._mmap
+        for key in keys:
+            for offset in self._offsets(key):
+                index = base + (offset >> 3)
+                mm[index:index + 1] = six.int2byte(
+                    six.indexbytes(mm, index) | 1 << (offset & 7))
+
+    def close(self):
+        self._mmap.close()
+        os.close(self._fd)
+
+    def _offsets(self, key):
+        first, second = _HASHES.unpack_from(key)
+        return [(first + i * second) % self._bits
+                for i in range(self._hashes)]
+
+    def _has_bits(self, generation, offsets):
+        base = _SLOT.size + generation * self._generation_size
+        mm = self._mmap
+        for offset in offsets:
+            byte = six.indexbytes(mm, base + (offset >> 3))
+            if not byte & 1 << (offset & 7):
+                return False
+        return True
+
+    def _rotate(self):
+        slot = int(time.time() // self._ttl)
+        if slot != self._slot:
+            with self._lock, self._file_lock():
+                stored = _SLOT.unpack_from(self._mmap)[0]
+                if slot > stored:
+                    stale = [slot % 2] if slot - stored == 1 else [0, 1]
+                    for generation in stale:
+                        start = _SLOT.size + generation * self._generation_size
+                        self._mmap[start:start + self._generation_size] = (
+                            b'\0' * self._generation_size)
+                    _SLOT.pack_into(self._mmap, 0, slot)
+                self._slot = slot
+        return slot % 2
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class Deduplicator(object):
+    """Finds events that have already been published.
+
+    Digests are looked up in the cache of the worker and, if configured,
+    in the filter shared by all workers of the node. Lookups are counted
+    in ``dedup`` counter of :py:mod:`monasca_events_api.app.common.metrics`
+    as ``hit`` or ``miss``.
+
+    :param TTLCache cache: cache of the worker
+    :param SharedBloomFilter shared: filter shared by workers
+    """
+
+    def __init__(self, cache, shared=None):
+        self._cache = cache
+        self._shared = shared
+
+    def find_duplicates(self, keys):
+        """Finds keys that have been published or repeat within keys.
+
+        :param list keys: digests of events, see :py:func:`event_key`
+        :return: indexes of duplicated keys
+        :rtype: set
+        """
+        duplicates = set()
+        unique = set()
+        for index, key in enumerate(keys):
+            if key in unique or key in self._cache or (
+                    self._shared is not None and key in self._shared):
+                duplicates.add(index)
+            else:
+                unique.add(key)
+        if duplicates:
+            metrics.increment('dedup', 'hit', len(duplicates))
+        if unique:
+            metrics.increment('dedup', 'miss', len(unique))
+        return duplicates
+
+    def add(self, keys):
+        """Remembers keys of published events.
+
+        :param list keys: digests of events, see :py:func:`event_key`
+        """
+        self._cache.add(keys)
+        if self._shared is not None:
+            self._shared.add(keys)
+
+    def close(self):
+        if self._shared is not None:
+            self._shared.close()
+
+
+def get_deduplicator():
+    """Returns deduplicator of this process.
+
+    Deduplicator is configured in ``[dedup]`` group.
+
+    :return: deduplicator or None if ``[dedup]enabled`` is not set
+    :rtype: Deduplicator
+    """
+    global _DEDUPLICATOR
+    if not CONF.dedup.enabled:
+        return None
+    if _DEDUPLICATOR is None:
+        with _DEDUPLICATOR_LOCK:
+            if _DEDUPLICATOR is None:
+                shared = None
+                if CONF.dedup.shared_path:
+                    shared = SharedBloomFilter(
+                        path=CONF.dedup.shared_path,
+                        capacity=CONF.dedup.shared_capacity,
+                        false_positive_rate=(
+                            CONF.dedup.shared_false_positive_rate),
+                        ttl=CONF.dedup.ttl)
+                _DEDUPLICATOR = Deduplicator(
+                    TTLCache(CONF.dedup.max_entries, CONF.dedup.ttl),
+                    shared)
+    return _DEDUPLICATOR
+
+
+def reset_deduplicator():
+    """Drops deduplicator of this process, next
+    :py:func:`get_deduplicator` creates a new one."""
+    global _DEDUPLICATOR
+    with _DEDUPLICATOR_LOCK:
+        if _DEDUPLICATOR is not None:
+            _DEDUPLICATOR.close()
+        _DEDUPLICATOR = None
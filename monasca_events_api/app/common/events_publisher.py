@@ -13,11 +13,23 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import collections
+import threading
+import time
+
 import falcon
-from monasca_common.kafka import producer
-from monasca_common.rest import utils as rest_utils
 from oslo_log import log
 
+from monasca_events_api.app.common import circuit_breaker
+from monasca_events_api.app.common import coalescer
+from monasca_events_api.app.common import json_codec
+from monasca_events_api.app.common import metrics
+from monasca_events_api.app.common import partitioning
+from monasca_events_api.app.common import producers
+from monasca_events_api.app.common import publish_queue
+from monasca_events_api.app.common import routing
+from monasca_events_api.app.common import spool
+from monasca_events_api.app.core import model
 from monasca_events_api import conf
 
 
@@ -25,10 +37,19 @@ LOG = log.getLogger(__name__)
 CONF = conf.CONF
 
 _RETRY_AFTER = 60
+_QUEUE_FULL_RETRY_AFTER = 5
 _KAFKA_META_DATA_SIZE = 32
 _TRUNCATION_SAFE_OFFSET = 1
 
 
+DeliveryReport = collections.namedtuple(
+    'DeliveryReport', ['topic', 'count', 'acks', 'latency', 'error'])
+"""Outcome of publishing messages to single topic.
+
+Contains topic, number of messages, acknowledgement level, latency
+(in seconds) and exception (None if messages have been delivered)"""
+
+
 class InvalidMessageException(Exception):
     pass
 
@@ -43,10 +64,49 @@ class EventPublisher(object):
         topics = 'monevents'
         kafka_url = 'localhost:8900'
 
+    If ``routes`` are set, each event is published only to topics
+    chosen by :py:class:`monasca_events_api.app.common.routing.Router`.
+
+    If ``concurrent_fanout`` is enabled, each topic gets its own
+    producer and bulk is published to all of them at the same time.
+    Request waits until every topic has acknowledged the bulk.
+
+    If ``linger_ms`` is set, messages of concurrent requests are merged
+    and published together, see
+    :py:class:`monasca_events_api.app.common.coalescer.Coalescer`.
+
+    If ``async_publish`` is enabled, messages are not shipped to kafka
+    within the request. They are put into bounded
+    :py:class:`monasca_events_api.app.common.publish_queue.PublishQueue`
+    and published by its background workers.
+
+    If ``[spool]enabled`` is set, messages that cannot be published
+    are written to :py:class:`monasca_events_api.app.common.spool.Spool`
+    and replayed once kafka is available again. As long as spool holds
+    anything, new messages are spooled as well to keep them in order.
+
+    If ``[circuit_breaker]enabled`` is set, publishing is suspended
+    while kafka keeps failing, see
+    :py:class:`monasca_events_api.app.common.circuit_breaker.CircuitBreaker`.
+
+    Each topic is produced with acknowledgement level set in
+    ``topic_acks`` or ``acks``, bulk may request stronger one.
+    Outcome of every produce request is reported to delivery callbacks
+    (see :py:meth:`add_delivery_callback`), by default it is counted in
+    ``delivered`` and ``delivery_failed`` counters of
+    :py:mod:`monasca_events_api.app.common.metrics`.
+
+    Batches produced to kafka can be compressed, see
+    ``compression_codec``. If ``partition_key`` is set, messages are
+    grouped by the key extracted from their envelopes and each group
+    is produced with its key.
+
     Note:
         Uses :py:class:`monasca_common.kafka.producer.KafkaProducer`
-        to ship events to kafka. For more details
-        see `monasca-common`_ github repository.
+        to ship events to kafka. Producers are checked out from
+        the pool shared by the whole process, see
+        :py:func:`monasca_events_api.app.common.producers.get_pool`.
+        For more details see `monasca-common`_ github repository.
 
     .. _monasca-common: https://github.com/openstack/monasca-common
 
@@ -54,21 +114,94 @@ class EventPublisher(object):
 
     def __init__(self):
 
-        self._topics = CONF.events_publisher.topics
-
-        self._kafka_publisher = producer.KafkaProducer(
-            url=CONF.events_publisher.kafka_url
-        )
+        self._router = routing.create_router(CONF.events_publisher.topics,
+                                             CONF.events_publisher.routes)
+        self._topics = (self._router.topics if self._router
+                        else CONF.events_publisher.topics)
+        self._json_codec = json_codec.get_codec()
+        self._key_extractor = partitioning.create_key_extractor(
+            CONF.events_publisher.partition_key)
+
+        self._producers = producers.get_pool()
+        self._breaker = circuit_breaker.get_breaker()
+        self._concurrent_fanout = CONF.events_publisher.concurrent_fanout
+        self._topic_acks = self._load_topic_acks()
+        self._delivery_callbacks = [_count_delivery]
+
+        self._spool = None
+        if CONF.spool.enabled:
+            self._spool = spool.Spool(
+                directory=CONF.spool.directory,
+                publish_func=self._replay,
+                max_workers=CONF.spool.max_workers,
+                segment_size=CONF.spool.segment_size,
+                max_bytes=CONF.spool.max_bytes,
+                max_age=CONF.spool.max_age,
+                fsync_batch_size=CONF.spool.fsync_batch_size,
+                fsync_interval=CONF.spool.fsync_interval,
+                retry_interval=CONF.spool.retry_interval
+            )
+
+        self._coalescer = None
+        if (CONF.events_publisher.linger_ms and
+                not CONF.events_publisher.async_publish):
+            self._coalescer = coalescer.Coalescer(
+                publish_func=self._deliver,
+                linger=CONF.events_publisher.linger_ms / 1000.0,
+                max_bytes=min(CONF.events_publisher.max_batch_bytes,
+                              CONF.events_publisher.max_request_size -
+                              _TRUNCATION_SAFE_OFFSET),
+                overhead=_KAFKA_META_DATA_SIZE
+            )
+
+        self._queue = None
+        if CONF.events_publisher.async_publish:
+            self._queue = publish_queue.PublishQueue(
+                publish_func=self._deliver,
+                max_size=CONF.events_publisher.queue_max_size,
+                max_bytes=CONF.events_publisher.queue_max_bytes,
+                overflow_policy=CONF.events_publisher.queue_overflow_policy,
+                block_timeout=CONF.events_publisher.queue_block_timeout,
+                workers=CONF.events_publisher.queue_workers
+            )
 
         LOG.info('Initializing EventPublisher <%s>', self)
 
-    def send_message(self, messages):
+    def _load_topic_acks(self):
+        topic_acks = {}
+        for topic in self._topics:
+            acks = CONF.events_publisher.topic_acks.get(
+                topic, CONF.events_publisher.acks)
+            if acks not in producers.ACKS:
+                raise ValueError('Invalid acknowledgement level %s of '
+                                 'topic %s, expected one of: %s'
+                                 % (acks, topic, ', '.join(producers.ACKS)))
+            topic_acks[topic] = acks
+        return topic_acks
+
+    def add_delivery_callback(self, callback):
+        """Registers function called with outcome of each produce request.
+
+        Callback is called with :py:data:`DeliveryReport` synchronously,
+        right after the produce request returns or fails, from the thread
+        that has published messages (background worker if messages are
+        published asynchronously). It delays publishing of subsequent
+        messages, so it should be quick. Exceptions raised by callback
+        are logged and ignored.
+
+        :param callable callback: function accepting delivery report
+        """
+        self._delivery_callbacks.append(callback)
+
+    def send_message(self, messages, acks=None):
         """Sends message to each configured topic.
 
         Note:
             Empty content is not shipped to kafka
 
         :param dict| list messages:
+        :param str acks: acknowledgement level requested for messages,
+                         used if stronger than level of a topic
         """
         if not messages:
             return
@@ -93,8 +226,9 @@ class EventPublisher(object):
                     'this massage is dropped {} '
                     'Exception: {}'.format(message, str(ex)))
         try:
-            self._publish(send_messages)
-            sent_counter = len(send_messages)
+            for batch in self._split_into_batches(send_messages):
+                self._publish_or_enqueue(batch, acks=acks)
+                sent_counter += len(batch)
         except Exception as ex:
             LOG.exception('Failure in publishing messages to kafka')
             raise ex
@@ -104,14 +238,113 @@ class EventPublisher(object):
     def _transform_message_to_json(self, message):
         """Transforms message into JSON.
 
-        Method transforms message to JSON and
-        encode to utf8
+        Method transforms message to utf8 encoded JSON
+        with the codec selected in ``[serialization]json_codec``.
+        Messages that are already serialized (see
+        ``[serialization]passthrough_ingestion``) are returned as they are,
+        received events with the timestamp attached serialize themselves.
         :param str message: instance of message
         :return: serialized message
-        :rtype: str
+        :rtype: bytes
         """
-        msg_json = rest_utils.as_json(message)
-        return msg_json.encode('utf-8')
+        if isinstance(message, bytes):
+            return message
+        if isinstance(message, model.TimestampedEvent):
+            return message.serialize(self._json_codec)
+        return self._json_codec.dumps(message)
+
+    def _split_into_batches(self, messages):
+        """Splits serialized messages into batches of safe size.
+
+        Each message is accounted with its encoded size plus kafka
+        metadata overhead. Batches are closed before their total size
+        exceeds ``[events_publisher]max_request_size``. Message that does
+        not fit into a batch on its own is dropped.
+
+        :param list messages: list of serialized messages
+        :return: generator of batches (lists of messages)
+        """
+        max_size = (CONF.events_publisher.max_request_size -
+                    _TRUNCATION_SAFE_OFFSET)
+        batch = []
+        batch_size = 0
+
+        for message in messages:
+            message_size = len(message) + _KAFKA_META_DATA_SIZE
+            if self._is_oversized(message):
+                LOG.error('Message of %d bytes exceeds maximum request '
+                          'size of %d bytes, this message is dropped',
+                          len(message), max_size)
+                continue
+            if batch and batch_size + message_size > max_size:
+                yield batch
+                batch = []
+                batch_size = 0
+            batch.append(message)
+            batch_size += message_size
+
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _is_oversized(message):
+        """Checks if message does not fit into single kafka request.
+
+        :param bytes message: serialized message
+        :rtype: bool
+        """
+        return (len(message) + _KAFKA_META_DATA_SIZE >
+                CONF.events_publisher.max_request_size -
+                _TRUNCATION_SAFE_OFFSET)
+
+    def _route(self, envelope):
+        """Chooses topics event received in the envelope goes to.
+
+        :param envelope: event envelope
+        :type envelope: monasca_events_api.app.model.envelope.Envelope
+        :return: topics or None if event goes to all topics
+        :rtype: tuple
+        """
+        if self._router is None or envelope is None:
+            return None
+        return self._router.route(envelope.event_type,
+                                  envelope.project_id,
+                                  envelope.dimensions)
+
+    def _extract_key(self, envelope):
+        """Extracts partition key from event envelope.
+
+        :param envelope: event envelope
+        :type envelope: monasca_events_api.app.model.envelope.Envelope
+        :return: partition key or None if key cannot be determined
+        """
+        if self._key_extractor is None or envelope is None:
+            return None
+        try:
+            return self._key_extractor(envelope)
+        except Exception as ex:
+            LOG.debug('Failed to extract partition key: %s', ex)
+            return None
+
+    @staticmethod
+    def _group_by_key(messages, keys):
+        """Groups messages by partition key keeping their order.
+
+        Key might be any hashable, i.e. tuple of partition key
+        and topics.
+
+        :param list messages: list of messages
+        :param list keys: keys of messages
+        :return: list of tuples (key, messages)
+        """
+        if not messages:
+            return []
+        if len(set(keys)) < 2:
+            return [(keys[0], messages)]
+        groups = collections.OrderedDict()
+        for message, key in zip(messages, keys):
+            groups.setdefault(key, []).append(message)
+        return list(groups.items())
 
     def _create_message_for_persister_from_request_body(self, body):
         """Create message for persister from request body
@@ -122,13 +355,7 @@ class EventPublisher(object):
         :param body: original request body
         :return: transformed message
         """
-        timestamp = body['timestamp']
-        final_body = []
-        for events in body['events']:
-            ev = events['event'].copy()
-            ev.update({'timestamp': timestamp})
-            final_body.append(ev)
-        return final_body
+        return model.prepare_message_to_sent(body)
 
     def _ensure_type_bytes(self, message):
         """Ensures that message will have proper type.
@@ -139,26 +366,209 @@ class EventPublisher(object):
 
         return message.encode('utf-8')
 
-    def _publish(self, messages):
+    def _publish_or_enqueue(self, messages, key=None, acks=None,
+                            topics=None):
+        """Publishes messages or puts them into publish queue.
+
+        Messages published within the request are merged with those
+        of other requests if ``linger_ms`` is set.
+
+        :param list messages: list of messages
+        :param str key: partition key of messages
+        :param str acks: requested acknowledgement level
+        :param tuple topics: topics to publish to, all if None
+        :exception: :py:class:`falcon.HTTPServiceUnavailable` if
+                    publish queue cannot accept messages
+        """
+        if self._queue is None:
+            if self._coalescer is not None:
+                self._coalescer.submit(messages, key, acks, topics)
+            else:
+                self._deliver(messages, key, acks, topics)
+            return
+        try:
+            self._queue.put(messages, key, acks, topics)
+        except publish_queue.QueueFullException as ex:
+            LOG.warning(str(ex))
+            raise falcon.HTTPServiceUnavailable('Service unavailable',
+                                                str(ex),
+                                                _QUEUE_FULL_RETRY_AFTER)
+
+    def _deliver(self, messages, key=None, acks=None, topics=None):
+        """Publishes messages or writes them to the spool.
+
+        :param list messages: list of messages
+        :param str key: partition key of messages
+        :param str acks: requested acknowledgement level
+        :param tuple topics: topics to publish to, all if None
+        :exception: :py:class:`falcon.HTTPServiceUnavailable` if
+                    messages could be neither published nor spooled
+        """
+        if self._spool is None:
+            self._publish(messages, key, acks, topics)
+            return
+
+        try:
+            spooling = self._spool.has_pending()
+        except (spool.SpoolFullException, IOError, OSError) as ex:
+            # spool that cannot be opened holds nothing to keep order
+            # with, it is needed only if kafka fails
+            LOG.warning('Spool is not available: %s', ex)
+            spooling = False
+
+        if not spooling:
+            try:
+                self._publish(messages, key, acks, topics)
+                return
+            except falcon.HTTPServiceUnavailable as ex:
+                LOG.warning('Spooling %d messages, kafka is unavailable: %s',
+                            len(messages), ex.description)
+
+        try:
+            self._spool.append(messages, key, topics)
+        except (spool.SpoolFullException, IOError, OSError) as ex:
+            LOG.error('Failed to spool %d messages: %s', len(messages), ex)
+            raise falcon.HTTPServiceUnavailable('Service unavailable',
+                                                str(ex), _RETRY_AFTER)
+
+    def _replay(self, messages, key=None, topics=None):
+        """Publishes messages replayed from the spool.
+
+        Spool does not keep acknowledgement level requested for
+        messages. They have already been accepted once, so they are
+        replayed with the strongest level.
+        """
+        self._publish(messages, key, producers.ACKS_ALL, topics)
+
+    def _publish(self, messages, key=None, acks=None, topics=None):
+        """Publishes messages to kafka guarded by circuit breaker.
+
+        While breaker is open, messages are rejected without contacting
+        kafka. Retry-After of 503 responses tells when breaker lets
+        publishes through again.
+
+        :param list messages: list of messages
+        :param str key: partition key of messages
+        :param str acks: requested acknowledgement level
+        :param tuple topics: topics to publish to, all if None
+        :exception: :py:class:`falcon.HTTPServiceUnavailable` if messages
+                    have not been published
+        """
+        if self._breaker is None:
+            self._publish_to_kafka(messages, key, acks, topics)
+            return
+        try:
+            self._breaker.call(self._publish_to_kafka, messages, key, acks,
+                               topics)
+        except circuit_breaker.CircuitOpenException as ex:
+            LOG.debug(str(ex))
+            raise falcon.HTTPServiceUnavailable('Service unavailable',
+                                                str(ex), ex.retry_after)
+        except falcon.HTTPServiceUnavailable as ex:
+            retry_after = self._breaker.retry_after
+            if not retry_after:
+                raise
+            # this failure opened the breaker
+            raise falcon.HTTPServiceUnavailable(ex.title, ex.description,
+                                                retry_after)
+
+    def _publish_to_kafka(self, messages, key=None, acks=None, topics=None):
         """Publishes messages to kafka.
 
         :param list messages: list of messages
+        :param str key: partition key of messages
+        :param str acks: requested acknowledgement level
+        :param tuple topics: topics to publish to, all if None
 
         """
         num_of_msg = len(messages)
+        if topics is None:
+            topics = self._topics
 
         LOG.debug('Publishing %d messages', num_of_msg)
 
+        if self._concurrent_fanout and len(topics) > 1:
+            self._publish_concurrently(messages, key, acks, topics)
+            return
+
         try:
-            for topic in self._topics:
-                self._kafka_publisher.publish(
-                    topic,
-                    messages
-                )
-                LOG.debug('Sent %d messages to topic %s', num_of_msg, topic)
+            with self._producers.producer() as kafka_producer:
+                for topic in topics:
+                    self._publish_to_topic(kafka_producer, topic,
+                                           messages, key, acks)
         except Exception as ex:
             raise falcon.HTTPServiceUnavailable('Service unavailable',
-                                                str(ex), 60)
+                                                str(ex), _RETRY_AFTER)
+
+    def _publish_concurrently(self, messages, key, acks, topics):
+        """Publishes messages to all topics at the same time.
+
+        Each topic is handled by separate thread (greenlet if threading
+        is monkey-patched) using its own producer checked out from
+        the pool, so sends do not interleave on a shared connection.
+
+        :param list messages: list of messages
+        :param str key: partition key of messages
+        :param str acks: requested acknowledgement level
+        :param tuple topics: topics to publish to
+        :exception: :py:class:`falcon.HTTPServiceUnavailable` listing
+                    topics the messages could not be published to
+        """
+        errors = {}
+
+        def _publish_to_topic(topic):
+            try:
+                with self._producers.producer() as kafka_producer:
+                    self._publish_to_topic(kafka_producer, topic,
+                                           messages, key, acks)
+            except Exception as ex:
+                errors[topic] = ex
+
+        workers = [threading.Thread(target=_publish_to_topic, args=(topic,))
+                   for topic in topics]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        if errors:
+            failed_topics = sorted(errors)
+            for topic in failed_topics:
+                LOG.error('Failed to publish %d messages to topic %s: %s',
+                          len(messages), topic, errors[topic])
+            raise falcon.HTTPServiceUnavailable(
+                'Service unavailable',
+                'Failed to publish to topics: %s' % ', '.join(failed_topics),
+                _RETRY_AFTER)
+
+    def _publish_to_topic(self, kafka_producer, topic, messages, key, acks):
+        """Produces messages to single topic and reports the outcome.
+
+        :param kafka_producer: producer checked out from the pool
+        :param str topic: topic
+        :param list messages: list of messages
+        :param str key: partition key of messages
+        :param str acks: requested acknowledgement level
+        """
+        acks = producers.stronger_acks(self._topic_acks[topic], acks)
+        producers.set_acks(kafka_producer, acks)
+        started = time.time()
+        try:
+            kafka_producer.publish(topic, messages, key)
+        except Exception as ex:
+            self._report_delivery(DeliveryReport(
+                topic, len(messages), acks, time.time() - started, ex))
+            raise
+        self._report_delivery(DeliveryReport(
+            topic, len(messages), acks, time.time() - started, None))
+        LOG.debug('Sent %d messages to topic %s', len(messages), topic)
+
+    def _report_delivery(self, report):
+        for callback in self._delivery_callbacks:
+            try:
+                callback(report)
+            except Exception:
+                LOG.exception('Delivery callback %s failed', callback)
 
     def _check_if_all_messages_was_publish(self, send_count, to_send_count):
         """Executed after publishing to sent metrics.
@@ -177,3 +587,10 @@ class EventPublisher(object):
             error_str = ('Failed to send all messages, %d '
                          'messages out of %d have not been published')
             LOG.error(error_str, failed_to_send, to_send_count)
+
+
+def _count_delivery(report):
+    if report.error is None:
+        metrics.increment('delivered', report.topic, report.count)
+    else:
+        metrics.increment('delivery_failed', report.topic, report.count)
@@ -16,29 +16,108 @@ import falcon
 
 from oslo_log import log
 
-from monasca_common.rest import exceptions
-from monasca_common.rest import utils as rest_utils
+from monasca_events_api.app.common import decompression
+from monasca_events_api.app.common import json_codec
+from monasca_events_api import conf
 
 
 LOG = log.getLogger(__name__)
+CONF = conf.CONF
+
+CONTENT_ENCODING_HEADER = 'Content-Encoding'
+
+
+def get_body_stream(req, stream=None):
+    """Returns stream of the http request body.
+
+    Body sent with ``Content-Encoding`` header is decompressed while it
+    is read from the stream, up to
+    ``[serialization]max_decompressed_size`` bytes.
+
+    :param req: HTTP request object.
+    :param stream: stream of the body, defaults to ``req.stream``
+    :return: file-like object
+    :raises falcon.HTTPUnsupportedMediaType:
+    """
+    if stream is None:
+        stream = req.stream
+    try:
+        return decompression.open_stream(
+            stream,
+            req.get_header(CONTENT_ENCODING_HEADER),
+            CONF.serialization.max_decompressed_size)
+    except ValueError as ex:
+        raise falcon.HTTPUnsupportedMediaType(description=str(ex))
+
+
+def body_too_large(ex):
+    """Creates error answering request with too large decompressed body.
+
+    :param decompression.DecompressedBodyTooLarge ex: reported error
+    :rtype: falcon.HTTPRequestEntityTooLarge
+    """
+    return falcon.HTTPRequestEntityTooLarge('Request entity too large',
+                                            str(ex))
+
+
+def _read_body(req):
+    try:
+        return get_body_stream(req).read()
+    except decompression.DecompressedBodyTooLarge as ex:
+        LOG.debug(ex)
+        raise body_too_large(ex)
+    except decompression.DecompressionError as ex:
+        LOG.debug(ex)
+        raise falcon.HTTPBadRequest('Bad request', str(ex))
 
 
 def read_json_msg_body(req):
     """Read the json_msg from the http request body and return as JSON.
 
+    Body is decompressed according to ``Content-Encoding`` and decoded
+    straight from bytes with the codec selected in
+    ``[serialization]json_codec``.
+
     :param req: HTTP request object.
     :return: Returns the metrics as a JSON object.
     :raises falcon.HTTPBadRequest:
     """
+    msg = _read_body(req)
     try:
-        msg = req.stream.read()
-        json_msg = rest_utils.from_json(msg)
+        json_msg = json_codec.get_codec().loads(msg)
         return json_msg
-    except exceptions.DataConversionException as ex:
+    except ValueError as ex:
         LOG.debug(ex)
         raise falcon.HTTPBadRequest('Bad request',
                                     'Request body is not valid JSON')
+
+
+def read_binary_msg_body(req, codec):
+    """Read the binary encoded http request body and decode it.
+
+    :param req: HTTP request object.
+    :param codec: codec of request content type
+    :type codec: monasca_events_api.app.common.binary_codec.BinaryCodec
+    :return: decoded body
+    :raises falcon.HTTPBadRequest:
+    """
+    msg = _read_body(req)
+    try:
+        return codec.loads(msg)
     except ValueError as ex:
         LOG.debug(ex)
         raise falcon.HTTPBadRequest('Bad request',
-                                    'Request body is not valid JSON')
+                                    'Request body is not valid %s'
+                                    % codec.content_type)
+
+
+def read_msg_body(req):
+    """Read the http request body as it was received.
+
+    Only compression of the body, if any, is removed.
+
+    :param req: HTTP request object.
+    :return: request body
+    :rtype: bytes
+    """
+    return _read_body(req)
@@ -0,0 +1,137 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+
+from oslo_log import log
+from oslo_utils import importutils
+import six
+
+from monasca_events_api import conf
+
+LOG = log.getLogger(__name__)
+CONF = conf.CONF
+
+_CODECS = {}
+
+
+class JsonCodec(object):
+    """Decodes JSON from bytes and encodes JSON to bytes.
+
+    Default implementation uses :py:mod:`json` from python standard
+    library. Subclasses wrap faster, optional libraries.
+
+    Decoding errors are reported with :py:exc:`ValueError`
+    (or its subclass) regardless of the library.
+    """
+
+    name = 'json'
+
+    def loads(self, data):
+        """Decodes JSON document.
+
+        :param bytes data: utf-8 encoded JSON document
+        :return: decoded document
+        """
+        if six.PY3 and isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+    def dumps(self, obj):
+        """Encodes object as JSON document.
+
+        :param obj: object to encode
+        :return: utf-8 encoded JSON document
+        :rtype: bytes
+        """
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+class OrjsonCodec(JsonCodec):
+    name = 'orjson'
+
+    def __init__(self, orjson):
+        self._orjson = orjson
+
+    def loads(self, data):
+        # integers wider than 64 bits are decoded as floats
+        return self._orjson.loads(data)
+
+    def dumps(self, obj):
+        return self._orjson.dumps(obj)
+
+
+class UjsonCodec(JsonCodec):
+    name = 'ujson'
+
+    def __init__(self, ujson):
+        self._ujson = ujson
+
+    def loads(self, data):
+        return self._ujson.loads(data)
+
+    def dumps(self, obj):
+        return self._ujson.dumps(obj, ensure_ascii=False,
+                                 escape_forward_slashes=False).encode('utf-8')
+
+
+class RapidjsonCodec(JsonCodec):
+    name = 'rapidjson'
+
+    def __init__(self, rapidjson):
+        self._rapidjson = rapidjson
+
+    def loads(self, data):
+        return self._rapidjson.loads(data)
+
+    def dumps(self, obj):
+        return self._rapidjson.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+_OPTIONAL_CODECS = {
+    'orjson': OrjsonCodec,
+    'ujson': UjsonCodec,
+    'rapidjson': RapidjsonCodec,
+}
+
+
+def get_codec(name=None):
+    """Returns JSON codec, by default one selected in configuration.
+
+    If library backing requested codec is not installed,
+    codec using python standard library is returned.
+
+    :param str name: name of the codec, defaults to
+                     ``[serialization]json_codec``
+    :return: JSON codec
+    :rtype: JsonCodec
+    """
+    name = name or CONF.serialization.json_codec
+    codec = _CODECS.get(name)
+    if codec is None:
+        codec = _CODECS[name] = _create_codec(name)
+    return codec
+
+
+def _create_codec(name):
+    codec_class = _OPTIONAL_CODECS.get(name)
+    if codec_class is None:
+        return JsonCodec()
+    library = importutils.try_import(name)
+    if library is None:
+        LOG.warning('%s is not installed, falling back to json from '
+                    'python standard library', name)
+        return JsonCodec()
+    LOG.info('Using %s to encode and decode JSON', name)
+    return codec_class(library)
@@ -0,0 +1,215 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Locates JSON values within utf-8 encoded buffer without decoding them.
+
+Scanner works on byte offsets. It finds where values start and end,
+which allows to slice parts of a document (i.e. single event) out of
+the buffer untouched. Strings are skipped and brackets are matched with
+regular expressions, no python objects are created for scanned values.
+
+Note:
+    Scanner validates structure of the document (strings, brackets,
+    separators and scalars of the members it visits). Scalars nested
+    within skipped values are not validated.
+"""
+
+import json
+import re
+
+_WHITESPACE = re.compile(br'[ \t\n\r]*')
+# loops are unrolled, alternation evaluated per character is slow
+_STRING = re.compile(br'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+# everything up to the next bracket that is not a part of a string
+_NON_BRACKETS = re.compile(
+    br'[^"{}\[\]]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"{}\[\]]*)*', re.DOTALL)
+_SCALAR = re.compile(br'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?'
+                     br'|true|false|null')
+
+_OPENING = {b'{': b'}', b'[': b']'}
+
+
+class IncompleteDocument(ValueError):
+    """Document ends before value being scanned is complete."""
+
+
+def skip_whitespace(buf, pos):
+    return _WHITESPACE.match(buf, pos).end()
+
+
+def skip_value(buf, pos):
+    """Finds the end of JSON value starting at pos.
+
+    :param bytes buf: buffer holding the document
+    :param int pos: offset of the first character of the value
+    :return: offset right after the value
+    :rtype: int
+    :exception: :py:exc:`ValueError` if value is malformed,
+                :py:exc:`IncompleteDocument` if buffer ends before
+                value is complete
+    """
+    char = buf[pos:pos + 1]
+    if not char:
+        raise IncompleteDocument('Expected value at %d' % pos)
+    if char == b'"':
+        return _skip_string(buf, pos)
+    if char in _OPENING:
+        return _skip_container(buf, pos)
+    match = _SCALAR.match(buf, pos)
+    if match is None:
+        raise ValueError('Unexpected %r at %d' % (char, pos))
+    end = match.end()
+    if end == len(buf):
+        # number might continue in the part not received yet
+        raise IncompleteDocument('Expected end of scalar at %d' % end)
+    return end
+
+
+def _skip_string(buf, pos):
+    match = _STRING.match(buf, pos)
+    if match is None:
+        raise IncompleteDocument('Unterminated string at %d' % pos)
+    return match.end()
+
+
+def _skip_container(buf, pos):
+    expected = [_OPENING[buf[pos:pos + 1]]]
+    skip = _NON_BRACKETS.match
+    pos += 1
+    while expected:
+        pos = skip(buf, pos).end()
+        char = buf[pos:pos + 1]
+        if char in _OPENING:
+            expected.append(_OPENING[char])
+        elif char == b'"' or not char:
+            raise IncompleteDocument('Unterminated container')
+        elif char != expected.pop():
+            raise ValueError('Unexpected %r at %d' % (char, pos))
+        pos += 1
+    return pos
+
+
+def decode_string(buf, start, end):
+    """Decodes JSON string located at buf[start:end]."""
+    raw = buf[start + 1:end - 1]
+    if b'\\' not in raw:
+        return raw.decode('utf-8')
+    return json.loads(buf[start:end].decode('utf-8'))
+
+
+def scan_object(buf, pos, scan_member=None):
+    """Scans JSON object starting at pos.
+
+    Each member is handed over to scan_member, which is called with
+    member name and offset of its value. It returns offset right after
+    the value, so values of interest can be processed while scanning
+    and the rest is skipped. Each byte is visited only once.
+
+    :param bytes buf: buffer holding the document
+    :param int pos: offset of the opening brace
+    :param scan_member: function accepting member name and value
+                        offset, by default value is skipped
+    :return: offset right after the object
+    :rtype: int
+    """
+    _expect(buf, pos, b'{')
+    pos = skip_whitespace(buf, pos + 1)
+    if buf[pos:pos + 1] == b'}':
+        return pos + 1
+    while True:
+        _expect(buf, pos, b'"')
+        key_end = _skip_string(buf, pos)
+        key = decode_string(buf, pos, key_end)
+        pos = skip_whitespace(buf, key_end)
+        _expect(buf, pos, b':')
+        start = skip_whitespace(buf, pos + 1)
+        if scan_member is None:
+            end = skip_value(buf, start)
+        else:
+            end = scan_member(key, start)
+        pos = skip_whitespace(buf, end)
+        if buf[pos:pos + 1] == b'}':
+            return pos + 1
+        _expect(buf, pos, b',')
+        pos = skip_whitespace(buf, pos + 1)
+
+
+def scan_array(buf, pos, scan_item=None):
+    """Scans JSON array starting at pos.
+
+    Counterpart of :py:func:`scan_object`, scan_item is called with
+    offset of each item and returns offset right after it.
+
+    :param bytes buf: buffer holding the document
+    :param int pos: offset of the opening bracket
+    :param scan_item: function accepting item offset, by default item
+                      is skipped
+    :return: offset right after the array
+    :rtype: int
+    """
+    _expect(buf, pos, b'[')
+    pos = skip_whitespace(buf, pos + 1)
+    if buf[pos:pos + 1] == b']':
+        return pos + 1
+    while True:
+        if scan_item is None:
+            end = skip_value(buf, pos)
+        else:
+            end = scan_item(pos)
+        pos = skip_whitespace(buf, end)
+        if buf[pos:pos + 1] == b']':
+            return pos + 1
+        _expect(buf, pos, b',')
+        pos = skip_whitespace(buf, pos + 1)
+
+
+def read_member_name(buf, pos):
+    """Reads name of object member starting at pos.
+
+    :param bytes buf: buffer holding the document
+    :param int pos: offset of the opening quote of the name
+    :return: tuple of offset of member value and member name
+    :rtype: tuple
+    """
+    _expect(buf, pos, b'"')
+    end = _skip_string(buf, pos)
+    name = decode_string(buf, pos, end)
+    pos = skip_whitespace(buf, end)
+    _expect(buf, pos, b':')
+    return skip_whitespace(buf, pos + 1), name
+
+
+def skip_separator(buf, pos, closing):
+    """Skips separator following member or item.
+
+    :param bytes buf: buffer holding the document
+    :param int pos: offset right after member or item
+    :param bytes closing: closing bracket of the container
+    :return: tuple of offset of the next member or item (or right after
+             the container) and flag telling if container has been closed
+    :rtype: tuple
+    """
+    pos = skip_whitespace(buf, pos)
+    if buf[pos:pos + 1] == closing:
+        return pos + 1, True
+    _expect(buf, pos, b',')
+    return skip_whitespace(buf, pos + 1), False
+
+
+def _expect(buf, pos, char):
+    actual = buf[pos:pos + 1]
+    if not actual:
+        raise IncompleteDocument('Expected %r at %d' % (char, pos))
+    if actual != char:
+        raise ValueError('Expected %r at %d, found %r' % (char, pos, actual))
@@ -0,0 +1,53 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Counters of the current process.
+
+Counters are grouped by name and label (i.e. topic), they are kept in
+memory and reported by ``GET /healthcheck``.
+"""
+
+import collections
+import threading
+
+_LOCK = threading.Lock()
+_COUNTERS = collections.defaultdict(collections.Counter)
+
+
+def increment(name, label, value=1):
+    """Increments counter.
+
+    :param str name: name of the counter
+    :param str label: label counter is kept for, i.e. topic
+    :param int value: value to add
+    """
+    with _LOCK:
+        _COUNTERS[name][label] += value
+
+
+def snapshot():
+    """Returns current values of all counters.
+
+    :return: dict mapping name of the counter to dict mapping label
+             to value
+    :rtype: dict
+    """
+    with _LOCK:
+        return {name: dict(counter) for name, counter in _COUNTERS.items()}
+
+
+def reset():
+    """Clears all counters."""
+    with _LOCK:
+        _COUNTERS.clear()
@@ -0,0 +1,108 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from monasca_common.kafka_lib.partitioner import hashed
+import six
+
+KEY_ALIASES = {
+    'project_id': 'project_id',
+    'instance': 'event.payload.nova_object.data.uuid',
+}
+"""Predefined partition keys mapped to paths within event envelope"""
+
+DIMENSIONS_KEY = 'dimensions'
+"""Partition key computed out of all dimensions of an event"""
+
+_PARTITION_CACHE_SIZE = 10000
+
+
+class CachedMurmur2Partitioner(hashed.Murmur2Partitioner):
+    """Murmur2 partitioner remembering partitions of recent keys.
+
+    Murmur2 gives the same partition for a key in every process
+    (unlike default kafka_lib partitioner relying on :py:func:`hash`),
+    but its pure python implementation is costly. Partitions of recently
+    seen keys are therefore cached, cache is cleared once it reaches
+    its size limit.
+    """
+
+    def __init__(self, partitions):
+        super(CachedMurmur2Partitioner, self).__init__(partitions)
+        self._cache = {}
+
+    def partition(self, key, partitions=None):
+        if partitions:
+            return super(CachedMurmur2Partitioner, self).partition(
+                key, partitions)
+        try:
+            return self._cache[key]
+        except KeyError:
+            if len(self._cache) >= _PARTITION_CACHE_SIZE:
+                self._cache.clear()
+            partition = super(CachedMurmur2Partitioner, self).partition(key)
+            self._cache[key] = partition
+            return partition
+
+
+def create_key_extractor(partition_key):
+    """Creates function extracting partition key from event envelope.
+
+    :param str partition_key: one of :py:data:`KEY_ALIASES`,
+                              :py:data:`DIMENSIONS_KEY` or dotted path
+                              to a value within event envelope
+    :return: function accepting envelope (see
+             :py:class:`monasca_events_api.app.model.envelope.Envelope`)
+             and returning key (str or None), None if events should not
+             be keyed
+    """
+    if not partition_key:
+        return None
+    if partition_key == DIMENSIONS_KEY:
+        return _dimensions_key
+    path = KEY_ALIASES.get(partition_key, partition_key).split('.')
+    return lambda envelope: _path_key(envelope, path)
+
+
+def _dimensions_key(envelope):
+    dimensions = envelope.dimensions
+    if not dimensions:
+        return None
+    return ','.join('%s=%s' % item for item in sorted(dimensions.items()))
+
+
+def _path_key(envelope, path):
+    # members of the envelope itself never contain dots
+    value = _resolve(envelope.get(path[0]), path[1:])
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    return value if isinstance(value, six.string_types) else str(value)
+
+
+def _resolve(value, path):
+    """Resolves dotted path, keys may contain dots themselves.
+
+    Versioned notifications use keys such as ``nova_object.data``,
+    so for each level the longest matching key is tried first.
+    """
+    if not path:
+        return value
+    if not isinstance(value, dict):
+        return None
+    for end in range(len(path), 0, -1):
+        key = '.'.join(path[:end])
+        if key in value:
+            resolved = _resolve(value[key], path[end:])
+            if resolved is not None:
+                return resolved
+    return None
@@ -0,0 +1,199 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Validation of event payloads against versioned notification schemas.
+
+Schemas are JSON schema documents kept in a directory, one per event
+type and version of the payload (``nova_object.version``)::
+
+    <schema_dir>/<event_type>/<version>.json
+    <schema_dir>/<event_type>.json
+
+The latter is used for payloads without version or if there is no
+schema of their version. Events without schema are not validated.
+"""
+
+import collections
+import json
+import os
+import random
+import re
+import threading
+
+from oslo_log import log
+from oslo_utils import importutils
+import six
+
+from monasca_events_api.app.common import metrics
+from monasca_events_api import conf
+
+LOG = log.getLogger(__name__)
+CONF = conf.CONF
+
+jsonschema = importutils.try_import('jsonschema')
+
+VERSION_FIELD = 'nova_object.version'
+METRIC = 'payload_validation'
+
+# event types and versions become parts of schema path
+_SAFE_NAME = re.compile(r'^[A-Za-z0-9_-][A-Za-z0-9_.-]*\Z')
+
+_VALIDATOR = None
+_VALIDATOR_LOCK = threading.Lock()
+
+
+def compile_jsonschema(schema):
+    """Compiles JSON schema document with jsonschema library.
+
+    :param dict schema: JSON schema
+    :return: function returning message of the first error found in
+             payload or None if payload is valid
+    :exception: :py:exc:`jsonschema.SchemaError` if schema is invalid
+    """
+    validator_class = jsonschema.validators.validator_for(schema)
+    validator_class.check_schema(schema)
+    validator = validator_class(schema)
+
+    def validate(payload):
+        for error in validator.iter_errors(payload):
+            return error.message
+        return None
+
+    return validate
+
+
+class PayloadValidator(object):
+    """Validates payloads of the events against their schemas.
+
+    Schemas are loaded and compiled on first use and kept in a bounded
+    cache keyed by event type and payload version, least recently used
+    are dropped first. Missing schemas are cached as well.
+
+    :param str schema_dir: directory holding schemas
+    :param int cache_size: maximum number of compiled schemas kept
+    :param float sample_rate: fraction (0-1) of events validated
+    :param compile_schema: function compiling schema document, see
+                           :py:func:`compile_jsonschema`
+    """
+
+    def __init__(self, schema_dir, cache_size, sample_rate=1.0,
+                 compile_schema=compile_jsonschema):
+        self._schema_dir = schema_dir
+        self._cache_size = cache_size
+        self._sample_rate = sample_rate
+        self._compile_schema = compile_schema
+        self._lock = threading.Lock()
+        self._cache = collections.OrderedDict()
+
+    def validate(self, event):
+        """Validates payload of the event.
+
+        :param dict event: decoded event
+        :return: reason event is invalid for or None if it is valid,
+                 has no schema or has not been sampled
+        :rtype: str
+        """
+        if self._sample_rate < 1 and random.random() >= self._sample_rate:
+            return None
+        event_type = event.get('event_type')
+        if not isinstance(event_type, six.string_types):
+            return None
+        payload = event.get('payload')
+        version = (payload.get(VERSION_FIELD)
+                   if isinstance(payload, dict) else None)
+
+        validate = self._get_validator(event_type, version)
+        if validate is None:
+            return None
+        message = validate(payload)
+        if message is None:
+            metrics.increment(METRIC, 'valid')
+            return None
+        metrics.increment(METRIC, 'invalid')
+        return 'Payload of %s does not match its schema: %s' % (event_type,
+                                                                message)
+
+    def _get_validator(self, event_type, version):
+        key = (event_type, version)
+        with self._lock:
+            try:
+                validate = self._cache.pop(key)
+                # reinserted key becomes the most recently used one
+                self._cache[key] = validate
+                return validate
+            except KeyError:
+                pass
+
+        validate = self._load(event_type, version)
+        with self._lock:
+            self._cache[key] = validate
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return validate
+
+    def _load(self, event_type, version):
+        if not _SAFE_NAME.match(event_type):
+            return None
+        paths = [os.path.join(self._schema_dir, event_type + '.json')]
+        if version is not None and _SAFE_NAME.match(str(version)):
+            paths.insert(0, os.path.join(self._schema_dir, event_type,
+                                         '%s.json' % version))
+        for path in paths:
+            if not os.path.isfile(path):
+                continue
+            try:
+                with open(path) as schema_file:
+                    validate = self._compile_schema(json.load(schema_file))
+            except Exception as ex:
+                LOG.error('Cannot load schema %s, events are not '
+                          'validated against it: %s', path, ex)
+                return None
+            LOG.debug('Loaded schema %s', path)
+            return validate
+        return None
+
+
+def get_validator():
+    """Returns payload validator of this process.
+
+    Validator is configured in ``[payload_validation]`` group.
+
+    :return: validator or None if ``[payload_validation]enabled`` is not
+             set
+    :rtype: PayloadValidator
+    :exception: :py:exc:`RuntimeError` if validation is enabled, but
+                jsonschema library is not installed
+    """
+    global _VALIDATOR
+    if not CONF.payload_validation.enabled:
+        return None
+    if jsonschema is None:
+        raise RuntimeError('Payload validation enabled, but jsonschema '
+                           'is not installed')
+    if _VALIDATOR is None:
+        with _VALIDATOR_LOCK:
+            if _VALIDATOR is None:
+                _VALIDATOR = PayloadValidator(
+                    schema_dir=CONF.payload_validation.schema_dir,
+                    cache_size=CONF.payload_validation.cache_size,
+                    sample_rate=CONF.payload_validation.sample_rate)
+    return _VALIDATOR
+
+
+def reset_validator():
+    """Drops validator of this process, next :py:func:`get_validator`
+    creates a new one."""
+    global _VALIDATOR
+    with _VALIDATOR_LOCK:
+        _VALIDATOR = None
@@ -0,0 +1,286 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import contextlib
+import os
+import threading
+import time
+
+from monasca_common.kafka import producer
+from monasca_common.kafka_lib import codec
+from monasca_common.kafka_lib import producer as kafka_lib_producer
+from monasca_common.kafka_lib import protocol
+from oslo_log import log
+
+from monasca_events_api.app.common import partitioning
+from monasca_events_api import conf
+
+LOG = log.getLogger(__name__)
+CONF = conf.CONF
+
+COMPRESSION_CODECS = {
+    'none': protocol.CODEC_NONE,
+    'gzip': protocol.CODEC_GZIP,
+    'snappy': protocol.CODEC_SNAPPY,
+}
+"""Compression codecs supported by kafka producer"""
+
+ACKS_ALL = 'all'
+ACKS = collections.OrderedDict([
+    ('0', kafka_lib_producer.KeyedProducer.ACK_NOT_REQUIRED),
+    ('1', kafka_lib_producer.KeyedProducer.ACK_AFTER_LOCAL_WRITE),
+    (ACKS_ALL, kafka_lib_producer.KeyedProducer.ACK_AFTER_CLUSTER_COMMIT),
+])
+"""Acknowledgement levels from the weakest to the strongest, mapped to
+required acks of kafka produce request"""
+_DEFAULT_REQ_ACKS = kafka_lib_producer.KeyedProducer.ACK_AFTER_LOCAL_WRITE
+"""Required acks producers are created with by monasca_common"""
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+class ProducerPoolTimeout(Exception):
+    """No producer has been released in time."""
+
+
+def create_producer():
+    """Creates kafka producer according to configuration.
+
+    Producer ships events to ``[events_publisher]kafka_url``. Batches
+    produced with it are compressed with
+    ``[events_publisher]compression_codec``. If events are keyed
+    (``[events_publisher]partition_key``), partition of each key is
+    chosen by :py:class:`.partitioning.CachedMurmur2Partitioner`.
+
+    :return: kafka producer
+    :rtype: monasca_common.kafka.producer.KafkaProducer
+    """
+    kafka_producer = producer.KafkaProducer(
+        url=CONF.events_publisher.kafka_url
+    )
+    kafka_producer._producer.ack_timeout = CONF.events_publisher.ack_timeout
+    _configure_compression(kafka_producer)
+    if CONF.events_publisher.partition_key:
+        kafka_producer._producer.partitioner_class = (
+            partitioning.CachedMurmur2Partitioner)
+    return kafka_producer
+
+
+def stronger_acks(*levels):
+    """Returns the strongest of acknowledgement levels.
+
+    :param levels: acknowledgement levels (keys of :py:data:`ACKS`),
+                   None values are ignored
+    :return: the strongest level or None if no level was given
+    """
+    levels = [level for level in levels if level is not None]
+    if not levels:
+        return None
+    order = list(ACKS)
+    return max(levels, key=order.index)
+
+
+def set_acks(kafka_producer, acks):
+    """Sets acknowledgement level of subsequent produce requests.
+
+    Level is meant to be set only on producer checked out from the
+    pool, pool restores it when producer is released, see
+    :py:func:`reset_acks`.
+
+    :param kafka_producer: producer checked out from the pool
+    :param str acks: acknowledgement level, key of :py:data:`ACKS`
+    """
+    _set_req_acks(kafka_producer, ACKS[acks])
+
+
+def reset_acks(kafka_producer):
+    """Restores acknowledgement level producer has been created with.
+
+    :param kafka_producer: producer released to the pool
+    """
+    _set_req_acks(kafka_producer, _DEFAULT_REQ_ACKS)
+
+
+def _set_req_acks(kafka_producer, req_acks):
+    # monasca_common.kafka.producer.KafkaProducer does not expose required
+    # acks of the kafka_lib KeyedProducer it wraps. Synchronous producer of
+    # kafka_lib 0.9.5 (vendored in monasca-common) reads req_acks on every
+    # send, so it can be changed between sends.
+    kafka_producer._producer.req_acks = req_acks
+
+
+def _configure_compression(kafka_producer):
+    codec_name = CONF.events_publisher.compression_codec
+    if codec_name == 'none':
+        return
+    if codec_name == 'snappy' and not codec.has_snappy():
+        raise RuntimeError('Snappy compression requested, but '
+                           'python-snappy is not installed')
+
+    # monasca_common.kafka.producer.KafkaProducer does not expose
+    # compression settings of the kafka_lib producer it wraps
+    kafka_lib_producer = kafka_producer._producer
+    kafka_lib_producer.codec = COMPRESSION_CODECS[codec_name]
+    kafka_lib_producer.codec_compresslevel = (
+        CONF.events_publisher.compression_level)
+
+    LOG.debug('Kafka producer compresses batches with %s', codec_name)
+
+
+class ProducerPool(object):
+    """Pool of kafka producers shared by the whole process.
+
+    Producers (each holding its own kafka client and broker connections)
+    are created lazily, when there is no idle one and the pool has not
+    reached its size yet. Producer is used by one caller at a time.
+    If the caller fails, producer is dropped, so the next checkout
+    reconnects. Settings the caller has changed are restored with
+    on_checkin when producer is released.
+
+    Pool is fork-safe. Producers created before the fork are
+    abandoned by the child process, their sockets belong to the parent.
+
+    :param function factory: creates new producer
+    :param int size: maximum number of producers
+    :param float timeout: how long (in seconds) checkout waits for
+                          producer to be released
+    :param function on_checkin: called with producer being released
+    """
+
+    def __init__(self, factory, size, timeout, on_checkin=None):
+        self._factory = factory
+        self._size = size
+        self._timeout = timeout
+        self._on_checkin = on_checkin
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._condition = threading.Condition(threading.Lock())
+        self._idle = []
+        self._created = 0
+
+    @property
+    def size(self):
+        """Number of producers created so far."""
+        return self._created
+
+    @property
+    def idle(self):
+        """Number of producers waiting to be checked out."""
+        return len(self._idle)
+
+    @contextlib.contextmanager
+    def producer(self):
+        """Checks out producer for the duration of with block.
+
+        :exception: :py:exc:`ProducerPoolTimeout` if no producer
+                    is released in time or any exception raised
+                    while producer was being created
+        """
+        kafka_producer = self._checkout()
+        try:
+            yield kafka_producer
+            if self._on_checkin is not None:
+                self._on_checkin(kafka_producer)
+        except Exception:
+            self._discard(kafka_producer)
+            raise
+        self._checkin(kafka_producer)
+
+    def close(self):
+        """Closes idle producers."""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._condition.notify_all()
+        for kafka_producer in idle:
+            _close(kafka_producer)
+
+    def _checkout(self):
+        if self._pid != os.getpid():
+            self._reset()
+        deadline = time.time() + self._timeout
+        with self._condition:
+            while not self._idle and self._created >= self._size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise ProducerPoolTimeout(
+                        'All %d kafka producers are busy' % self._size)
+                self._condition.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            return self._factory()
+        except Exception:
+            self._release_slot()
+            raise
+
+    def _checkin(self, kafka_producer):
+        with self._condition:
+            if self._pid != os.getpid():
+                return
+            self._idle.append(kafka_producer)
+            self._condition.notify()
+
+    def _discard(self, kafka_producer):
+        self._release_slot()
+        _close(kafka_producer)
+
+    def _release_slot(self):
+        with self._condition:
+            if self._pid != os.getpid():
+                return
+            self._created -= 1
+            self._condition.notify()
+
+
+def _close(kafka_producer):
+    try:
+        kafka_producer._kafka.close()
+    except Exception as ex:
+        LOG.debug('Failed to close kafka producer: %s', ex)
+
+
+def get_pool():
+    """Returns producer pool shared by the whole process.
+
+    Pool creates producers with :py:func:`create_producer`, its size
+    is ``[events_publisher]connection_pool_size``. Acknowledgement level
+    of released producers is restored with :py:func:`reset_acks`.
+
+    :rtype: ProducerPool
+    """
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = ProducerPool(
+                    factory=create_producer,
+                    size=CONF.events_publisher.connection_pool_size,
+                    timeout=CONF.events_publisher.connection_pool_timeout,
+                    on_checkin=reset_acks)
+    return _POOL
+
+
+def reset_pool():
+    """Closes shared producer pool, next :py:func:`get_pool` creates it."""
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.close()
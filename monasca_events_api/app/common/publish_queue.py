@@ -0,0 +1,167 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import os
+import threading
+import time
+
+from oslo_log import log
+
+LOG = log.getLogger(__name__)
+
+OVERFLOW_BLOCK = 'block'
+OVERFLOW_REJECT = 'reject'
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+
+
+class QueueFullException(Exception):
+    pass
+
+
+class PublishQueue(object):
+    """Bounded in-memory queue of serialized bulks.
+
+    Queue is bounded both by the number of bulks and by the number
+    of bytes they occupy. Bulks are drained by background workers
+    that hand each of them over to ``publish_func``.
+
+    Workers are regular :py:class:`threading.Thread` instances, so under
+    eventlet workers (monkey-patched threading) they become greenlets.
+    They are started lazily, with the first bulk put into the queue,
+    to make sure they are created in the process that serves requests
+    and not in the one that loaded the application.
+
+    :param callable publish_func: function accepting list of messages,
+                                  partition key, acknowledgement level
+                                  and topics
+    :param int max_size: maximum number of bulks in the queue
+    :param int max_bytes: maximum number of bytes in the queue
+    :param str overflow_policy: block, reject or drop_oldest
+    :param float block_timeout: how long put may block
+    :param int workers: number of workers draining the queue
+    """
+
+    def __init__(self, publish_func, max_size, max_bytes,
+                 overflow_policy=OVERFLOW_REJECT, block_timeout=0,
+                 workers=1):
+        self._publish_func = publish_func
+        self._max_size = max_size
+        self._max_bytes = max_bytes
+        self._overflow_policy = overflow_policy
+        self._block_timeout = block_timeout
+        self._workers_count = workers
+
+        self._bulks = collections.deque()
+        self._bytes = 0
+        self._dropped = 0
+        self._cond = threading.Condition()
+        self._workers = []
+        self._pid = None
+
+    @property
+    def size(self):
+        return len(self._bulks)
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    @property
+    def dropped(self):
+        return self._dropped
+
+    def put(self, messages, key=None, acks=None, topics=None):
+        """Enqueues bulk of serialized messages.
+
+        :param list messages: list of serialized (bytes) messages
+        :param str key: partition key of messages
+        :param str acks: acknowledgement level requested for messages
+        :param tuple topics: topics messages are published to
+        :exception: :py:class:`QueueFullException` if bulk could not
+                    be enqueued in accordance with overflow policy
+        """
+        if not messages:
+            return
+
+        bulk_bytes = sum(len(m) for m in messages)
+        if bulk_bytes > self._max_bytes:
+            raise QueueFullException('Bulk of %d bytes exceeds queue '
+                                     'capacity of %d bytes'
+                                     % (bulk_bytes, self._max_bytes))
+
+        self._ensure_workers()
+
+        with self._cond:
+            if not self._has_room(bulk_bytes):
+                self._make_room(bulk_bytes)
+            self._bulks.append((messages, key, acks, topics, bulk_bytes))
+            self._bytes += bulk_bytes
+            # requests blocked on full queue share the condition with
+            # workers, make sure that a worker is woken up as well
+            self._cond.notify_all()
+
+    def _has_room(self, bulk_bytes):
+        return (len(self._bulks) < self._max_size and
+                self._bytes + bulk_bytes <= self._max_bytes)
+
+    def _make_room(self, bulk_bytes):
+        if self._overflow_policy == OVERFLOW_DROP_OLDEST:
+            while not self._has_room(bulk_bytes):
+                _, _, _, _, dropped_bytes = self._bulks.popleft()
+                self._bytes -= dropped_bytes
+                self._dropped += 1
+                LOG.warning('Publish queue is full, dropped oldest bulk '
+                            'of %d bytes', dropped_bytes)
+        elif self._overflow_policy == OVERFLOW_BLOCK:
+            deadline = time.time() + self._block_timeout
+            while not self._has_room(bulk_bytes):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise QueueFullException('Publish queue is full, '
+                                             'timed out waiting for room')
+                self._cond.wait(remaining)
+        else:
+            raise QueueFullException('Publish queue is full')
+
+    def _ensure_workers(self):
+        with self._cond:
+            if self._pid == os.getpid() and self._workers:
+                return
+            self._pid = os.getpid()
+            self._workers = []
+            for index in range(self._workers_count):
+                worker = threading.Thread(target=self._drain,
+                                          name='publish-queue-%d' % index)
+                worker.daemon = True
+                worker.start()
+                self._workers.append(worker)
+            LOG.info('Started %d publish queue workers',
+                     self._workers_count)
+
+    def _drain(self):
+        while True:
+            with self._cond:
+                while not self._bulks:
+                    self._cond.wait()
+                messages, key, acks, topics, bulk_bytes = (
+                    self._bulks.popleft())
+                self._bytes -= bulk_bytes
+                # wake up requests waiting for room
+                self._cond.notify_all()
+            try:
+                self._publish_func(messages, key, acks, topics)
+            except Exception:
+                LOG.exception('Failed to publish %d messages from '
+                              'publish queue', len(messages))
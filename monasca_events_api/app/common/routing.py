@@ -0,0 +1,168 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+EVENT_TYPE_FIELD = 'event_type'
+PROJECT_ID_FIELD = 'project_id'
+DIMENSIONS_PREFIX = 'dimensions.'
+
+_WILDCARD = '*'
+_EVENT_TYPE_CACHE_SIZE = 10000
+
+
+class Router(object):
+    """Chooses topics each event is published to.
+
+    Routes are compiled once. Event type patterns are either exact
+    event types, looked up in a dict, or prefixes of dot separated
+    segments (``compute.instance.*``) kept in a trie of segments.
+    Project ids and dimension values are matched exactly. Topics
+    matched by event type are cached per event type.
+
+    Topic without any route receives all events, topic with routes
+    receives only events matching at least one of them.
+
+    :param list topics: configured topics
+    :param list routes: tuples of topic, field and pattern, where field
+                        is ``event_type``, ``project_id`` or
+                        ``dimensions.<name>``
+    """
+
+    def __init__(self, topics, routes):
+        routed = set()
+        self._topics = list(topics)
+        self._event_types = {}
+        self._event_type_trie = ({}, set())
+        self._project_ids = {}
+        self._dimensions = {}
+        self._cache = {}
+
+        for topic, field, pattern in routes:
+            if topic not in self._topics:
+                self._topics.append(topic)
+            routed.add(topic)
+            if field == EVENT_TYPE_FIELD:
+                self._add_event_type(topic, pattern)
+            elif field == PROJECT_ID_FIELD:
+                self._project_ids.setdefault(pattern, set()).add(topic)
+            elif field.startswith(DIMENSIONS_PREFIX):
+                name = field[len(DIMENSIONS_PREFIX):]
+                self._dimensions.setdefault((name, pattern),
+                                            set()).add(topic)
+            else:
+                raise ValueError('Cannot route by %s' % field)
+
+        self._default = frozenset(t for t in self._topics if t not in routed)
+        self._order = {topic: index for index, topic in
+                       enumerate(self._topics)}
+
+    @property
+    def topics(self):
+        """All topics, configured ones followed by those only routed to."""
+        return list(self._topics)
+
+    def _add_event_type(self, topic, pattern):
+        if not pattern.endswith(_WILDCARD):
+            if _WILDCARD in pattern:
+                raise ValueError('Wildcard must be the last segment of '
+                                 'event type pattern %s' % pattern)
+            self._event_types.setdefault(pattern, set()).add(topic)
+            return
+
+        prefix = pattern[:-1]
+        if prefix and not prefix.endswith('.') or _WILDCARD in prefix:
+            raise ValueError('Wildcard must be the last segment of '
+                             'event type pattern %s' % pattern)
+        node = self._event_type_trie
+        for segment in prefix.split('.')[:-1]:
+            node = node[0].setdefault(segment, ({}, set()))
+        node[1].add(topic)
+
+    def route(self, event_type=None, project_id=None, dimensions=None):
+        """Returns topics event should be published to.
+
+        :param str event_type: type of the event
+        :param str project_id: project event belongs to
+        :param dict dimensions: dimensions of the event
+        :return: topics in configured order
+        :rtype: tuple
+        """
+        topics = self._route_event_type(event_type)
+        extra = None
+        if project_id is not None and self._project_ids:
+            extra = self._project_ids.get(project_id)
+        if dimensions and self._dimensions:
+            for item in dimensions.items():
+                matched = self._dimensions.get(item)
+                if matched:
+                    extra = matched if extra is None else extra | matched
+        if extra and not extra <= set(topics):
+            topics = tuple(sorted(set(topics) | extra,
+                                  key=self._order.__getitem__))
+        return topics
+
+    def _route_event_type(self, event_type):
+        try:
+            return self._cache[event_type]
+        except KeyError:
+            pass
+
+        matched = set(self._default)
+        if event_type:
+            matched.update(self._event_types.get(event_type, ()))
+            node = self._event_type_trie
+            segments = event_type.split('.')
+            # prefix has to be followed by at least one more segment
+            for segment in segments:
+                matched.update(node[1])
+                node = node[0].get(segment)
+                if node is None:
+                    break
+        else:
+            # events without type are matched only by '*'
+            matched.update(self._event_type_trie[1])
+
+        topics = tuple(sorted(matched, key=self._order.__getitem__))
+        if len(self._cache) >= _EVENT_TYPE_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[event_type] = topics
+        return topics
+
+
+def parse_route(route):
+    """Parses route of ``<topic>:<field>=<pattern>`` form.
+
+    :param str route: route definition
+    :return: tuple of topic, field and pattern
+    :exception: :py:exc:`ValueError` if route is malformed
+    """
+    topic, sep, rule = route.partition(':')
+    field, sep2, pattern = rule.partition('=')
+    if not (sep and sep2 and topic and field and pattern):
+        raise ValueError('Route %s should look like '
+                         '<topic>:<field>=<pattern>' % route)
+    return topic.strip(), field.strip(), pattern.strip()
+
+
+def create_router(topics, routes):
+    """Creates router out of configured topics and routes.
+
+    :param list topics: configured topics
+    :param list routes: route definitions, see :py:func:`parse_route`
+    :return: router or None if there are no routes and every event
+             goes to every topic
+    :rtype: Router
+    """
+    if not routes:
+        return None
+    return Router(topics, [parse_route(route) for route in routes])
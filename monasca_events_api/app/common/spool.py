@@ -0,0 +1,570 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import errno
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from oslo_log import log
+
+LOG = log.getLogger(__name__)
+
+_SEGMENT_SUFFIX = '.seg'
+_CHECKPOINT_FILE = 'checkpoint'
+_LOCK_FILE = 'lock'
+
+_HEADER = struct.Struct('>BIIQ')
+"""Record header: format version, payload size, payload crc32,
+creation time (ms)"""
+_VERSION = 1
+_LENGTH = struct.Struct('>I')
+
+
+class SpoolFullException(Exception):
+    pass
+
+
+class UnknownRecordVersionException(Exception):
+    pass
+
+
+def encode_record(messages, key=None, created=None, topics=None):
+    """Encodes bulk of serialized messages as single spool record.
+
+    :param list messages: list of serialized (bytes) messages
+    :param str key: partition key of messages
+    :param int created: creation time in milliseconds, defaults to now
+    :param tuple topics: topics messages are published to
+    :return: encoded record
+    :rtype: bytes
+    """
+    key = key.encode('utf-8') if key else b''
+    parts = [_LENGTH.pack(len(key)), key]
+    topics = topics or ()
+    parts.append(_LENGTH.pack(len(topics)))
+    for topic in topics:
+        topic = topic.encode('utf-8')
+        parts.append(_LENGTH.pack(len(topic)))
+        parts.append(topic)
+    parts.append(_LENGTH.pack(len(messages)))
+    for message in messages:
+        parts.append(_LENGTH.pack(len(message)))
+        parts.append(message)
+    payload = b''.join(parts)
+    if created is None:
+        created = int(time.time() * 1000)
+    crc = zlib.crc32(payload) & 0xffffffff
+    return _HEADER.pack(_VERSION, len(payload), crc, created) + payload
+
+
+def decode_record(buf, offset):
+    """Decodes spool record stored in buf at given offset.
+
+    :param buf: buffer (bytes or mmap) holding records
+    :param int offset: offset of the record
+    :return: tuple of messages, partition key, topics, creation time
+             and offset of next record or None if record is incomplete
+             or corrupted
+    :rtype: tuple
+    :exception: :py:class:`UnknownRecordVersionException` if record has
+                been written in format this version does not know
+    """
+    start = offset + _HEADER.size
+    if start > len(buf):
+        return None
+    version, size, crc, created = _HEADER.unpack_from(buf, offset)
+    if version != _VERSION:
+        raise UnknownRecordVersionException(
+            'Spool record at %d has unknown format version %d, '
+            'expected %d' % (offset, version, _VERSION))
+    end = start + size
+    if end > len(buf):
+        return None
+    payload = buf[start:end]
+    if zlib.crc32(payload) & 0xffffffff != crc:
+        return None
+
+    key_length, = _LENGTH.unpack_from(payload, 0)
+    pos = _LENGTH.size
+    key = payload[pos:pos + key_length].decode('utf-8') or None
+    pos += key_length
+
+    count, = _LENGTH.unpack_from(payload, pos)
+    pos += _LENGTH.size
+    topics = []
+    for _ in range(count):
+        length, = _LENGTH.unpack_from(payload, pos)
+        pos += _LENGTH.size
+        topics.append(payload[pos:pos + length].decode('utf-8'))
+        pos += length
+
+    count, = _LENGTH.unpack_from(payload, pos)
+    pos += _LENGTH.size
+    messages = []
+    for _ in range(count):
+        length, = _LENGTH.unpack_from(payload, pos)
+        pos += _LENGTH.size
+        messages.append(payload[pos:pos + length])
+        pos += length
+    return messages, key, tuple(topics) or None, created, end
+
+
+class Spool(object):
+    """Disk-backed, append-only log of bulks that wait for kafka.
+
+    Spool is a directory of segments. Every segment is a sequence of
+    records, each one holding single bulk of already serialized messages
+    protected with crc32. Records are appended to the newest segment,
+    segment is rolled once it reaches ``segment_size``. Writes are
+    flushed to disk (fsync) in batches, after ``fsync_batch_size``
+    records or ``fsync_interval`` seconds, whichever comes first.
+
+    Background drainer replays records in order, reading segments
+    through :py:mod:`mmap`, and stores its position in checkpoint file.
+    Fully replayed segments are removed. Records older than ``max_age``
+    seconds are discarded instead of being replayed. Delivery is
+    at-least-once, bulk replayed right before a crash may be replayed
+    again after restart.
+
+    Each process claims its own subdirectory of ``directory``
+    (guarded with :py:func:`fcntl.flock`), so API workers never share
+    segments. Subdirectory left by a dead worker is claimed and
+    recovered by the next one: torn records at the end of segments
+    are truncated and replay continues from the checkpoint.
+    Subdirectories no worker claims (e.g. left by former, larger number
+    of workers) are locked and replayed by the orphan drainer.
+
+    :param str directory: base directory of the spool
+    :param callable publish_func: function accepting list of messages,
+                                  partition key and topics
+    """
+
+    def __init__(self, directory, publish_func, max_workers=1,
+                 segment_size=64 * 1024 * 1024, max_bytes=1024 * 1024 * 1024,
+                 max_age=24 * 60 * 60, fsync_batch_size=100,
+                 fsync_interval=1.0, retry_interval=5.0):
+        self._directory = directory
+        self._publish_func = publish_func
+        self._max_workers = max_workers
+        self._segment_size = segment_size
+        self._max_bytes = max_bytes
+        self._max_age = max_age * 1000
+        self._fsync_batch_size = fsync_batch_size
+        self._fsync_interval = fsync_interval
+        self._retry_interval = retry_interval
+
+        self._cond = threading.Condition()
+        self._pid = None
+        self._path = None
+        self._lock_fd = None
+
+        self._segments = []
+        self._bytes = 0
+        self._pending = 0
+        self._discarded = 0
+
+        self._writer = None
+        self._writer_size = 0
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+        self._read_segment = None
+        self._read_offset = 0
+        self._read_map = None
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    @property
+    def discarded(self):
+        return self._discarded
+
+    def has_pending(self):
+        """Checks if there are spooled bulks waiting to be replayed.
+
+        First call within the process claims spool subdirectory and
+        recovers whatever has been left there.
+        """
+        self._ensure_open()
+        return self._pending > 0
+
+    def append(self, messages, key=None, topics=None):
+        """Appends bulk of serialized messages to the spool.
+
+        :param list messages: list of serialized (bytes) messages
+        :param str key: partition key of messages
+        :param tuple topics: topics messages are published to
+        :exception: :py:class:`SpoolFullException` if spool has reached
+                    its size limit
+        """
+        self._ensure_open()
+        record = encode_record(messages, key, topics=topics)
+
+        with self._cond:
+            if self._bytes + len(record) > self._max_bytes:
+                raise SpoolFullException('Spool has reached its limit of '
+                                         '%d bytes' % self._max_bytes)
+            if (self._writer is None or
+                    self._writer_size + len(record) > self._segment_size):
+                self._roll()
+
+            self._writer.write(record)
+            self._writer.flush()
+            self._writer_size += len(record)
+            self._bytes += len(record)
+            self._pending += 1
+            self._unsynced += 1
+
+            self._sync()
+            self._cond.notify_all()
+
+        LOG.debug('Spooled %d messages', len(messages))
+
+    def _ensure_open(self):
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._reset()
+            self._claim()
+            self._recover()
+            self._pid = os.getpid()
+        self._start_drainer()
+
+    def _reset(self):
+        # state inherited from parent process is meaningless
+        self._segments = []
+        self._bytes = 0
+        self._pending = 0
+        self._writer = None
+        self._writer_size = 0
+        self._unsynced = 0
+        self._read_segment = None
+        self._read_offset = 0
+        self._read_map = None
+
+    def _claim(self):
+        for index in range(self._max_workers):
+            path = os.path.join(self._directory, str(index))
+            _makedirs(path)
+            fd = _lock(path)
+            if fd is None:
+                continue
+            self._path = path
+            self._lock_fd = fd
+            LOG.info('Claimed spool directory %s', path)
+            return
+        raise SpoolFullException('No free spool directory in %s'
+                                 % self._directory)
+
+    def _recover(self):
+        self._segments = sorted(
+            int(name[:-len(_SEGMENT_SUFFIX)])
+            for name in os.listdir(self._path)
+            if name.endswith(_SEGMENT_SUFFIX))
+
+        read_segment, read_offset = self._read_checkpoint()
+        for segment in list(self._segments):
+            if read_segment is not None and segment < read_segment:
+                self._remove_segment(segment)
+        if not self._segments or read_segment not in self._segments:
+            read_segment = self._segments[0] if self._segments else None
+            read_offset = 0
+
+        for segment in self._segments:
+            start = read_offset if segment == read_segment else 0
+            count, valid_size = self._scan_segment(segment, start)
+            self._pending += count
+            self._bytes += valid_size
+
+        self._read_segment = read_segment
+        self._read_offset = read_offset
+
+        if self._pending:
+            LOG.warning('Recovered %d spooled bulks from %s',
+                        self._pending, self._path)
+
+    def _scan_segment(self, segment, start):
+        """Counts valid records and truncates torn tail of the segment."""
+        path = self._segment_path(segment)
+        count = 0
+        with open(path, 'r+b') as f:
+            size = os.fstat(f.fileno()).st_size
+            offset = 0
+            if size:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    while offset < size:
+                        record = decode_record(buf, offset)
+                        if record is None:
+                            break
+                        if offset >= start:
+                            count += 1
+                        offset = record[-1]
+                finally:
+                    buf.close()
+            if offset < size:
+                LOG.warning('Truncating spool segment %s from %d to %d '
+                            'bytes, tail is incomplete or corrupted',
+                            path, size, offset)
+                f.truncate(offset)
+        return count, offset
+
+    def _start_drainer(self):
+        for target, name in ((self._drain, 'spool-drainer'),
+                             (self._drain_orphans, 'spool-orphan-drainer')):
+            drainer = threading.Thread(target=target, name=name)
+            drainer.daemon = True
+            drainer.start()
+
+    def _drain(self):
+        while True:
+            try:
+                with self._cond:
+                    while not self._pending:
+                        self._cond.wait(self._fsync_interval or None)
+                        self._sync()
+                replayed = self._replay_next()
+            except Exception:
+                LOG.exception('Spool drainer failed, retrying in %d '
+                              'seconds', self._retry_interval)
+                replayed = False
+            if not replayed:
+                time.sleep(self._retry_interval)
+
+    def _drain_orphans(self):
+        """Replays subdirectories no running worker has claimed.
+
+        Each one is locked while it is being replayed, so it is not
+        replayed twice nor claimed meanwhile.
+        """
+        try:
+            names = sorted(os.listdir(self._directory))
+        except OSError as ex:
+            LOG.error('Failed to look for orphaned spool directories: %s',
+                      ex)
+            return
+        for name in names:
+            path = os.path.join(self._directory, name)
+            if not name.isdigit() or path == self._path:
+                continue
+            try:
+                fd = _lock(path)
+            except (IOError, OSError) as ex:
+                LOG.error('Failed to lock spool directory %s: %s', path, ex)
+                continue
+            if fd is None:
+                continue
+            try:
+                self._drain_orphan(path)
+            except Exception:
+                LOG.exception('Failed to replay spool directory %s', path)
+            finally:
+                os.close(fd)
+
+    def _drain_orphan(self, path):
+        orphan = Spool(self._directory, self._publish_func,
+                       segment_size=self._segment_size,
+                       max_bytes=self._max_bytes,
+                       max_age=self._max_age // 1000,
+                       fsync_batch_size=self._fsync_batch_size,
+                       fsync_interval=self._fsync_interval,
+                       retry_interval=self._retry_interval)
+        orphan._path = path
+        orphan._pid = os.getpid()
+        orphan._recover()
+        if not orphan._pending:
+            return
+        while orphan._pending:
+            try:
+                replayed = orphan._replay_next()
+            except Exception:
+                LOG.exception('Failed to replay orphaned spool directory '
+                              '%s, retrying in %d seconds', path,
+                              self._retry_interval)
+                replayed = False
+            if not replayed:
+                time.sleep(self._retry_interval)
+        if orphan._writer is not None:
+            orphan._writer.close()
+        if orphan._read_map is not None:
+            orphan._read_map[1].close()
+        LOG.info('Replayed orphaned spool directory %s', path)
+
+    def _replay_next(self):
+        """Replays oldest spooled bulk.
+
+        :return: True if bulk has been replayed or discarded
+        :rtype: bool
+        """
+        with self._cond:
+            self._sync()
+            record = self._read_next()
+        if record is None:
+            return False
+
+        messages, key, topics, created, next_offset = record
+        if int(time.time() * 1000) - created > self._max_age:
+            LOG.warning('Discarding %d spooled messages, they are older '
+                        'than %d seconds', len(messages),
+                        self._max_age // 1000)
+            self._discarded += 1
+        else:
+            try:
+                self._publish_func(messages, key, topics)
+            except Exception as ex:
+                LOG.warning('Failed to replay %d spooled messages: %s',
+                            len(messages), ex)
+                return False
+            LOG.debug('Replayed %d spooled messages', len(messages))
+
+        with self._cond:
+            self._advance(next_offset)
+        return True
+
+    def _read_next(self):
+        while self._read_segment is not None:
+            buf = self._map_segment(self._read_segment)
+            if self._read_offset < len(buf):
+                record = decode_record(buf, self._read_offset)
+                if record is not None:
+                    return record
+                LOG.error('Spool segment %s is corrupted at %d, skipping '
+                          'rest of it', self._read_segment, self._read_offset)
+                if self._read_segment == self._segments[-1]:
+                    self._roll()
+            elif self._read_segment == self._segments[-1]:
+                break
+            self._next_segment()
+
+        if self._pending:
+            LOG.error('Spool lost track of %d bulks', self._pending)
+            self._pending = 0
+        return None
+
+    def _advance(self, next_offset):
+        self._read_offset = next_offset
+        self._pending -= 1
+        if (self._read_segment != self._segments[-1] and
+                next_offset >= len(self._map_segment(self._read_segment))):
+            self._next_segment()
+        self._write_checkpoint()
+
+    def _next_segment(self):
+        segment = self._read_segment
+        index = self._segments.index(segment)
+        self._read_segment = self._segments[index + 1]
+        self._read_offset = 0
+        self._remove_segment(segment)
+
+    def _map_segment(self, segment):
+        path = self._segment_path(segment)
+        size = os.path.getsize(path)
+        if self._read_map is not None:
+            mapped_segment, mapped = self._read_map
+            if mapped_segment == segment and len(mapped) == size:
+                return mapped
+            mapped.close()
+            self._read_map = None
+        if not size:
+            return b''
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._read_map = (segment, mapped)
+        return mapped
+
+    def _roll(self):
+        if self._writer is not None:
+            self._sync(force=True)
+            self._writer.close()
+        segment = self._segments[-1] + 1 if self._segments else 0
+        self._writer = open(self._segment_path(segment), 'ab')
+        self._writer_size = 0
+        self._segments.append(segment)
+        if self._read_segment is None:
+            self._read_segment = segment
+            self._read_offset = 0
+
+    def _sync(self, force=False):
+        if self._writer is None or not self._unsynced:
+            return
+        if (force or self._unsynced >= self._fsync_batch_size or
+                time.time() - self._last_sync >= self._fsync_interval):
+            os.fsync(self._writer.fileno())
+            self._unsynced = 0
+            self._last_sync = time.time()
+
+    def _remove_segment(self, segment):
+        path = self._segment_path(segment)
+        if self._read_map is not None and self._read_map[0] == segment:
+            self._read_map[1].close()
+            self._read_map = None
+        try:
+            self._bytes -= os.path.getsize(path)
+            os.remove(path)
+        except OSError as ex:
+            if ex.errno != errno.ENOENT:
+                raise
+        self._segments.remove(segment)
+        self._bytes = max(self._bytes, 0)
+
+    def _read_checkpoint(self):
+        try:
+            with open(os.path.join(self._path, _CHECKPOINT_FILE)) as f:
+                segment, offset = f.read().split()
+                return int(segment), int(offset)
+        except (IOError, OSError, ValueError):
+            return None, 0
+
+    def _write_checkpoint(self):
+        path = os.path.join(self._path, _CHECKPOINT_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('%d %d' % (self._read_segment, self._read_offset))
+        os.rename(tmp_path, path)
+
+    def _segment_path(self, segment):
+        return os.path.join(self._path,
+                            '%020d%s' % (segment, _SEGMENT_SUFFIX))
+
+
+def _lock(path):
+    """Locks spool subdirectory for the process.
+
+    :param str path: subdirectory of the spool
+    :return: descriptor holding the lock, None if subdirectory is locked
+             by another process
+    :rtype: int
+    """
+    fd = os.open(os.path.join(path, _LOCK_FILE),
+                 os.O_CREAT | os.O_RDWR, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except (IOError, OSError):
+        os.close(fd)
+        return None
+    return fd
+
+
+def _makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as ex:
+        if ex.errno != errno.EEXIST:
+            raise
@@ -0,0 +1,98 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Parsing of ISO 8601 timestamps events are received with.
+
+Timestamp is shared by all events of the bulk, so it is parsed once per
+bulk. Clients tend to send many bulks with the same timestamp (or a few
+alternating ones), recently parsed timestamps are therefore kept in
+a small LRU cache.
+
+Timestamps are normalized to UTC with millisecond precision
+(``2012-10-29T11:42:11.000Z``) and converted to milliseconds since
+the epoch.
+"""
+
+import calendar
+import collections
+import datetime
+import re
+import threading
+
+import six
+
+Timestamp = collections.namedtuple('Timestamp', ['normalized', 'epoch_ms'])
+"""Parsed timestamp, normalized UTC form and milliseconds since epoch"""
+
+# Z followed by offset (2012-10-29T13:42:11Z+0200) is accepted, it is
+# the form API samples have always documented and clients send, the time
+# is in the offset then
+_ISO_8601 = re.compile(r'(\d{4})-(\d{2})-(\d{2})[Tt ](\d{2}):(\d{2}):(\d{2})'
+                       r'(?:[.,](\d+))?[Zz]?(?:([+-])(\d{2}):?(\d{2}))?\Z')
+
+_CACHE_SIZE = 64
+_CACHE = collections.OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+def parse(value):
+    """Parses ISO 8601 timestamp.
+
+    Timestamp without offset is considered to be in UTC.
+
+    :param str value: timestamp
+    :return: normalized timestamp and milliseconds since epoch
+    :rtype: Timestamp
+    :exception: :py:exc:`ValueError` if timestamp is not valid
+    """
+    if not isinstance(value, six.string_types):
+        raise ValueError('%s is not ISO 8601 timestamp' % value)
+    with _CACHE_LOCK:
+        parsed = _CACHE.pop(value, None)
+        if parsed is not None:
+            _CACHE[value] = parsed
+            return parsed
+
+    parsed = _parse(value)
+    with _CACHE_LOCK:
+        _CACHE[value] = parsed
+        while len(_CACHE) > _CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return parsed
+
+
+def _parse(value):
+    match = _ISO_8601.match(value)
+    if match is None:
+        raise ValueError('%s is not ISO 8601 timestamp' % value)
+    (year, month, day, hour, minute, second, fraction,
+     sign, offset_hours, offset_minutes) = match.groups()
+    microsecond = int(fraction[:6].ljust(6, '0')) if fraction else 0
+    try:
+        moment = datetime.datetime(int(year), int(month), int(day),
+                                   int(hour), int(minute), int(second),
+                                   microsecond)
+        if sign:
+            offset = datetime.timedelta(hours=int(offset_hours),
+                                        minutes=int(offset_minutes))
+            moment = moment - offset if sign == '+' else moment + offset
+    except (ValueError, OverflowError) as ex:
+        raise ValueError('%s is not valid timestamp: %s' % (value, ex))
+
+    millisecond = moment.microsecond // 1000
+    normalized = '%04d-%02d-%02dT%02d:%02d:%02d.%03dZ' % (
+        moment.year, moment.month, moment.day, moment.hour,
+        moment.minute, moment.second, millisecond)
+    epoch_ms = calendar.timegm(moment.timetuple()) * 1000 + millisecond
+    return Timestamp(normalized, epoch_ms)
@@ -17,6 +17,9 @@ import collections
 import falcon
 from monasca_common.rest import utils as rest_utils
 
+from monasca_events_api.app.common import circuit_breaker
+from monasca_events_api.app.common import decompression
+from monasca_events_api.app.common import metrics
 from monasca_events_api.app.healthcheck import kafka_check
 
 HealthCheckResult = collections.namedtuple('HealthCheckResult',
@@ -49,9 +52,21 @@ class HealthChecks(object):
         # in case it'd be unhealthy,
         # message will contain error string
         status_data = {
-            'kafka': kafka_result.message
+            'kafka': kafka_result.message,
+            'metrics': metrics.snapshot()
         }
 
+        ratios = decompression.compression_ratios()
+        if ratios:
+            status_data['compression_ratio'] = ratios
+
+        breaker = circuit_breaker.get_breaker()
+        if breaker is not None:
+            status_data['circuit_breaker'] = {
+                'state': breaker.state,
+                'retry_after': breaker.retry_after
+            }
+
         # Really simple approach, ideally that should be
         # part of monasca-common with some sort of registration of
         # healthchecks concept
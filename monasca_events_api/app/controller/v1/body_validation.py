@@ -12,29 +12,163 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+"""Validation of request body and event envelopes.
+
+Checks are plain python, evaluated once per member of the body without
+any intermediate objects. :py:exc:`voluptuous.MultipleInvalid` is built
+only once the body is found invalid, as it was when the body was
+validated with voluptuous schema.
+"""
+
 import six
 
 from oslo_log import log
-from voluptuous import Any
-from voluptuous import Required
-from voluptuous import Schema
+from voluptuous import Invalid
+from voluptuous import MultipleInvalid
 
+from monasca_events_api.app.common import payload_validation
+from monasca_events_api.app.common import timestamps
 
 LOG = log.getLogger(__name__)
 
+ENVELOPE_NOT_OBJECT = 'Event envelope is not an object'
+NO_EVENT = 'Event envelope without event'
+EVENT_NOT_OBJECT = 'Event is not an object'
+NO_PROJECT = 'Event envelope without project_id'
+PROJECT_NOT_STRING = 'Event project_id is not a string'
+EVENT_HOLDS_BYTES = 'Event holds byte string, it cannot be encoded as JSON'
+DIMENSIONS_NOT_STRINGS = ('Event dimensions are not an object with string '
+                          'values')
 
-default_schema = Schema({Required("events"): Any(list, dict),
-                         Required("timestamp"):
-                             Any(str, unicode) if six.PY2 else str})
+_STRING_TYPES = six.string_types
 
 
-def validate_body(request_body):
+def validate_body(request_body, results=None):
     """Validate body.
 
-     Method validate if body contain all required fields,
-     and check if all value have correct type.
+    Method validates that body contains all required fields with
+    correct types and valid ISO 8601 timestamp (see
+    :py:func:`parse_timestamp`), as well as every event envelope: it must
+    hold
+    ``event`` object, ``project_id`` string and, optionally,
+    ``dimensions`` object with string values. If
+    ``[payload_validation]enabled`` is set, payloads of the events are
+    validated against their schemas too.
 
+    If results are given, envelopes are not validated here. Malformed
+    ones are rejected one by one while the events are prepared, see
+    :py:func:`find_envelope_error`.
 
     :param request_body: body
+    :param results: results of the bulk
+    :type results: monasca_events_api.app.common.bulk_results.BulkResults
+    :exception: :py:exc:`voluptuous.MultipleInvalid` if body is invalid
+    """
+    if not isinstance(request_body, dict):
+        raise invalid('expected a dictionary')
+    for name in ('events', 'timestamp'):
+        if name not in request_body:
+            raise invalid('required key not provided', name)
+
+    parse_timestamp(request_body['timestamp'])
+    events = request_body['events']
+    if not isinstance(events, list):
+        raise invalid('expected list', 'events')
+
+    if results is None:
+        find_error = find_envelope_error
+        payload_validator = payload_validation.get_validator()
+        for index, envelope in enumerate(events):
+            error = find_error(envelope, payload_validator)
+            if error is not None:
+                raise invalid_envelope(index, error)
+
+
+def parse_timestamp(timestamp):
+    """Parses timestamp of the bulk.
+
+    :param str timestamp: received timestamp
+    :return: normalized timestamp and milliseconds since epoch
+    :rtype: monasca_events_api.app.common.timestamps.Timestamp
+    :exception: :py:exc:`voluptuous.MultipleInvalid` if timestamp is not
+                a string or is not valid ISO 8601 timestamp
+    """
+    if not isinstance(timestamp, _STRING_TYPES):
+        raise invalid('expected str', 'timestamp')
+    try:
+        return timestamps.parse(timestamp)
+    except ValueError as ex:
+        raise invalid(six.text_type(ex), 'timestamp')
+
+
+def find_envelope_error(envelope, payload_validator=None):
+    """Finds first reason envelope is invalid for.
+
+    :param envelope: decoded event envelope
+    :param payload_validator: validator of event payloads, if any
+    :type payload_validator:
+        monasca_events_api.app.common.payload_validation.PayloadValidator
+    :return: tuple of invalid member (None if whole envelope is invalid)
+             and reason or None if envelope is valid
+    :rtype: tuple
+    """
+    if not isinstance(envelope, dict):
+        return None, ENVELOPE_NOT_OBJECT
+    if 'event' not in envelope:
+        return 'event', NO_EVENT
+    if not isinstance(envelope['event'], dict):
+        return 'event', EVENT_NOT_OBJECT
+    error = find_member_error(envelope)
+    if error is None and payload_validator is not None:
+        reason = payload_validator.validate(envelope['event'])
+        if reason is not None:
+            return 'event', reason
+    return error
+
+
+def find_member_error(envelope):
+    """Finds first reason members of envelope other than event are
+    invalid for.
+
+    :param dict envelope: decoded event envelope
+    :return: tuple of invalid member and reason or None if members are
+             valid
+    :rtype: tuple
+    """
+    project_id = envelope.get('project_id')
+    if project_id is None:
+        return 'project_id', NO_PROJECT
+    if not isinstance(project_id, _STRING_TYPES):
+        return 'project_id', PROJECT_NOT_STRING
+    dimensions = envelope.get('dimensions')
+    if dimensions is not None:
+        if not isinstance(dimensions, dict):
+            return 'dimensions', DIMENSIONS_NOT_STRINGS
+        for value in six.itervalues(dimensions):
+            if not isinstance(value, _STRING_TYPES):
+                return 'dimensions', DIMENSIONS_NOT_STRINGS
+    return None
+
+
+def invalid(message, *path):
+    """Creates error reported for invalid body.
+
+    :param str message: what is wrong
+    :param path: path to invalid member of the body
+    :rtype: voluptuous.MultipleInvalid
+    """
+    return MultipleInvalid([Invalid(message, path=list(path))])
+
+
+def invalid_envelope(index, error):
+    """Creates error reported for invalid envelope.
+
+    :param int index: index of the envelope within the bulk
+    :param tuple error: invalid member and reason, see
+                        :py:func:`find_envelope_error`
+    :rtype: voluptuous.MultipleInvalid
     """
-    default_schema(request_body)
+    member, reason = error
+    if member is None:
+        return invalid(reason, 'events', index)
+    return invalid(reason, 'events', index, member)
@@ -14,7 +14,9 @@
 
 from oslo_log import log
 
+from monasca_events_api.app.common import dedup
 from monasca_events_api.app.common import events_publisher
+from monasca_events_api.app.model import envelope as envelope_model
 from monasca_events_api import conf
 
 LOG = log.getLogger(__name__)
@@ -27,38 +29,174 @@ class EventsBulkProcessor(events_publisher.EventPublisher):
     BulkProcessor is customized version of
     :py:class:`monasca_events_api.app.base.event_publisher.EventPublisher`
     that utilizes processing of bulk request inside single loop.
+    Bulk is grouped by partition key and topics events are routed to,
+    then split into batches that fit into single kafka request, batches
+    are published one after another.
+
+    If ``[dedup]enabled`` is set, events that have already been published
+    are dropped, see
+    :py:class:`monasca_events_api.app.common.dedup.Deduplicator`.
+    Events are remembered only once the whole bulk has been published
+    (or enqueued), so bulk that failed can be retried.
 
     """
 
-    def send_message(self, events):
+    def __init__(self):
+        super(EventsBulkProcessor, self).__init__()
+        self._dedup = dedup.get_deduplicator()
+
+    @property
+    def event_members(self):
+        """Members of the events required to process them.
+
+        Events received in pass-through mode are not decoded, only these
+        members are.
+        """
+        if self._dedup is None:
+            return ('event_type',)
+        return 'event_type', dedup.MESSAGE_ID_FIELD
+
+    def send_message(self, events, envelopes=None, acks=None, results=None):
         """Sends bulk package to kafka
 
-        :param list events: received events
+        If results are given, outcome of each event is recorded in them.
+        Events that cannot be serialized or are too large are rejected,
+        events of batches that could not be published are failed and
+        publishing continues with the next batch.
+
+        :param list events: received events, None for events rejected
+                            while preparing the bulk
+        :param list envelopes: envelopes events have been received in
+                               (:py:class:`Envelope` or dict), used to
+                               extract partition keys and route events
+        :param str acks: acknowledgement level requested for the bulk
+        :param results: results of the bulk
+        :type results: monasca_events_api.app.common.bulk_results.BulkResults
 
         """
 
         num_of_msgs = len(events) if events else 0
         to_send_msgs = []
+        keys = []
+        dedup_keys = []
+        indexes = []
 
         LOG.debug('Bulk package <events=%d>',
                   num_of_msgs)
 
-        for ev_el in events:
+        for index, ev_el in enumerate(events):
+            if ev_el is None:
+                continue
             try:
                 t_el = self._transform_message_to_json(ev_el)
-                if t_el:
+                if t_el and self._is_oversized(t_el):
+                    LOG.error('Message of %d bytes exceeds maximum request '
+                              'size, this message is dropped', len(t_el))
+                    if results is not None:
+                        results.reject(index, 'Event exceeds maximum '
+                                              'request size')
+                elif t_el:
+                    envelope = envelopes[index] if envelopes else None
+                    if isinstance(envelope, dict):
+                        envelope = envelope_model.Envelope.from_dict(
+                            envelope)
+                    key = (self._extract_key(envelope),
+                           self._route(envelope))
+                    dedup_key = (dedup.event_key(envelope, ev_el)
+                                 if self._dedup is not None else None)
                     to_send_msgs.append(t_el)
+                    keys.append(key)
+                    indexes.append(index)
+                    if self._dedup is not None:
+                        dedup_keys.append(dedup_key)
             except Exception as ex:
                 LOG.error('Failed to transform message to json. '
                           'message: {} Exception {}'.format(ev_el, str(ex)))
+                if results is not None:
+                    results.reject(index, 'Event cannot be serialized')
 
-        sent_count = len(to_send_msgs)
+        sent_count = 0
+        if dedup_keys:
+            duplicates = self._dedup.find_duplicates(dedup_keys)
+            if duplicates:
+                LOG.debug('Dropping %d already published events',
+                          len(duplicates))
+                sent_count += len(duplicates)
+                to_send_msgs, keys, dedup_keys, indexes = (
+                    [item for index, item in enumerate(items)
+                     if index not in duplicates]
+                    for items in (to_send_msgs, keys, dedup_keys, indexes))
+
+        published = []
         try:
-            self._publish(to_send_msgs)
+            positions = list(range(len(to_send_msgs)))
+            for (key, topics), group in self._group_by_key(positions, keys):
+                if topics is not None and not topics:
+                    LOG.debug('%d events are not routed to any topic',
+                              len(group))
+                    sent_count += len(group)
+                    published.extend(group)
+                    continue
+                messages = [to_send_msgs[position] for position in group]
+                for batch in self._split_into_batches(messages):
+                    batch_positions = group[:len(batch)]
+                    group = group[len(batch):]
+                    try:
+                        self._publish_or_enqueue(batch, key, acks, topics)
+                    except Exception as ex:
+                        if results is None:
+                            raise
+                        LOG.warning('Failed to publish %d events: %s',
+                                    len(batch), ex)
+                        results.fail([indexes[p] for p in batch_positions],
+                                     getattr(ex, 'description', None) or
+                                     str(ex))
+                        continue
+                    sent_count += len(batch)
+                    published.extend(batch_positions)
+            if dedup_keys:
+                self._dedup.add([dedup_keys[p] for p in published])
         except Exception as ex:
-            LOG.error('Failed to send bulk package <events=%d, dimensions=%s>',
+            LOG.error('Failed to send bulk package <events=%d>',
                       num_of_msgs)
             LOG.exception(ex)
             raise ex
         finally:
-            self._check_if_all_messages_was_publish(num_of_msgs, sent_count)
+            self._check_if_all_messages_was_publish(sent_count, num_of_msgs)
+
+    def send_stream(self, events, acks=None, results=None):
+        """Sends events as they are being read.
+
+        Events are collected into parts of about ``max_request_size``
+        bytes and each part is sent with :py:meth:`send_message` as soon
+        as it is complete, while the rest of events is still being read.
+
+        :param events: iterable of tuples of event (None if rejected),
+                       its envelope and its size
+        :type events: monasca_events_api.app.core.model.EventStream
+        :param str acks: acknowledgement level requested for the bulk
+        :param results: results of the bulk
+        :type results: monasca_events_api.app.common.bulk_results.BulkResults
+        """
+        part_size = CONF.events_publisher.max_request_size
+        offset = 0
+        messages = []
+        envelopes = []
+        size = 0
+        for message, envelope, event_size in events:
+            messages.append(message)
+            envelopes.append(envelope)
+            size += event_size
+            if size >= part_size:
+                self._send_part(messages, envelopes, acks, results, offset)
+                offset += len(messages)
+                messages = []
+                envelopes = []
+                size = 0
+        if messages:
+            self._send_part(messages, envelopes, acks, results, offset)
+
+    def _send_part(self, messages, envelopes, acks, results, offset):
+        if results is not None:
+            results = results.shifted(offset)
+        self.send_message(messages, envelopes, acks, results)
@@ -13,15 +13,27 @@
 # under the License.
 
 import falcon
+from monasca_common.rest import utils as rest_utils
 from oslo_log import log
 from voluptuous import MultipleInvalid
 
+from monasca_events_api.app.common import binary_codec
+from monasca_events_api.app.common import bulk_results
+from monasca_events_api.app.common import decompression
 from monasca_events_api.app.common import helpers
+from monasca_events_api.app.common import payload_validation
+from monasca_events_api.app.common import producers
 from monasca_events_api.app.controller.v1 import body_validation
 from monasca_events_api.app.controller.v1 import bulk_processor
+from monasca_events_api.app.core.model import EventStream
+from monasca_events_api.app.core.model import NdjsonStream
+from monasca_events_api.app.core.model import prepare_envelopes
 from monasca_events_api.app.core.model import prepare_message_to_sent
+from monasca_events_api.app.core.model import prepare_raw_message_to_sent
+from monasca_events_api import conf
 
 LOG = log.getLogger(__name__)
+CONF = conf.CONF
 
 
 class Events(object):
@@ -32,18 +44,55 @@ class Events(object):
     Works as getaway for any further processing for accepted data.
     """
     VERSION = 'v1.0'
-    SUPPORTED_CONTENT_TYPES = {'application/json'}
+    NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+    SUPPORTED_CONTENT_TYPES = ({'application/json', NDJSON_CONTENT_TYPE} |
+                               set(binary_codec.CONTENT_TYPES))
+    TIMESTAMP_PARAM = 'timestamp'
+    ACKS_HEADER = 'X-Events-Acks'
+    RESULTS_HEADER = 'X-Events-Results'
+    RESULTS_BULK = 'bulk'
+    RESULTS_PER_EVENT = 'per-event'
 
     def __init__(self):
         super(Events, self).__init__()
 
         self._processor = bulk_processor.EventsBulkProcessor()
+        # missing library is reported at startup, not by the first request
+        payload_validation.get_validator()
 
     def on_post(self, req, res):
         """Accepts sent events as json.
 
         Accepts events sent to resource which should be sent
-        to Kafka queue.
+        to Kafka queue. If events are published asynchronously
+        (see ``[events_publisher]async_publish``), request is answered
+        with 202 as soon as events are enqueued for publishing.
+        If ``[serialization]passthrough_ingestion`` is enabled, events are
+        sliced out of the request body instead of being decoded.
+        If ``[serialization]streaming_ingestion`` is enabled, events are
+        read and published one part after another instead of reading
+        the whole body first.
+        Client may request acknowledgement level of the events with
+        ``X-Events-Acks`` header. Body compressed with gzip, deflate
+        or zstd (see ``Content-Encoding``) is decompressed while it is
+        read.
+
+        By default, bulk is accepted or rejected as a whole. If
+        ``X-Events-Results`` header is ``per-event``, malformed events
+        are rejected one by one and request is answered with 207 and
+        outcome of each event, so client can resend only those that
+        failed to be published.
+
+        Body of ``application/x-ndjson`` type holds one event envelope
+        per line. Shared timestamp is sent in ``timestamp`` query
+        parameter or in the first line. Lines are always read and
+        published as they are received and, unless ``X-Events-Results``
+        is ``bulk``, malformed line rejects only itself.
+
+        Body of ``application/msgpack`` or ``application/cbor`` type is
+        decoded into the same structure as JSON body, always as a whole.
+        Its events are forwarded as JSON unless
+        ``[serialization]forward_binary`` is set.
 
         :param req: current request
         :param res: current response
@@ -51,12 +100,57 @@ class Events(object):
         policy_action = 'events_api:agent_required'
 
         try:
-            request_body = helpers.read_json_msg_body(req)
-            req.can(policy_action)
-            body_validation.validate_body(request_body)
-            messages = prepare_message_to_sent(request_body)
-            self._processor.send_message(messages)
-            res.status = falcon.HTTP_200
+            acks = self._get_requested_acks(req)
+            ndjson = req.content_type == self.NDJSON_CONTENT_TYPE
+            results = self._get_requested_results(
+                req, self.RESULTS_PER_EVENT if ndjson else self.RESULTS_BULK)
+            codec = self._get_binary_codec(req)
+            if codec is not None:
+                messages, envelopes = self._read_binary_events(
+                    req, policy_action, codec, results)
+                self._processor.send_message(messages, envelopes, acks,
+                                             results)
+                count = len(messages)
+            elif ndjson:
+                req.can(policy_action)
+                events = NdjsonStream(
+                    helpers.get_body_stream(req, req.bounded_stream),
+                    timestamp=req.get_param(self.TIMESTAMP_PARAM),
+                    passthrough=CONF.serialization.passthrough_ingestion,
+                    event_members=self._processor.event_members,
+                    results=results,
+                    chunk_size=CONF.serialization.streaming_chunk_size)
+                self._processor.send_stream(events, acks, results)
+                count = events.count
+            elif CONF.serialization.streaming_ingestion:
+                req.can(policy_action)
+                events = EventStream(
+                    helpers.get_body_stream(req, req.bounded_stream),
+                    passthrough=CONF.serialization.passthrough_ingestion,
+                    event_members=self._processor.event_members,
+                    results=results,
+                    chunk_size=CONF.serialization.streaming_chunk_size)
+                self._processor.send_stream(events, acks, results)
+                count = events.count
+            else:
+                messages, envelopes = self._read_events(req, policy_action,
+                                                        results)
+                self._processor.send_message(messages, envelopes, acks,
+                                             results)
+                count = len(messages)
+            if results is not None:
+                res.body = rest_utils.as_json(results.to_dict(count))
+                res.status = falcon.HTTP_207
+            else:
+                res.status = (falcon.HTTP_202
+                              if CONF.events_publisher.async_publish
+                              else falcon.HTTP_200)
+        except falcon.HTTPError:
+            raise
+        except decompression.DecompressedBodyTooLarge as ex:
+            LOG.error('Entire bulk package was rejected, decompressed '
+                      'body is too large')
+            raise helpers.body_too_large(ex)
         except MultipleInvalid as ex:
             LOG.error('Entire bulk package was rejected, unsupported body')
             LOG.exception(ex)
@@ -66,6 +160,89 @@ class Events(object):
             LOG.exception(ex)
             res.status = falcon.HTTP_400
 
+    def _read_events(self, req, policy_action, results):
+        if CONF.serialization.passthrough_ingestion:
+            request_body = helpers.read_msg_body(req)
+            req.can(policy_action)
+            return prepare_raw_message_to_sent(
+                request_body, self._processor.event_members, results)
+        request_body = helpers.read_json_msg_body(req)
+        req.can(policy_action)
+        body_validation.validate_body(request_body, results)
+        messages = prepare_message_to_sent(request_body, results)
+        return messages, prepare_envelopes(request_body, messages)
+
+    @staticmethod
+    def _get_binary_codec(req):
+        content_type = req.content_type
+        if content_type not in binary_codec.CONTENT_TYPES:
+            return None
+        codec = binary_codec.get_codec(content_type)
+        if codec is None:
+            raise falcon.HTTPUnsupportedMediaType(
+                description='%s bodies are not accepted' % content_type)
+        return codec
+
+    @staticmethod
+    def _read_binary_events(req, policy_action, codec, results):
+        request_body = helpers.read_binary_msg_body(req, codec)
+        req.can(policy_action)
+        body_validation.validate_body(request_body, results)
+        messages = prepare_message_to_sent(request_body, results)
+        if not CONF.serialization.forward_binary:
+            Events._reject_bytes(messages, results)
+        envelopes = prepare_envelopes(request_body, messages)
+        if CONF.serialization.forward_binary:
+            messages = [None if message is None
+                        else codec.dumps(dict(message))
+                        for message in messages]
+        return messages, envelopes
+
+    @staticmethod
+    def _reject_bytes(messages, results):
+        """Rejects events holding byte strings, they cannot be forwarded
+        as JSON.
+
+        :param list messages: events prepared out of the binary body,
+                              rejected ones are replaced with None
+        :param results: results of the bulk, if None whole bulk fails
+        :exception: :py:exc:`voluptuous.MultipleInvalid` if event holds
+                    byte string and results are not collected
+        """
+        for index, message in enumerate(messages):
+            if message is None:
+                continue
+            path = binary_codec.find_bytes(message.event)
+            if path is None:
+                continue
+            if results is None:
+                raise body_validation.invalid(
+                    body_validation.EVENT_HOLDS_BYTES,
+                    'events', index, 'event', *path)
+            results.reject(index, body_validation.EVENT_HOLDS_BYTES)
+            messages[index] = None
+
+    def _get_requested_acks(self, req):
+        acks = req.get_header(self.ACKS_HEADER)
+        if acks is not None and acks not in producers.ACKS:
+            raise falcon.HTTPBadRequest(
+                'Bad request',
+                '%s must be one of: %s' % (self.ACKS_HEADER,
+                                           ', '.join(producers.ACKS)))
+        return acks
+
+    def _get_requested_results(self, req, default):
+        mode = req.get_header(self.RESULTS_HEADER) or default
+        if mode == self.RESULTS_PER_EVENT:
+            return bulk_results.BulkResults()
+        if mode != self.RESULTS_BULK:
+            raise falcon.HTTPBadRequest(
+                'Bad request',
+                '%s must be one of: %s, %s' % (self.RESULTS_HEADER,
+                                               self.RESULTS_BULK,
+                                               self.RESULTS_PER_EVENT))
+        return None
+
     @property
     def version(self):
         return getattr(self, 'VERSION')
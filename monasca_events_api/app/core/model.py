@@ -12,17 +12,691 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import re
 
-def prepare_message_to_sent(body):
+try:
+    from collections import abc as collections_abc
+except ImportError:  # python 2
+    import collections as collections_abc
+
+from voluptuous import Invalid
+from voluptuous import MultipleInvalid
+
+from monasca_events_api.app.common import json_codec
+from monasca_events_api.app.common import json_scanner
+from monasca_events_api.app.common import payload_validation
+from monasca_events_api.app.controller.v1 import body_validation
+from monasca_events_api.app.model import envelope as envelope_model
+
+# event type is usually the first member of an event, it is then found
+# without scanning the event member by member
+_LEADING_EVENT_TYPE = re.compile(
+    br'\{[ \t\n\r]*"event_type"[ \t\n\r]*:[ \t\n\r]*'
+    br'("[^"\\]*(?:\\.[^"\\]*)*")')
+_EVENT_TYPE_ONLY = frozenset(['event_type'])
+
+_MALFORMED_ENVELOPE = 'Event envelope is not valid JSON'
+
+TIMESTAMP_FIELD = 'timestamp'
+"""Member of outgoing events holding timestamp of the bulk as received"""
+UTC_FIELD = 'timestamp_utc'
+"""Member of outgoing events holding timestamp normalized to UTC"""
+EPOCH_MS_FIELD = 'timestamp_ms'
+"""Member of outgoing events holding timestamp in ms since the epoch"""
+_ATTACHED_FIELDS = (TIMESTAMP_FIELD, UTC_FIELD, EPOCH_MS_FIELD)
+
+# header line of newline delimited bulk starts with the timestamp
+_HEADER_LINE = re.compile(br'\{[ \t]*"timestamp"')
+
+
+def prepare_message_to_sent(body, results=None):
     """prepare_message_to_sent convert message to proper format,
 
+    If results are collected, malformed envelopes are rejected one by
+    one (see :py:func:`body_validation.find_envelope_error`) instead of
+    failing the whole body. Rejected events are None. Otherwise body
+    is expected to be validated already.
+
+    Events are neither copied nor modified, each is wrapped in
+    :py:class:`TimestampedEvent` sharing timestamp of the bulk.
+
     :param dict body: original request body
-    :return dict: prepared message for publish to kafka
+    :param results: results of the bulk
+    :type results: monasca_events_api.app.common.bulk_results.BulkResults
+    :return list: prepared messages for publish to kafka
     """
-    timestamp = body['timestamp']
+    timestamp = BulkTimestamp(body['timestamp'])
+    if results is None:
+        return [TimestampedEvent(envelope['event'], timestamp)
+                for envelope in body['events']]
+
     final_body = []
-    for events in body['events']:
-        ev = events['event'].copy()
-        ev.update({'timestamp': timestamp})
-        final_body.append(ev)
+    payload_validator = payload_validation.get_validator()
+    for index, envelope in enumerate(body['events']):
+        error = body_validation.find_envelope_error(envelope,
+                                                    payload_validator)
+        if error is not None:
+            results.reject(index, error[1])
+            final_body.append(None)
+            continue
+        final_body.append(TimestampedEvent(envelope['event'], timestamp))
     return final_body
+
+
+def prepare_envelopes(body, messages):
+    """Creates envelopes of the events prepared out of the body.
+
+    :param dict body: original request body
+    :param list messages: events prepared with
+                          :py:func:`prepare_message_to_sent`
+    :return: envelopes, None for rejected events
+    :rtype: list
+    """
+    return [None if message is None else
+            envelope_model.Envelope.from_dict(envelope, message.timestamp)
+            for envelope, message in zip(body['events'], messages)]
+
+
+class BulkTimestamp(object):
+    """Timestamp shared by all events of the bulk.
+
+    It is parsed and normalized to UTC once per bulk, see
+    :py:func:`body_validation.parse_timestamp`, and encoded once per
+    bulk as suffix closing each serialized event (see
+    :py:func:`_timestamp_suffix`). Received timestamp is kept as it is.
+
+    :param str timestamp: received timestamp, if None it is expected to
+                          be parsed later
+    :exception: :py:exc:`voluptuous.MultipleInvalid` if timestamp is
+                not valid
+    """
+
+    __slots__ = ('value', 'utc', 'epoch_ms', 'codec', 'suffix')
+
+    def __init__(self, timestamp=None):
+        self.value = None
+        self.utc = None
+        self.epoch_ms = None
+        self.codec = None
+        self.suffix = None
+        if timestamp is not None:
+            self.parse(timestamp)
+
+    def parse(self, timestamp):
+        """Parses received timestamp.
+
+        :param str timestamp: received timestamp
+        :exception: :py:exc:`voluptuous.MultipleInvalid` if timestamp is
+                    not valid
+        """
+        self.utc, self.epoch_ms = body_validation.parse_timestamp(
+            timestamp)
+        self.value = timestamp
+        self.codec = None
+
+    def encode(self, codec):
+        """Encodes timestamp suffix with the codec."""
+        self.suffix = _timestamp_suffix(codec.dumps(self.value),
+                                        codec.dumps(self.utc),
+                                        self.epoch_ms)
+        self.codec = codec
+
+
+class TimestampedEvent(collections_abc.Mapping):
+    """Received event with timestamp of the bulk attached.
+
+    Read-only view of the event, which is not copied. Received
+    timestamp (``timestamp``), timestamp normalized to UTC
+    (``timestamp_utc``) and milliseconds since the epoch
+    (``timestamp_ms``) are attached only when the event is serialized,
+    pre-encoded suffix of the bulk replaces closing brace of the
+    serialized event.
+
+    :param dict event: received event
+    :param BulkTimestamp timestamp: timestamp of the bulk
+    """
+
+    __slots__ = ('event', 'timestamp')
+
+    def __init__(self, event, timestamp):
+        self.event = event
+        self.timestamp = timestamp
+
+    def __getitem__(self, key):
+        if key == TIMESTAMP_FIELD:
+            return self.timestamp.value
+        if key == UTC_FIELD:
+            return self.timestamp.utc
+        if key == EPOCH_MS_FIELD:
+            return self.timestamp.epoch_ms
+        return self.event[key]
+
+    def __iter__(self):
+        for key in self.event:
+            if key not in _ATTACHED_FIELDS:
+                yield key
+        for key in _ATTACHED_FIELDS:
+            yield key
+
+    def __len__(self):
+        event = self.event
+        return len(event) + sum(1 for key in _ATTACHED_FIELDS
+                                if key not in event)
+
+    def serialize(self, codec):
+        """Serializes event with the timestamp.
+
+        :param codec: codec of JSON documents
+        :type codec: monasca_events_api.app.common.json_codec.JsonCodec
+        :rtype: bytes
+        """
+        event = self.event
+        if any(key in event for key in _ATTACHED_FIELDS):
+            # timestamp of the bulk replaces the one of the event
+            return codec.dumps(dict(self))
+        timestamp = self.timestamp
+        if timestamp.codec is not codec:
+            timestamp.encode(codec)
+        data = codec.dumps(event)
+        if data == b'{}':
+            return b'{' + timestamp.suffix[1:]
+        return data[:-1] + timestamp.suffix
+
+
+def prepare_raw_message_to_sent(body, event_members=('event_type',),
+                                results=None):
+    """Slices events out of raw request body.
+
+    Counterpart of :py:func:`prepare_message_to_sent` that never decodes
+    the events. Body is scanned for boundaries of the events and shared
+    ``timestamp`` is spliced into each of them, so events are forwarded
+    byte for byte as they were received. Envelope members other than
+    ``event`` (i.e. ``project_id`` or ``dimensions``) are small and are
+    decoded. Of the event, only string event_members are decoded. They are
+    used to compute partition keys, route events to topics and find
+    duplicated events.
+
+    :param bytes body: original request body
+    :param tuple event_members: members of the events to decode
+    :param results: results of the bulk, if given malformed envelopes
+                    are rejected one by one and their events are None
+    :type results: monasca_events_api.app.common.bulk_results.BulkResults
+    :return: tuple of prepared messages (list of bytes) and envelopes
+             (list of envelopes, ``event`` holds only event_members,
+             None for rejected events), see
+             :py:class:`monasca_events_api.app.model.envelope.Envelope`
+    :exception: :py:exc:`voluptuous.MultipleInvalid` if required field
+                is missing or has wrong type,
+                :py:exc:`ValueError` if body is malformed
+    """
+    return _RawBulk(body, event_members, results).prepare()
+
+
+class _RawBulk(object):
+    """Single pass over raw bulk, see :py:func:`prepare_raw_message_to_sent`.
+
+    """
+
+    def __init__(self, body, event_members=('event_type',), results=None,
+                 timestamp=None):
+        self._body = body
+        self._event_members = frozenset(event_members)
+        self._results = results
+        self._codec = json_codec.get_codec()
+        self._members = {}
+        self._events = []
+        self._envelopes = []
+        self._envelope = None
+        self._attached = False
+        # timestamp might follow events, it is set once body is scanned
+        self._timestamp = timestamp or BulkTimestamp(None)
+
+    def prepare(self):
+        body = self._body
+        pos = json_scanner.skip_whitespace(body, 0)
+        end = json_scanner.scan_object(body, pos, self._scan_member)
+        if json_scanner.skip_whitespace(body, end) != len(body):
+            raise ValueError('Extra data after request body')
+        _require(self._members)
+
+        start, end = self._members['timestamp']
+        self._timestamp.parse(json_scanner.decode_string(body, start, end))
+        self._timestamp.encode(self._codec)
+        suffix = self._timestamp.suffix
+        final_body = [None if event is None else self._splice(event, suffix)
+                      for event in self._events]
+        return final_body, self._envelopes
+
+    def prepare_envelope(self, suffix):
+        """Prepares envelope making up the whole body.
+
+        :param bytes suffix: timestamp suffix, see
+                             :py:func:`_timestamp_suffix`
+        :return: tuple of prepared message (None if rejected) and envelope
+        """
+        body = self._body
+        end = self._scan_envelope(json_scanner.skip_whitespace(body, 0))
+        if json_scanner.skip_whitespace(body, end) != len(body):
+            raise ValueError('Extra data after event envelope')
+        event = self._events[0]
+        message = None if event is None else self._splice(event, suffix)
+        return message, self._envelopes[0]
+
+    def _splice(self, event, suffix):
+        start, end, attached = event
+        if attached:
+            # event holds members attached to it, they are replaced as
+            # when the event is decoded, splicing would duplicate them
+            return TimestampedEvent(self._codec.loads(self._body[start:end]),
+                                    self._timestamp).serialize(self._codec)
+        return _splice(self._body, start, end, suffix)
+
+    def _scan_member(self, key, start):
+        body = self._body
+        if key == 'timestamp':
+            self._expect_type(key, start, b'"', 'str')
+            end = json_scanner.skip_value(body, start)
+        elif key == 'events':
+            self._expect_type(key, start, b'[', 'list')
+            end = json_scanner.scan_array(body, start, self._scan_envelope)
+        else:
+            end = json_scanner.skip_value(body, start)
+        self._members[key] = (start, end)
+        return end
+
+    def _scan_envelope(self, start):
+        self._envelope = {}
+        index = len(self._envelopes)
+        self._envelopes.append(None)
+        if self._body[start:start + 1] != b'{':
+            self._reject(index, (None, body_validation.ENVELOPE_NOT_OBJECT))
+            return json_scanner.skip_value(self._body, start)
+
+        events_count = len(self._events)
+        end = json_scanner.scan_object(self._body, start,
+                                       self._scan_envelope_member)
+        if len(self._events) == events_count:
+            self._reject(index, ('event', body_validation.NO_EVENT))
+            return end
+        # last of duplicated members wins, as it does when decoding
+        del self._events[events_count:-1]
+        if self._events[-1] is None:
+            self._events.pop()
+            self._reject(index, ('event', body_validation.EVENT_NOT_OBJECT))
+            return end
+        error = body_validation.find_member_error(self._envelope)
+        if error is not None:
+            self._events.pop()
+            self._reject(index, error)
+            return end
+        self._envelopes[index] = envelope_model.Envelope.from_dict(
+            self._envelope, self._timestamp)
+        return end
+
+    def _reject(self, index, error):
+        if self._results is None:
+            raise body_validation.invalid_envelope(index, error)
+        self._results.reject(index, error[1])
+        self._events.append(None)
+
+    def _scan_envelope_member(self, key, start):
+        body = self._body
+        if key != 'event':
+            end = json_scanner.skip_value(body, start)
+            self._envelope[key] = self._codec.loads(body[start:end])
+            return end
+        if body[start:start + 1] != b'{':
+            self._events.append(None)
+            return json_scanner.skip_value(body, start)
+        event = self._envelope['event'] = {}
+        self._attached = False
+        match = None
+        if self._event_members == _EVENT_TYPE_ONLY:
+            match = _LEADING_EVENT_TYPE.match(body, start)
+        if match is not None:
+            end = json_scanner.skip_value(body, start)
+            if _may_hold_attached(body, start, end):
+                match = None
+        if match is not None:
+            event['event_type'] = json_scanner.decode_string(
+                body, match.start(1), match.end(1))
+        else:
+            end = json_scanner.scan_object(
+                body, start,
+                lambda name, value_start: self._scan_event_member(
+                    event, name, value_start))
+        self._events.append((start, end, self._attached))
+        return end
+
+    def _scan_event_member(self, event, key, start):
+        body = self._body
+        end = json_scanner.skip_value(body, start)
+        if key in _ATTACHED_FIELDS:
+            self._attached = True
+        if key in self._event_members and body[start:start + 1] == b'"':
+            event[key] = json_scanner.decode_string(body, start, end)
+        return end
+
+    def _expect_type(self, key, start, first_char, type_name):
+        _expect_type(self._body, key, start, first_char, type_name)
+
+
+def _expect_type(body, key, start, first_char, type_name):
+    if body[start:start + 1] != first_char:
+        raise MultipleInvalid([Invalid('expected %s' % type_name,
+                                       path=[key])])
+
+
+def _require(members):
+    for name in ('timestamp', 'events'):
+        if name not in members:
+            raise _missing(name)
+
+
+def _missing(name):
+    return MultipleInvalid([Invalid('required key not provided',
+                                    path=[name])])
+
+
+def _timestamp_suffix(raw_timestamp, raw_utc, epoch_ms):
+    """Returns bytes closing each event with shared timestamp and epoch."""
+    return (b',"timestamp":' + raw_timestamp + b',"timestamp_utc":' +
+            raw_utc + b',"timestamp_ms":' + str(epoch_ms).encode('ascii') +
+            b'}')
+
+
+def _may_hold_attached(body, start, end):
+    """Tells if event at body[start:end] might hold attached members.
+
+    Names of all attached members start with ``timestamp``. Escaped
+    names are decoded only by scanning the event.
+    """
+    return (body.find(b'"timestamp', start, end) != -1 or
+            body.find(b'\\u', start, end) != -1)
+
+
+def _splice(body, start, end, suffix):
+    if json_scanner.skip_whitespace(body, start + 1) == end - 1:
+        # empty event, there is nothing to separate timestamp from
+        return b'{' + suffix[1:]
+    return body[start:end - 1] + suffix
+
+
+class EventStream(object):
+    """Reads events of request body one at a time.
+
+    Body is read in chunks. Each event envelope is handed over as soon
+    as it has been received, only the envelope being received is kept
+    in memory. Events are prepared as by
+    :py:func:`prepare_message_to_sent` or, if passthrough is set,
+    :py:func:`prepare_raw_message_to_sent`.
+
+    Events can be prepared only once shared timestamp is known. If
+    timestamp follows the events in the body, events are held until
+    it is read.
+
+    Iterating yields tuples of prepared message (None if rejected),
+    envelope (None if rejected) and number of bytes envelope took in
+    the body, see :py:class:`monasca_events_api.app.model.envelope.Envelope`.
+
+    :param stream: file-like object body is read from
+    :param bool passthrough: if events should be forwarded as they
+                             were received
+    :param tuple event_members: members of the events to decode in
+                                pass-through mode
+    :param results: results of the bulk, if given malformed envelopes
+                    are rejected one by one
+    :type results: monasca_events_api.app.common.bulk_results.BulkResults
+    :param int chunk_size: size of chunks body is read in
+    :exception: :py:exc:`voluptuous.MultipleInvalid` if required field
+                is missing or has wrong type,
+                :py:exc:`ValueError` if body is malformed
+    """
+
+    def __init__(self, stream, passthrough=False,
+                 event_members=('event_type',), results=None,
+                 chunk_size=64 * 1024):
+        self._stream = stream
+        self._passthrough = passthrough
+        self._event_members = event_members
+        self._results = results
+        self._chunk_size = chunk_size
+        self._codec = json_codec.get_codec()
+        self._buf = b''
+        self._pos = 0
+        self._eof = False
+        self._timestamp = None
+        self._bulk_timestamp = None
+        self._suffix = None
+        # events are not decoded in pass-through mode
+        self._payload_validator = (None if passthrough else
+                                   payload_validation.get_validator())
+        self.count = 0
+        """Number of events read so far"""
+
+    def __iter__(self):
+        members = set()
+        pending = []
+        closed = self._read(_open_container, b'{')
+        while not closed:
+            name = self._read(_read_member_name)
+            if name in members and name in ('timestamp', 'events'):
+                raise ValueError('Duplicated %s' % name)
+            members.add(name)
+            if name == 'events':
+                for raw in self._read_envelopes():
+                    if self._timestamp is None:
+                        pending.append(raw)
+                    else:
+                        yield self._prepare(raw)
+            else:
+                raw = self._read_value()
+                if name == 'timestamp':
+                    _expect_type(raw, name, 0, b'"', 'str')
+                    self._timestamp = json_scanner.decode_string(
+                        raw, 0, len(raw))
+                    self._bulk_timestamp = BulkTimestamp(self._timestamp)
+                    self._bulk_timestamp.encode(self._codec)
+                    self._suffix = self._bulk_timestamp.suffix
+            closed = self._read(json_scanner.skip_separator, b'}')
+
+        self._read_end()
+        _require(members)
+        for raw in pending:
+            yield self._prepare(raw)
+
+    def _read_envelopes(self):
+        closed = self._read(_open_container, b'[', 'events')
+        while not closed:
+            yield self._read_value()
+            closed = self._read(json_scanner.skip_separator, b']')
+
+    def _read_value(self):
+        start = self._read(_skip_value)
+        return self._buf[start:self._pos]
+
+    def _read(self, step, *args):
+        """Runs step from current position until it completes.
+
+        Step is called with buffer, position and args. It returns
+        tuple of new position and its result. Step that reaches the end
+        of buffer is repeated once more data is read.
+        """
+        while True:
+            try:
+                self._pos, result = step(self._buf, self._pos, *args)
+                return result
+            except json_scanner.IncompleteDocument:
+                if self._eof:
+                    raise ValueError('Request body is incomplete')
+                self._read_chunk()
+
+    def _read_chunk(self):
+        chunk = self._stream.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+        # data preceding current position has been processed already
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+
+    def _read_end(self):
+        while True:
+            self._pos = json_scanner.skip_whitespace(self._buf, self._pos)
+            if self._pos != len(self._buf):
+                raise ValueError('Extra data after request body')
+            if self._eof:
+                return
+            self._read_chunk()
+
+    def _prepare(self, raw):
+        results = None
+        if self._results is not None:
+            results = self._results.shifted(self.count)
+        self.count += 1
+        # envelopes that are not objects are rejected as when decoded
+        if self._passthrough and raw[:1] == b'{':
+            message, envelope = _RawBulk(
+                raw, self._event_members, results,
+                self._bulk_timestamp).prepare_envelope(self._suffix)
+            return message, envelope, len(raw)
+
+        envelope = self._codec.loads(raw)
+        error = body_validation.find_envelope_error(envelope,
+                                                    self._payload_validator)
+        if error is not None:
+            if results is None:
+                raise body_validation.invalid_envelope(self.count - 1,
+                                                       error)
+            results.reject(0, error[1])
+            return None, None, len(raw)
+        message = TimestampedEvent(envelope['event'], self._bulk_timestamp)
+        return (message, envelope_model.Envelope.from_dict(
+            envelope, self._bulk_timestamp), len(raw))
+
+
+class NdjsonStream(EventStream):
+    """Reads events of newline delimited JSON body one at a time.
+
+    Each line of the body holds a single event envelope, blank lines
+    are skipped. Shared timestamp is either given up front (i.e. in
+    query string) or sent in the first line as an object with
+    ``timestamp`` and without ``event`` member (header line).
+
+    Lines are prepared as envelopes of :py:class:`EventStream` are,
+    one by one as soon as they have been received. If results are
+    collected, malformed line is rejected on its own, otherwise it
+    fails the whole body.
+
+    :param stream: file-like object body is read from
+    :param str timestamp: shared timestamp, if None it is expected in
+                          the header line
+    :param bool passthrough: if events should be forwarded as they
+                             were received
+    :param tuple event_members: members of the events to decode in
+                                pass-through mode
+    :param results: results of the bulk
+    :type results: monasca_events_api.app.common.bulk_results.BulkResults
+    :param int chunk_size: size of chunks body is read in
+    :exception: :py:exc:`voluptuous.MultipleInvalid` if timestamp is
+                missing or is not a string,
+                :py:exc:`ValueError` if line is malformed
+    """
+
+    def __init__(self, stream, timestamp=None, passthrough=False,
+                 event_members=('event_type',), results=None,
+                 chunk_size=64 * 1024):
+        super(NdjsonStream, self).__init__(stream, passthrough,
+                                           event_members, results,
+                                           chunk_size)
+        if timestamp is not None:
+            self._set_timestamp(timestamp)
+
+    def __iter__(self):
+        for line in self._read_lines():
+            line = line.strip()
+            if not line:
+                continue
+            if self._timestamp is None:
+                if self._read_header(line):
+                    continue
+                raise _missing('timestamp')
+            yield self._prepare_line(line)
+        if self._timestamp is None:
+            raise _missing('timestamp')
+
+    def _read_lines(self):
+        searched = self._pos
+        while True:
+            end = self._buf.find(b'\n', searched)
+            if end >= 0:
+                line = self._buf[self._pos:end]
+                self._pos = searched = end + 1
+                yield line
+            elif not self._eof:
+                searched = len(self._buf) - self._pos
+                self._read_chunk()
+            else:
+                if self._pos < len(self._buf):
+                    line = self._buf[self._pos:]
+                    self._pos = len(self._buf)
+                    yield line
+                return
+
+    def _read_header(self, line):
+        if _HEADER_LINE.match(line) is None:
+            return False
+        header = self._codec.loads(line)
+        if not isinstance(header, dict) or 'event' in header:
+            return False
+        self._set_timestamp(header['timestamp'])
+        return True
+
+    def _set_timestamp(self, timestamp):
+        self._bulk_timestamp = BulkTimestamp(timestamp)
+        self._bulk_timestamp.encode(self._codec)
+        self._timestamp = timestamp
+        self._suffix = self._bulk_timestamp.suffix
+
+    def _prepare_line(self, line):
+        index = self.count
+        try:
+            return self._prepare(line)
+        except ValueError:
+            if self._results is None:
+                raise
+            self.count = index + 1
+            self._results.reject(index, _MALFORMED_ENVELOPE)
+            return None, None, len(line)
+
+
+def _open_container(buf, pos, opening, name=None):
+    pos = json_scanner.skip_whitespace(buf, pos)
+    char = buf[pos:pos + 1]
+    if not char:
+        raise json_scanner.IncompleteDocument('Expected %r' % opening)
+    if char != opening:
+        if name is not None:
+            _expect_type(buf, name, pos, opening, 'list')
+        raise ValueError('Expected %r at %d, found %r' % (opening, pos, char))
+    pos = json_scanner.skip_whitespace(buf, pos + 1)
+    if pos == len(buf):
+        # cannot tell if container is empty yet
+        raise json_scanner.IncompleteDocument('Expected value')
+    closing = b'}' if opening == b'{' else b']'
+    if buf[pos:pos + 1] == closing:
+        return pos + 1, True
+    return pos, False
+
+
+# steps start with whitespace, previous step might have skipped only
+# part of it before the end of buffer
+
+
+def _read_member_name(buf, pos):
+    return json_scanner.read_member_name(
+        buf, json_scanner.skip_whitespace(buf, pos))
+
+
+def _skip_value(buf, pos):
+    pos = json_scanner.skip_whitespace(buf, pos)
+    return json_scanner.skip_value(buf, pos), pos
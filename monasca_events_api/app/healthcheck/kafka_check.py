@@ -14,9 +14,9 @@
 
 import collections
 
-from monasca_common.kafka_lib import client
 from oslo_log import log
 
+from monasca_events_api.app.common import producers
 from monasca_events_api import conf
 
 LOG = log.getLogger(__name__)
@@ -38,6 +38,10 @@ class KafkaHealthCheck(object):
     If following conditions are met healthcheck returns healthy status.
     Otherwise unhealthy status is returned with explanation.
 
+    Check uses kafka client of a producer from the pool shared with
+    the api (see :py:func:`.producers.get_pool`), so it does not
+    connect to kafka on every call.
+
      Example of middleware configuration:
 
     .. code-block:: ini
@@ -56,39 +60,28 @@ class KafkaHealthCheck(object):
         url = CONF.events_publisher.kafka_url
 
         try:
-            kafka_client = client.KafkaClient(hosts=url)
-        except client.KafkaUnavailableError as ex:
+            with producers.get_pool().producer() as kafka_producer:
+                # producer is shared with the api, reuse its connections
+                # and just refresh metadata
+                kafka_client = kafka_producer._kafka
+                kafka_client.load_metadata_for_topics()
+                return self._verify_topics(kafka_client)
+        except producers.ProducerPoolTimeout as ex:
+            LOG.error(repr(ex))
+            return CheckResult(healthy=False, message=str(ex))
+        except Exception as ex:
             LOG.error(repr(ex))
             error_str = 'Could not connect to kafka at %s' % url
             return CheckResult(healthy=False, message=error_str)
 
-        result = self._verify_topics(kafka_client)
-        self._disconnect_gracefully(kafka_client)
-
-        return result
-
     # noinspection PyMethodMayBeStatic
     def _verify_topics(self, kafka_client):
         topics = CONF.events_publisher.topics
 
         for t in topics:
-            # kafka client loads metadata for topics as fast
-            # as possible (happens in __init__), therefore this
-            # topic_partitions is sure to be filled
-            for_topic = t in kafka_client.topic_partitions
-            if not for_topic:
+            if not kafka_client.has_metadata_for_topic(t):
                 error_str = 'Kafka: Topic %s not found' % t
                 LOG.error(error_str)
                 return CheckResult(healthy=False, message=error_str)
 
         return CheckResult(healthy=True, message='OK')
-
-    # noinspection PyMethodMayBeStatic
-    def _disconnect_gracefully(self, kafka_client):
-        # at this point, client is connected so it must be closed
-        # regardless of topic existence
-        try:
-            kafka_client.close()
-        except Exception as ex:
-            # log that something went wrong and move on
-            LOG.error(repr(ex))
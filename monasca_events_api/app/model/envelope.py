@@ -12,6 +12,78 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import sys
+
+MEMBERS = ('event', 'project_id', 'dimensions', 'timestamp')
+"""Members of event envelope"""
+
+try:
+    _intern = sys.intern
+except AttributeError:  # python 2 cannot intern unicode keys
+    def _intern(key):
+        return key
+
 
 class EventsEnvelopeException(Exception):
     pass
+
+
+class Envelope(object):
+    """Event received in the bulk together with members of its envelope.
+
+    Envelope is created once the event has been validated and it is
+    what routing, partitioning and deduplication of the event read. It
+    keeps only documented members, in slots, instead of the received
+    dict. Keys of dimensions are interned, as the same few dimension
+    names repeat in every envelope of a bulk.
+
+    :param dict event: received event, in pass-through mode only its
+                       decoded members
+    :param str project_id: project event belongs to
+    :param dict dimensions: dimensions of the event
+    :param timestamp: timestamp of the bulk
+    :type timestamp: monasca_events_api.app.core.model.BulkTimestamp
+    """
+
+    __slots__ = ('event', 'project_id', 'dimensions', '_timestamp')
+
+    def __init__(self, event, project_id=None, dimensions=None,
+                 timestamp=None):
+        self.event = event
+        self.project_id = project_id
+        self.dimensions = (dimensions and
+                           {_intern(k): v for k, v in dimensions.items()})
+        self._timestamp = timestamp
+
+    @classmethod
+    def from_dict(cls, envelope, timestamp=None):
+        """Creates envelope out of received (and validated) one.
+
+        :param dict envelope: received envelope
+        :param timestamp: timestamp of the bulk
+        :type timestamp: monasca_events_api.app.core.model.BulkTimestamp
+        :rtype: Envelope
+        """
+        return cls(envelope.get('event'), envelope.get('project_id'),
+                   envelope.get('dimensions'), timestamp)
+
+    @property
+    def timestamp(self):
+        """Timestamp of the bulk event has been received in."""
+        return None if self._timestamp is None else self._timestamp.value
+
+    @property
+    def event_type(self):
+        event = self.event
+        return event.get('event_type') if isinstance(event, dict) else None
+
+    def get(self, member, default=None):
+        """Returns member of the envelope, see :py:data:`MEMBERS`."""
+        if member not in MEMBERS:
+            return default
+        value = getattr(self, member)
+        return default if value is None else value
+
+    def __repr__(self):
+        return ('Envelope(event_type=%r, project_id=%r, dimensions=%r)' %
+                (self.event_type, self.project_id, self.dimensions))
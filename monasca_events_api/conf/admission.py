@@ -0,0 +1,55 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslo_config import cfg
+
+admission_opts = [
+    cfg.BoolOpt('enabled',
+                default=False,
+                help='Limit amount of request data each worker holds at '
+                     'once. Requests are admitted only if their bodies fit '
+                     'into the remaining budget, others are rejected '
+                     'before their bodies are read'),
+    cfg.IntOpt('max_inflight_bytes',
+               default=256 * 1024 * 1024,
+               min=1,
+               help='Total size (in bytes) of request bodies processed '
+                    'by a worker at once. Keep in mind that decoded '
+                    'events take several times more memory than their '
+                    'JSON representation'),
+    cfg.IntOpt('unknown_length_bytes',
+               default=1024 * 1024,
+               min=0,
+               help='Size (in bytes) reserved for request without '
+                    'Content-Length, i.e. chunked one'),
+    cfg.IntOpt('rejection_status',
+               default=429,
+               choices=[429, 503],
+               help='Status of rejected requests'),
+    cfg.IntOpt('retry_after',
+               default=1,
+               min=0,
+               help='Retry-After (in seconds) sent with rejected requests')
+]
+
+admission_group = cfg.OptGroup(name='admission', title='admission')
+
+
+def register_opts(conf):
+    conf.register_group(admission_group)
+    conf.register_opts(admission_opts, admission_group)
+
+
+def list_opts():
+    return admission_group, admission_opts
@@ -0,0 +1,67 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslo_config import cfg
+
+circuit_breaker_opts = [
+    cfg.BoolOpt('enabled',
+                default=False,
+                help='Stop publishing to kafka for a while when most of '
+                     'recent publishes failed or were slow. Requests are '
+                     'then rejected immediately with 503 and Retry-After '
+                     'header telling when publishing is resumed'),
+    cfg.IntOpt('window_size',
+               default=20,
+               min=1,
+               help='Number of recent publishes failure rate is '
+                    'computed from'),
+    cfg.IntOpt('min_calls',
+               default=5,
+               min=1,
+               help='Minimal number of publishes within the window '
+                    'to evaluate failure rate'),
+    cfg.FloatOpt('failure_rate',
+                 default=0.5,
+                 min=0,
+                 max=1,
+                 help='Rate of failed publishes opening the breaker'),
+    cfg.FloatOpt('slow_call_duration',
+                 default=5.0,
+                 min=0,
+                 help='Publishes taking longer (in seconds) are counted '
+                      'as failed'),
+    cfg.FloatOpt('open_duration',
+                 default=5.0,
+                 min=0,
+                 help='How long (in seconds) publishing is suspended once '
+                      'the breaker opens. If the first publish afterwards '
+                      'fails, duration is doubled'),
+    cfg.FloatOpt('max_open_duration',
+                 default=60.0,
+                 min=0,
+                 help='Upper limit of how long (in seconds) publishing '
+                      'is suspended')
+]
+
+circuit_breaker_group = cfg.OptGroup(name='circuit_breaker',
+                                     title='circuit_breaker')
+
+
+def register_opts(conf):
+    conf.register_group(circuit_breaker_group)
+    conf.register_opts(circuit_breaker_opts, circuit_breaker_group)
+
+
+def list_opts():
+    return circuit_breaker_group, circuit_breaker_opts
@@ -0,0 +1,64 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslo_config import cfg
+
+dedup_opts = [
+    cfg.BoolOpt('enabled',
+                default=False,
+                help='Drop events that have already been published. '
+                     'Events are identified by message_id of the event '
+                     'or, if it is missing, by hash of the whole event. '
+                     'Protects kafka from bulks retried by the agents'),
+    cfg.IntOpt('max_entries',
+               default=100000,
+               min=1,
+               help='Maximum number of events remembered by each worker. '
+                    'Each entry takes about 160 bytes, least recently '
+                    'seen events are forgotten first'),
+    cfg.IntOpt('ttl',
+               default=600,
+               min=1,
+               help='How long (in seconds) published events are '
+                    'remembered'),
+    cfg.StrOpt('shared_path',
+               help='File holding Bloom filter shared by all workers of '
+                    'the node, preferably in memory backed file system, '
+                    'e.g. /dev/shm/monasca-events-dedup. Workers then '
+                    'drop events published by each other. If not set, '
+                    'each worker remembers only its own events'),
+    cfg.IntOpt('shared_capacity',
+               default=1000000,
+               min=1,
+               help='Number of events published within ttl the shared '
+                    'filter is sized for'),
+    cfg.FloatOpt('shared_false_positive_rate',
+                 default=0.000001,
+                 min=0.000000001,
+                 max=0.1,
+                 help='Probability that unique event is taken for '
+                      'already published one and dropped, as long as '
+                      'shared_capacity is not exceeded')
+]
+
+dedup_group = cfg.OptGroup(name='dedup', title='dedup')
+
+
+def register_opts(conf):
+    conf.register_group(dedup_group)
+    conf.register_opts(dedup_opts, dedup_group)
+
+
+def list_opts():
+    return dedup_group, dedup_opts
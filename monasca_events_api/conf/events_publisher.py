@@ -23,7 +23,128 @@ events_publisher_opts = [
                default="127.0.0.1:9092"),
     cfg.MultiStrOpt('topics',
                     help='Consumer topics',
-                    default=['monevents'],)
+                    default=['monevents'],),
+    cfg.MultiStrOpt('routes',
+                    default=[],
+                    help='Routes of events to topics, each of '
+                         '<topic>:<field>=<pattern> form. Field is '
+                         'event_type, project_id or dimensions.<name>. '
+                         'Event type pattern is either exact event type or '
+                         'prefix followed by wildcard, e.g. '
+                         'compute.instance.* or image.*, other patterns '
+                         'are matched exactly. Topic with routes receives '
+                         'only events matching at least one of them, '
+                         'topics without routes receive all events. '
+                         'Routed topics do not have to be listed in topics'),
+    cfg.StrOpt('partition_key',
+               help='Key events are partitioned by. Events sharing the '
+                    'key land on the same partition of a topic. One of: '
+                    'project_id, instance (uuid of nova instance), '
+                    'dimensions (all dimensions of an event) or dotted '
+                    'path to a value within event envelope, e.g. '
+                    'event.payload.nova_object.data.host. '
+                    'If not set, events are not keyed'),
+    cfg.IntOpt('max_request_size',
+               default=_MAX_MESSAGE_SIZE,
+               min=1024,
+               help='Maximum size (in bytes) of single produce request. '
+                    'Bulks are split into batches that do not exceed it. '
+                    'Should not be greater than message.max.bytes '
+                    'of kafka broker'),
+    cfg.StrOpt('compression_codec',
+               default='none',
+               choices=['none', 'gzip', 'snappy'],
+               help='Compression codec applied to each batch of events '
+                    'produced to kafka. Snappy requires python-snappy'),
+    cfg.IntOpt('compression_level',
+               min=1,
+               max=9,
+               help='Compression level of gzip codec, '
+                    'if not set library default is used'),
+    cfg.StrOpt('acks',
+               default='1',
+               choices=['0', '1', 'all'],
+               help='Acknowledgement required from kafka for each produce '
+                    'request: 0 (none, fastest, events may be lost), '
+                    '1 (leader has written events) or all (all in-sync '
+                    'replicas have written events, slowest). Clients may '
+                    'request stronger level of a bulk with X-Events-Acks '
+                    'header'),
+    cfg.DictOpt('topic_acks',
+                default={},
+                help='Acknowledgement level of particular topics, '
+                     'overrides acks, e.g. audit:all,telemetry:0'),
+    cfg.IntOpt('ack_timeout',
+               default=2000,
+               min=1,
+               help='How long (in milliseconds) kafka waits for required '
+                    'acknowledgements'),
+    cfg.BoolOpt('concurrent_fanout',
+                default=False,
+                help='Publish each bulk to all configured topics '
+                     'concurrently instead of one topic after another. '
+                     'Every topic uses its own producer from the pool, '
+                     'see connection_pool_size'),
+    cfg.IntOpt('connection_pool_size',
+               default=4,
+               min=1,
+               help='Maximum number of kafka producers, each with its own '
+                    'broker connections, shared by all applications of '
+                    'a worker process. Producers are created when needed'),
+    cfg.FloatOpt('connection_pool_timeout',
+                 default=5.0,
+                 min=0,
+                 help='How long (in seconds) to wait for a producer when '
+                      'all of them are in use'),
+    cfg.IntOpt('linger_ms',
+               default=0,
+               min=0,
+               help='How long (in milliseconds) to wait for bulks of other '
+                    'requests and publish them together in a single kafka '
+                    'request. Each request is answered once its own events '
+                    'have been published. Improves throughput when agents '
+                    'send small bulks at the cost of latency. 0 disables '
+                    'merging (not used if async_publish is enabled)'),
+    cfg.IntOpt('max_batch_bytes',
+               default=256 * 1024,
+               min=1,
+               help='Size of merged bulks (in bytes) that are published '
+                    'without waiting for linger_ms to elapse. '
+                    'Never greater than max_request_size'),
+    cfg.BoolOpt('async_publish',
+                default=False,
+                help='Enqueue validated bulks in memory and publish them to '
+                     'kafka in the background. When enabled the API '
+                     'responds with 202 Accepted as soon as the bulk has '
+                     'been enqueued.'),
+    cfg.IntOpt('queue_max_size',
+               default=1000,
+               min=1,
+               help='Maximum number of bulks waiting in the publish queue '
+                    '(used only if async_publish is enabled)'),
+    cfg.IntOpt('queue_max_bytes',
+               default=64 * _MAX_MESSAGE_SIZE,
+               min=1,
+               help='Maximum number of serialized bytes waiting in the '
+                    'publish queue (used only if async_publish is enabled)'),
+    cfg.StrOpt('queue_overflow_policy',
+               default='reject',
+               choices=['block', 'reject', 'drop_oldest'],
+               help='What to do with a new bulk when the publish queue is '
+                    'full: block the request until there is room '
+                    '(at most queue_block_timeout seconds), reject it with '
+                    '503 or drop the oldest bulks waiting in the queue'),
+    cfg.FloatOpt('queue_block_timeout',
+                 default=5.0,
+                 min=0,
+                 help='How long (in seconds) a request waits for room in the '
+                      'publish queue when queue_overflow_policy is block. '
+                      'Request is rejected with 503 once it elapses'),
+    cfg.IntOpt('queue_workers',
+               default=2,
+               min=1,
+               help='Number of background workers draining the publish '
+                    'queue (used only if async_publish is enabled)')
 ]
 
 events_publisher_group = cfg.OptGroup(name='events_publisher',
@@ -0,0 +1,55 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslo_config import cfg
+
+payload_validation_opts = [
+    cfg.BoolOpt('enabled',
+                default=False,
+                help='Validate payloads of the events against JSON schemas '
+                     'of their event types and versions '
+                     '(nova_object.version). Bulk with invalid payload is '
+                     'rejected with 422, with per-event results only the '
+                     'invalid events are rejected. Events received in '
+                     'pass-through mode are not validated. Requires '
+                     'jsonschema library, API fails to start without it'),
+    cfg.StrOpt('schema_dir',
+               default='/etc/monasca/events-schemas',
+               help='Directory holding schemas, '
+                    '<event_type>/<version>.json or <event_type>.json. '
+                    'Events without schema are not validated'),
+    cfg.IntOpt('cache_size',
+               default=512,
+               min=1,
+               help='Maximum number of compiled schemas kept by each '
+                    'worker, least recently used are dropped first'),
+    cfg.FloatOpt('sample_rate',
+                 default=1.0,
+                 min=0.0,
+                 max=1.0,
+                 help='Fraction of the events validated, lower values cap '
+                      'validation cost of frequent event types')
+]
+
+payload_validation_group = cfg.OptGroup(name='payload_validation',
+                                        title='payload_validation')
+
+
+def register_opts(conf):
+    conf.register_group(payload_validation_group)
+    conf.register_opts(payload_validation_opts, payload_validation_group)
+
+
+def list_opts():
+    return payload_validation_group, payload_validation_opts
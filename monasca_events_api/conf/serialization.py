@@ -0,0 +1,78 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslo_config import cfg
+
+serialization_opts = [
+    cfg.StrOpt('json_codec',
+               default='json',
+               choices=['json', 'orjson', 'ujson', 'rapidjson'],
+               help='Library used to decode request bodies and encode '
+                    'events sent to kafka. If selected library is not '
+                    'installed, json from python standard library is used. '
+                    'orjson decodes integers wider than 64 bits as floats, '
+                    'so they lose precision, and cannot encode them'),
+    cfg.BoolOpt('passthrough_ingestion',
+                default=False,
+                help='Forward events to kafka as they were received, '
+                     'without decoding and encoding them again. Request '
+                     'body is only scanned for boundaries of the events '
+                     'and shared timestamp is spliced into each of them. '
+                     'Only structure of the body and required fields are '
+                     'validated, content of the events is not'),
+    cfg.BoolOpt('streaming_ingestion',
+                default=False,
+                help='Read request body in chunks and process its events '
+                     'one at a time. Memory used by a request does not '
+                     'grow with number of its events and events are '
+                     'published while the rest of the body is still being '
+                     'received. Events preceding timestamp of the bulk '
+                     'are held until it is read. Events published before '
+                     'malformed part of the body is found are not '
+                     'withdrawn. Can be combined with '
+                     'passthrough_ingestion'),
+    cfg.IntOpt('streaming_chunk_size',
+               default=64 * 1024,
+               min=1,
+               help='Size (in bytes) of chunks request body is read in '
+                    'when streaming_ingestion is enabled'),
+    cfg.BoolOpt('forward_binary',
+                default=False,
+                help='Forward events received as application/msgpack or '
+                     'application/cbor to kafka in the same format. '
+                     'By default they are encoded as JSON, as events '
+                     'received in any other way. Consumers of the topics '
+                     'have to be able to decode every format sent'),
+    cfg.IntOpt('max_decompressed_size',
+               default=16 * 1024 * 1024,
+               min=1,
+               help='Maximal size (in bytes) of request body sent with '
+                    'Content-Encoding (gzip, deflate or zstd) after it is '
+                    'decompressed. Larger bodies are rejected with 413 as '
+                    'soon as the limit is exceeded. Limit of the compressed '
+                    'body is set with oslo_middleware max_request_body_size. '
+                    'zstd requires zstandard library')
+]
+
+serialization_group = cfg.OptGroup(name='serialization',
+                                   title='serialization')
+
+
+def register_opts(conf):
+    conf.register_group(serialization_group)
+    conf.register_opts(serialization_opts, serialization_group)
+
+
+def list_opts():
+    return serialization_group, serialization_opts
@@ -0,0 +1,73 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslo_config import cfg
+
+spool_opts = [
+    cfg.BoolOpt('enabled',
+                default=False,
+                help='Write events to the local spool when they cannot be '
+                     'published to kafka and replay them once kafka is '
+                     'available again, instead of answering with 503'),
+    cfg.StrOpt('directory',
+               default='/var/lib/monasca-events-api/spool',
+               help='Directory holding spool segments. Every API worker '
+                    'claims its own subdirectory'),
+    cfg.IntOpt('max_workers',
+               default=16,
+               min=1,
+               help='Maximum number of API workers that may own a spool '
+                    'subdirectory at the same time'),
+    cfg.IntOpt('segment_size',
+               default=64 * 1024 * 1024,
+               min=1024,
+               help='Size (in bytes) after which spool segment is closed '
+                    'and new one is started'),
+    cfg.IntOpt('max_bytes',
+               default=1024 * 1024 * 1024,
+               min=1024,
+               help='Maximum size (in bytes) of spool of single worker. '
+                    'Requests are answered with 503 once it is reached'),
+    cfg.IntOpt('max_age',
+               default=24 * 60 * 60,
+               min=1,
+               help='Maximum age (in seconds) of spooled events. Older '
+                    'events are discarded instead of being replayed'),
+    cfg.IntOpt('fsync_batch_size',
+               default=100,
+               min=1,
+               help='Number of spooled bulks after which spool segment '
+                    'is flushed to disk'),
+    cfg.FloatOpt('fsync_interval',
+                 default=1.0,
+                 min=0,
+                 help='Maximum time (in seconds) spooled bulks may wait '
+                      'before being flushed to disk'),
+    cfg.FloatOpt('retry_interval',
+                 default=5.0,
+                 min=0,
+                 help='Time (in seconds) to wait before replaying spooled '
+                      'events again after kafka failure')
+]
+
+spool_group = cfg.OptGroup(name='spool', title='spool')
+
+
+def register_opts(conf):
+    conf.register_group(spool_group)
+    conf.register_opts(spool_opts, spool_group)
+
+
+def list_opts():
+    return spool_group, spool_opts
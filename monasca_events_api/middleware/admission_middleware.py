@@ -0,0 +1,134 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+
+from oslo_log import log
+from oslo_middleware import base
+import webob.dec
+import webob.exc
+
+from monasca_events_api.app.common import metrics
+from monasca_events_api import config
+
+CONF = config.CONF
+LOG = log.getLogger(__name__)
+
+METRIC = 'admission'
+
+_REJECTIONS = {
+    429: webob.exc.HTTPTooManyRequests,
+    503: webob.exc.HTTPServiceUnavailable
+}
+
+
+class ByteBudget(object):
+    """Budget of bytes reserved by requests being processed.
+
+    Current usage is kept in ``admission`` counter of
+    :py:mod:`monasca_events_api.app.common.metrics` as
+    ``inflight_bytes``, rejected reservations are counted as
+    ``rejected``.
+
+    :param int max_bytes: size of the budget
+    """
+
+    def __init__(self, max_bytes):
+        self._max_bytes = max_bytes
+        self._used = 0
+        self._lock = threading.Lock()
+
+    @property
+    def used(self):
+        return self._used
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes
+
+    def reserve(self, size):
+        """Reserves size bytes if they fit into the budget.
+
+        :param int size: number of bytes to reserve
+        :return: True if bytes have been reserved
+        :rtype: bool
+        """
+        with self._lock:
+            if self._used + size > self._max_bytes:
+                admitted = False
+            else:
+                self._used += size
+                admitted = True
+        if admitted:
+            metrics.increment(METRIC, 'inflight_bytes', size)
+        else:
+            metrics.increment(METRIC, 'rejected')
+        return admitted
+
+    def release(self, size):
+        """Returns bytes reserved with :py:meth:`reserve`."""
+        with self._lock:
+            self._used -= size
+        metrics.increment(METRIC, 'inflight_bytes', -size)
+
+
+class AdmissionMiddleware(base.ConfigurableMiddleware):
+    """Middleware that bounds request data held by the worker.
+
+    Before request body is read, its Content-Length is reserved from
+    the budget of the worker (see ``[admission]max_inflight_bytes``).
+    Reservation is released once the response has been produced.
+    Request that does not fit into the remaining budget is rejected
+    with ``[admission]rejection_status`` and Retry-After header.
+    Request larger than the whole budget is rejected with 413.
+
+    Middleware passes all requests through if ``[admission]enabled``
+    is not set.
+    """
+
+    def __init__(self, application, conf=None):
+        super(AdmissionMiddleware, self).__init__(application, conf)
+        self._budget = None
+
+    @webob.dec.wsgify(RequestClass=base.NoContentTypeRequest)
+    def __call__(self, req):
+        if not CONF.admission.enabled:
+            return req.get_response(self.application)
+
+        budget = self._get_budget()
+        size = req.content_length
+        if size is None:
+            size = CONF.admission.unknown_length_bytes
+
+        if size > budget.max_bytes:
+            return webob.exc.HTTPRequestEntityTooLarge(
+                explanation='Request body of %d bytes exceeds admission '
+                            'budget of %d bytes' % (size, budget.max_bytes))
+        if not budget.reserve(size):
+            LOG.warning('Rejecting request of %d bytes, %d of %d bytes '
+                        'are in use', size, budget.used, budget.max_bytes)
+            rejection = _REJECTIONS[CONF.admission.rejection_status]
+            return rejection(
+                explanation='Too much data is being processed, retry later',
+                headers={'Retry-After': str(CONF.admission.retry_after)})
+
+        try:
+            return req.get_response(self.application)
+        finally:
+            budget.release(size)
+
+    def _get_budget(self):
+        if self._budget is None:
+            self._budget = ByteBudget(CONF.admission.max_inflight_bytes)
+        return self._budget
@@ -16,12 +16,14 @@ import falcon
 from oslo_log import log
 from oslo_middleware import base
 
+from monasca_events_api.app.common import binary_codec
+from monasca_events_api.app.common import decompression
 from monasca_events_api import config
 
 CONF = config.CONF
 LOG = log.getLogger(__name__)
 
-SUPPORTED_CONTENT_TYPES = ('application/json',)
+SUPPORTED_CONTENT_TYPES = ('application/json', 'application/x-ndjson')
 
 
 def _validate_content_type(req):
@@ -31,10 +33,13 @@ def _validate_content_type(req):
 
     If Content-Type cannot be established (i.e. header is missing),
     :py:class:`falcon.HTTPMissingHeader` is thrown.
-    If Content-Type is not **application/json**(supported contents
+    If Content-Type is not **application/json** or
+    **application/x-ndjson** (supported contents
 
-    types are define in SUPPORTED_CONTENT_TYPES variable),
-    :py:class:`falcon.HTTPUnsupportedMediaType` is thrown.
+    types are define in SUPPORTED_CONTENT_TYPES variable), nor binary
+    content type whose library is installed (**application/msgpack**,
+    **application/cbor**), :py:class:`falcon.HTTPUnsupportedMediaType`
+    is thrown.
 
     :param falcon.Request req: current request
 
@@ -47,13 +52,38 @@ def _validate_content_type(req):
     if content_type is None or len(content_type) == 0:
         raise falcon.HTTPMissingHeader('Content-Type')
 
-    if content_type not in SUPPORTED_CONTENT_TYPES:
-        types = ','.join(SUPPORTED_CONTENT_TYPES)
+    supported = (SUPPORTED_CONTENT_TYPES +
+                 binary_codec.supported_content_types())
+    if content_type not in supported:
+        types = ','.join(supported)
         details = ('Only [{0}] are accepted as events representation'.
                    format(types))
         raise falcon.HTTPUnsupportedMediaType(description=details)
 
 
+def _validate_content_encoding(req):
+    """Validate content encoding.
+
+    Request body may be compressed with one of the encodings returned by
+    :py:func:`decompression.supported_encodings`, otherwise
+    :py:class:`falcon.HTTPUnsupportedMediaType` is thrown.
+
+    :param req: current request
+
+    :exception: :py:class:`falcon.HTTPUnsupportedMediaType`
+    """
+    content_encoding = req.headers.get('Content-Encoding')
+    encoding = decompression.normalize_encoding(content_encoding)
+    if encoding is None:
+        return
+
+    encodings = decompression.supported_encodings()
+    if encoding not in encodings:
+        details = ('Only [{0}] are accepted as content encoding'.
+                   format(','.join(encodings)))
+        raise falcon.HTTPUnsupportedMediaType(description=details)
+
+
 class ValidationMiddleware(base.ConfigurableMiddleware):
     """Middleware that validates request content.
 
@@ -63,5 +93,6 @@ class ValidationMiddleware(base.ConfigurableMiddleware):
     def process_request(req):
 
         _validate_content_type(req)
+        _validate_content_encoding(req)
 
         return
@@ -25,6 +25,11 @@ from oslo_log.fixture import logging_error as log_fixture
 from oslo_serialization import jsonutils
 from oslotest import base
 
+from monasca_events_api.app.common import circuit_breaker
+from monasca_events_api.app.common import dedup
+from monasca_events_api.app.common import metrics
+from monasca_events_api.app.common import payload_validation
+from monasca_events_api.app.common import producers
 from monasca_events_api.app.core import request
 from monasca_events_api import config
 from monasca_events_api import policies
@@ -56,6 +61,11 @@ class BaseTestCase(base.BaseTestCase):
         self.useFixture(ConfigFixture(CONF))
         self.useFixture(oc_fixture.ClearRequestContext())
         self.useFixture(PolicyFixture())
+        self.addCleanup(producers.reset_pool)
+        self.addCleanup(circuit_breaker.reset_breaker)
+        self.addCleanup(dedup.reset_deduplicator)
+        self.addCleanup(payload_validation.reset_validator)
+        self.addCleanup(metrics.reset)
 
     @staticmethod
     def conf_override(**kw):
@@ -0,0 +1,90 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import webob
+import webob.dec
+
+from monasca_events_api.app.common import metrics
+from monasca_events_api.middleware import admission_middleware as am
+from monasca_events_api.tests.unit import base
+
+
+class TestByteBudget(base.BaseTestCase):
+
+    def test_should_reserve_until_exhausted(self):
+        budget = am.ByteBudget(10)
+        self.assertTrue(budget.reserve(6))
+        self.assertFalse(budget.reserve(5))
+        budget.release(6)
+        self.assertTrue(budget.reserve(10))
+        self.assertEqual({'inflight_bytes': 10, 'rejected': 1},
+                         metrics.snapshot()[am.METRIC])
+
+
+class TestAdmissionMiddleware(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestAdmissionMiddleware, self).setUp()
+        self.conf_override(enabled=True, max_inflight_bytes=10,
+                           group='admission')
+        self.inner = None
+        self.middleware = am.AdmissionMiddleware(self._app)
+
+    @webob.dec.wsgify
+    def _app(self, req):
+        if self.inner:
+            return self.inner(req)
+        return webob.Response(status=204)
+
+    @staticmethod
+    def _request(body):
+        return webob.Request.blank('/v1.0/events', method='POST',
+                                   body=body)
+
+    def test_should_admit_request_within_budget(self):
+        response = self._request(b'1234').get_response(self.middleware)
+        self.assertEqual(204, response.status_int)
+        self.assertEqual(0, self.middleware._budget.used)
+
+    def test_should_reject_request_exceeding_remaining_budget(self):
+        def inner(req):
+            response = self._request(b'1234567').get_response(
+                self.middleware)
+            self.assertEqual(429, response.status_int)
+            self.assertEqual('1', response.headers['Retry-After'])
+            return webob.Response(status=204)
+
+        self.inner = inner
+        response = self._request(b'1234').get_response(self.middleware)
+
+        self.assertEqual(204, response.status_int)
+        self.assertEqual(1, metrics.snapshot()[am.METRIC]['rejected'])
+
+    def test_should_reject_with_configured_status(self):
+        self.conf_override(rejection_status=503, group='admission')
+        self.inner = lambda req: self._request(b'1234567').get_response(
+            self.middleware)
+
+        response = self._request(b'1234').get_response(self.middleware)
+
+        self.assertEqual(503, response.status_int)
+
+    def test_should_reject_request_larger_than_budget(self):
+        response = self._request(b'x' * 11).get_response(self.middleware)
+        self.assertEqual(413, response.status_int)
+
+    def test_should_pass_through_when_disabled(self):
+        self.conf_override(enabled=False, group='admission')
+        response = self._request(b'x' * 11).get_response(self.middleware)
+        self.assertEqual(204, response.status_int)
@@ -0,0 +1,61 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import unittest
+
+import mock
+
+from monasca_events_api.app.common import binary_codec
+from monasca_events_api.tests.unit import base
+
+_MSGPACK = binary_codec.get_codec(binary_codec.MSGPACK_CONTENT_TYPE)
+_CBOR = binary_codec.get_codec(binary_codec.CBOR_CONTENT_TYPE)
+
+_BODY = {'timestamp': 't', 'events': [{'event': {'event_type': 'a',
+                                                 'payload': [1, 2.5, None]}}]}
+
+
+class TestBinaryCodec(base.BaseTestCase):
+
+    def test_should_not_decode_json(self):
+        self.assertIsNone(binary_codec.get_codec('application/json'))
+
+    @unittest.skipIf(_MSGPACK is None, 'msgpack is not installed')
+    def test_should_decode_msgpack(self):
+        self.assertEqual(_BODY, _MSGPACK.loads(_MSGPACK.dumps(_BODY)))
+
+    @unittest.skipIf(_CBOR is None, 'cbor2 is not installed')
+    def test_should_decode_cbor(self):
+        self.assertEqual(_BODY, _CBOR.loads(_CBOR.dumps(_BODY)))
+
+    def test_should_find_bytes(self):
+        self.assertIsNone(binary_codec.find_bytes(_BODY))
+        self.assertEqual(['payload', 1, 'k'], binary_codec.find_bytes(
+            {'event_type': 'a', 'payload': [u'x', {'k': b'\x00'}]}))
+        self.assertEqual([b'k'], binary_codec.find_bytes({b'k': 1}))
+
+    def test_should_report_decoding_errors_as_value_error(self):
+        for codec in (_MSGPACK, _CBOR):
+            if codec is not None:
+                self.assertRaises(ValueError, codec.loads, b'\xc1')
+                self.assertRaises(ValueError, codec.loads,
+                                  codec.dumps(_BODY)[:-1])
+
+    @mock.patch('monasca_events_api.app.common.binary_codec.'
+                'importutils.try_import', return_value=None)
+    @mock.patch.dict(binary_codec._CODECS, clear=True)
+    def test_should_not_support_type_without_library(self, _):
+        self.assertIsNone(
+            binary_codec.get_codec(binary_codec.MSGPACK_CONTENT_TYPE))
+        self.assertEqual((), binary_codec.supported_content_types())
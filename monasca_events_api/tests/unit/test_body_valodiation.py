@@ -14,6 +14,7 @@
 
 from voluptuous import MultipleInvalid
 
+from monasca_events_api.app.common import bulk_results
 from monasca_events_api.app.controller.v1.body_validation import validate_body
 from monasca_events_api.tests.unit import base
 
@@ -36,12 +37,44 @@ class TestBodyValidation(base.BaseTestCase):
         body = {'events': [], 'timestamp': 9000}
         self.assertRaises(MultipleInvalid, validate_body, body)
 
+    def test_invalid_timestamp(self):
+        for timestamp in ('over9000', '2012-10-32T13:42:11Z',
+                          '2012-10-29T13:42:61Z'):
+            body = {'events': [], 'timestamp': timestamp}
+            ex = self.assertRaises(MultipleInvalid, validate_body, body)
+            self.assertEqual(['timestamp'], ex.path)
+
     def test_incorrect_events_type(self):
-        body = {'events': 'over9000', 'timestamp': '2012-10-29T13:42:11Z+0200'}
-        self.assertRaises(MultipleInvalid, validate_body, body)
+        for events in ('over9000', {}):
+            body = {'events': events,
+                    'timestamp': '2012-10-29T13:42:11Z+0200'}
+            self.assertRaises(MultipleInvalid, validate_body, body)
 
     def test_correct_body(self):
         body = [{'events': [], 'timestamp': '2012-10-29T13:42:11Z+0200'},
-                {'events': {}, 'timestamp': u'2012-10-29T13:42:11Z+0200'}]
+                {'events': [{'project_id': u'p', 'event': {},
+                             'dimensions': {'service': 'compute'}}],
+                 'timestamp': u'2012-10-29T13:42:11Z+0200'}]
         for b in body:
             validate_body(b)
+
+    def test_incorrect_envelopes(self):
+        for envelope, path in (
+                ('e', ['events', 1]),
+                ({'project_id': 'p'}, ['events', 1, 'event']),
+                ({'project_id': 'p', 'event': []}, ['events', 1, 'event']),
+                ({'event': {}}, ['events', 1, 'project_id']),
+                ({'project_id': 1, 'event': {}}, ['events', 1, 'project_id']),
+                ({'project_id': 'p', 'event': {}, 'dimensions': []},
+                 ['events', 1, 'dimensions']),
+                ({'project_id': 'p', 'event': {}, 'dimensions': {'a': 1}},
+                 ['events', 1, 'dimensions'])):
+            body = {'events': [{'project_id': 'p', 'event': {}}, envelope],
+                    'timestamp': '2012-10-29T13:42:11Z+0200'}
+            ex = self.assertRaises(MultipleInvalid, validate_body, body)
+            self.assertEqual(path, ex.path)
+
+    def test_should_leave_envelopes_to_per_event_results(self):
+        body = {'events': [{'event': {}}],
+                'timestamp': '2012-10-29T13:42:11Z+0200'}
+        validate_body(body, results=bulk_results.BulkResults())
@@ -0,0 +1,123 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import falcon
+import mock
+
+from monasca_events_api.app.common import circuit_breaker
+from monasca_events_api.app.common import events_publisher
+from monasca_events_api.tests.unit import base
+
+
+@mock.patch('monasca_events_api.app.common.circuit_breaker.time.time',
+            return_value=1000.0)
+class TestCircuitBreaker(base.BaseTestCase):
+
+    @staticmethod
+    def _create_breaker():
+        return circuit_breaker.CircuitBreaker(window_size=4,
+                                              min_calls=2,
+                                              failure_rate=0.5,
+                                              slow_call_duration=1,
+                                              open_duration=10,
+                                              max_open_duration=30)
+
+    @staticmethod
+    def _fail(breaker):
+        try:
+            breaker.call(mock.Mock(side_effect=IOError))
+        except IOError:
+            pass
+
+    def test_should_open_when_failure_rate_reached(self, _):
+        breaker = self._create_breaker()
+        breaker.call(mock.Mock())
+        self._fail(breaker)
+
+        self.assertEqual(circuit_breaker.STATE_OPEN, breaker.state)
+        func = mock.Mock()
+        ex = self.assertRaises(circuit_breaker.CircuitOpenException,
+                               breaker.call, func)
+        self.assertEqual(10, ex.retry_after)
+        func.assert_not_called()
+
+    def test_should_not_open_below_min_calls(self, _):
+        breaker = self._create_breaker()
+        self._fail(breaker)
+        self.assertEqual(circuit_breaker.STATE_CLOSED, breaker.state)
+
+    def test_should_count_slow_call_as_failure(self, now):
+        breaker = self._create_breaker()
+
+        def slow_call():
+            now.return_value += 2
+
+        breaker.call(slow_call)
+        breaker.call(slow_call)
+        self.assertEqual(circuit_breaker.STATE_OPEN, breaker.state)
+
+    def test_should_close_after_successful_probe(self, now):
+        breaker = self._create_breaker()
+        self._fail(breaker)
+        self._fail(breaker)
+
+        now.return_value += 10
+        self.assertEqual(circuit_breaker.STATE_HALF_OPEN, breaker.state)
+        breaker.call(mock.Mock())
+
+        self.assertEqual(circuit_breaker.STATE_CLOSED, breaker.state)
+        self.assertEqual(0, breaker.retry_after)
+
+    def test_should_back_off_after_failed_probe(self, now):
+        breaker = self._create_breaker()
+        self._fail(breaker)
+        self._fail(breaker)
+
+        for expected in (20, 30):
+            now.return_value += 30
+            self._fail(breaker)
+            self.assertEqual(expected, breaker.retry_after)
+
+    def test_should_let_single_probe_through(self, now):
+        breaker = self._create_breaker()
+        self._fail(breaker)
+        self._fail(breaker)
+        now.return_value += 10
+
+        def probe():
+            self.assertRaises(circuit_breaker.CircuitOpenException,
+                              breaker.call, mock.Mock())
+
+        breaker.call(probe)
+
+
+@mock.patch('monasca_events_api.app.common.producers.'
+            'producer.KafkaProducer')
+class TestPublisherCircuitBreaker(base.BaseTestCase):
+
+    def test_should_fail_fast_when_open(self, kafka_producer):
+        self.conf_override(enabled=True, min_calls=1,
+                           group='circuit_breaker')
+        kafka_producer.return_value.publish.side_effect = IOError('down')
+        publisher = events_publisher.EventPublisher()
+
+        ex = self.assertRaises(falcon.HTTPServiceUnavailable,
+                               publisher._publish, [b'{}'])
+        self.assertEqual('5', ex.headers['Retry-After'])
+
+        kafka_producer.return_value.publish.reset_mock()
+        ex = self.assertRaises(falcon.HTTPServiceUnavailable,
+                               publisher._publish, [b'{}'])
+        self.assertEqual('5', ex.headers['Retry-After'])
+        kafka_producer.return_value.publish.assert_not_called()
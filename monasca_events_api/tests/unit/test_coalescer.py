@@ -0,0 +1,86 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+
+import mock
+
+from monasca_events_api.app.common import coalescer
+from monasca_events_api.tests.unit import base
+
+
+class TestCoalescer(base.BaseTestCase):
+
+    @staticmethod
+    def _submit_concurrently(coalescer_, bulks, key=None):
+        errors = []
+
+        def submit(bulk):
+            try:
+                coalescer_.submit(bulk, key)
+            except Exception as ex:
+                errors.append(ex)
+
+        threads = [threading.Thread(target=submit, args=(bulk,))
+                   for bulk in bulks]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        return errors
+
+    def test_should_merge_concurrent_bulks(self):
+        publish_func = mock.Mock()
+        coalescer_ = coalescer.Coalescer(publish_func, linger=0.5,
+                                         max_bytes=1000)
+
+        errors = self._submit_concurrently(coalescer_,
+                                           [[b'1'], [b'2', b'3'], [b'4']])
+
+        self.assertEqual([], errors)
+        publish_func.assert_called_once_with(mock.ANY, None, None, None)
+        self.assertEqual([b'1', b'2', b'3', b'4'],
+                         sorted(publish_func.call_args[0][0]))
+
+    def test_should_publish_full_batch_without_lingering(self):
+        publish_func = mock.Mock()
+        coalescer_ = coalescer.Coalescer(publish_func, linger=60,
+                                         max_bytes=3, overhead=1)
+
+        errors = self._submit_concurrently(coalescer_, [[b'12'], [b'34']])
+
+        self.assertEqual([], errors)
+        self.assertEqual([[b'12'], [b'34']],
+                         sorted(c[0][0] for c in publish_func.call_args_list))
+
+    def test_should_not_merge_bulks_of_different_keys(self):
+        publish_func = mock.Mock()
+        coalescer_ = coalescer.Coalescer(publish_func, linger=0.01,
+                                         max_bytes=1000)
+
+        coalescer_.submit([b'1'], 'a')
+        coalescer_.submit([b'2'], 'b')
+
+        publish_func.assert_has_calls([mock.call([b'1'], 'a', None, None),
+                                       mock.call([b'2'], 'b', None, None)])
+
+    def test_should_fail_every_request_of_failed_batch(self):
+        publish_func = mock.Mock(side_effect=IOError('down'))
+        coalescer_ = coalescer.Coalescer(publish_func, linger=0.5,
+                                         max_bytes=1000)
+
+        errors = self._submit_concurrently(coalescer_, [[b'1'], [b'2']])
+
+        self.assertEqual(2, len(errors))
+        self.assertEqual(1, publish_func.call_count)
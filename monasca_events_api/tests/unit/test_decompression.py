@@ -0,0 +1,112 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import gzip
+import io
+import unittest
+import zlib
+
+from monasca_events_api.app.common import decompression
+from monasca_events_api.app.common import metrics
+from monasca_events_api.tests.unit import base
+
+_BODY = b'{"events": [' + b','.join([b'{"event_type": "a"}'] * 100) + b']}'
+
+
+def _gzip(data):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def _raw_deflate(data):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class TestDecompressingStream(base.BaseTestCase):
+
+    def _read(self, body, encoding, max_size=1024 * 1024, chunk_size=7):
+        stream = decompression.open_stream(io.BytesIO(body), encoding,
+                                           max_size, chunk_size)
+        return stream.read()
+
+    def test_should_pass_identity_body(self):
+        body = io.BytesIO(_BODY)
+        self.assertIs(body, decompression.open_stream(body, None, 1))
+        self.assertIs(body, decompression.open_stream(body, 'identity', 1))
+
+    def test_should_decompress_gzip(self):
+        self.assertEqual(_BODY, self._read(_gzip(_BODY), 'gzip'))
+
+    def test_should_decompress_concatenated_gzip(self):
+        body = _gzip(_BODY[:100]) + _gzip(_BODY[100:])
+        self.assertEqual(_BODY, self._read(body, 'GZIP'))
+
+    def test_should_decompress_zlib_and_raw_deflate(self):
+        self.assertEqual(_BODY, self._read(zlib.compress(_BODY), 'deflate'))
+        self.assertEqual(_BODY, self._read(_raw_deflate(_BODY), 'deflate'))
+
+    @unittest.skipIf(decompression.zstandard is None,
+                     'zstandard is not installed')
+    def test_should_decompress_zstd(self):
+        body = decompression.zstandard.ZstdCompressor().compress(_BODY)
+        self.assertEqual(_BODY, self._read(body, 'zstd'))
+
+    def test_should_read_in_bounded_parts(self):
+        stream = decompression.open_stream(io.BytesIO(_gzip(_BODY)), 'gzip',
+                                           len(_BODY))
+        parts = iter(lambda: stream.read(10), b'')
+        self.assertEqual(_BODY, b''.join(parts))
+
+    def test_should_stop_zip_bomb(self):
+        bomb = _gzip(b'\0' * (64 * 1024 * 1024))
+        stream = decompression.open_stream(io.BytesIO(bomb), 'gzip',
+                                           1024 * 1024)
+        self.assertRaises(decompression.DecompressedBodyTooLarge,
+                          stream.read)
+        self.assertEqual({'gzip': 1},
+                         metrics.snapshot()[decompression.REJECTED])
+
+    def test_should_reject_truncated_body(self):
+        self.assertRaises(decompression.DecompressionError,
+                          self._read, _gzip(_BODY)[:-10], 'gzip')
+        self.assertRaises(decompression.DecompressionError,
+                          self._read, b'', 'gzip')
+
+    def test_should_reject_corrupted_body(self):
+        self.assertRaises(decompression.DecompressionError,
+                          self._read, b'not compressed', 'gzip')
+
+    def test_should_reject_data_after_deflate_body(self):
+        self.assertRaises(decompression.DecompressionError,
+                          self._read, zlib.compress(_BODY) + b'x',
+                          'deflate')
+
+    def test_should_reject_unsupported_encoding(self):
+        self.assertRaises(ValueError, decompression.open_stream,
+                          io.BytesIO(_BODY), 'br', 1)
+
+    def test_should_report_compression_ratio(self):
+        body = _gzip(_BODY)
+        self._read(body, 'gzip')
+
+        counters = metrics.snapshot()
+        self.assertEqual({'gzip': len(body)},
+                         counters[decompression.COMPRESSED_BYTES])
+        self.assertEqual({'gzip': len(_BODY)},
+                         counters[decompression.DECOMPRESSED_BYTES])
+        self.assertEqual({'gzip': round(float(len(_BODY)) / len(body), 2)},
+                         decompression.compression_ratios())
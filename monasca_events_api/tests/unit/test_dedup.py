@@ -0,0 +1,155 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+
+import falcon
+import fixtures
+import mock
+
+from monasca_events_api.app.common import dedup
+from monasca_events_api.app.common import metrics
+from monasca_events_api.app.controller.v1 import bulk_processor
+from monasca_events_api.app.model import envelope
+from monasca_events_api.tests.unit import base
+
+
+def _key(value):
+    return dedup.event_key(envelope.Envelope({'message_id': value}), {})
+
+
+class TestEventKey(base.BaseTestCase):
+
+    def test_should_identify_event_by_message_id(self):
+        first = dedup.event_key(
+            envelope.Envelope({'message_id': 'a', 'x': 1}), {'x': 1})
+        second = dedup.event_key(
+            envelope.Envelope({'message_id': 'a', 'x': 2}), {'x': 2})
+        self.assertEqual(first, second)
+
+    def test_should_identify_event_by_content(self):
+        received = envelope.Envelope({})
+        first = dedup.event_key(received, {'a': 1, 'b': [1, 2]})
+        second = dedup.event_key(received, {'b': [1, 2], 'a': 1})
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, dedup.event_key(None, {'a': 2}))
+
+    def test_should_identify_raw_event_by_bytes(self):
+        self.assertEqual(dedup.event_key(None, b'{"a":1}'),
+                         dedup.event_key(envelope.Envelope({}), b'{"a":1}'))
+
+
+@mock.patch('monasca_events_api.app.common.dedup.time.time',
+            return_value=1000.0)
+class TestTTLCache(base.BaseTestCase):
+
+    def test_should_forget_expired_keys(self, now):
+        cache = dedup.TTLCache(max_entries=10, ttl=5)
+        cache.add(['a'])
+        self.assertIn('a', cache)
+        now.return_value = 1005.0
+        self.assertNotIn('a', cache)
+
+    def test_should_forget_least_recently_seen_keys(self, _):
+        cache = dedup.TTLCache(max_entries=2, ttl=5)
+        cache.add(['a', 'b'])
+        self.assertIn('a', cache)
+        cache.add(['c'])
+        self.assertEqual(2, len(cache))
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+
+
+@mock.patch('monasca_events_api.app.common.dedup.time.time',
+            return_value=1000.0)
+class TestSharedBloomFilter(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestSharedBloomFilter, self).setUp()
+        self.path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 'dedup')
+
+    def _create_filter(self):
+        bloom = dedup.SharedBloomFilter(self.path, capacity=100,
+                                        false_positive_rate=0.001, ttl=10)
+        self.addCleanup(bloom.close)
+        return bloom
+
+    def test_should_share_keys_between_filters(self, _):
+        first = self._create_filter()
+        second = self._create_filter()
+        first.add([_key('a')])
+        self.assertIn(_key('a'), second)
+        self.assertNotIn(_key('b'), second)
+
+    def test_should_keep_keys_for_two_generations(self, now):
+        bloom = self._create_filter()
+        bloom.add([_key('a')])
+        now.return_value = 1010.0
+        self.assertIn(_key('a'), bloom)
+        now.return_value = 1020.0
+        self.assertNotIn(_key('a'), bloom)
+
+
+@mock.patch('monasca_events_api.app.common.producers.'
+            'producer.KafkaProducer')
+class TestDeduplicatingBulkProcessor(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestDeduplicatingBulkProcessor, self).setUp()
+        self.conf_override(enabled=True, group='dedup')
+
+    @staticmethod
+    def _envelopes(*message_ids):
+        return [{'event': {'message_id': message_id}}
+                for message_id in message_ids]
+
+    def test_should_drop_published_events(self, kafka_producer):
+        processor = bulk_processor.EventsBulkProcessor()
+        publish = kafka_producer.return_value.publish
+
+        processor.send_message([{'a': 1}, {'a': 2}], self._envelopes('1', '2'))
+        processor.send_message([{'a': 2}, {'a': 3}, {'a': 3}],
+                               self._envelopes('2', '3', '3'))
+
+        self.assertEqual([[b'{"a": 1}', b'{"a": 2}'], [b'{"a": 3}']],
+                         [c[0][1] for c in publish.call_args_list])
+        self.assertEqual({'dedup': {'hit': 2, 'miss': 3}},
+                         {k: v for k, v in metrics.snapshot().items()
+                          if k == 'dedup'})
+
+    @mock.patch('monasca_events_api.app.controller.v1.bulk_processor.'
+                'dedup.event_key')
+    def test_should_skip_event_whose_key_fails(self, event_key,
+                                               kafka_producer):
+        processor = bulk_processor.EventsBulkProcessor()
+        publish = kafka_producer.return_value.publish
+        event_key.side_effect = [ValueError('bad'), b'2']
+
+        processor.send_message([{'a': 1}, {'a': 2}], self._envelopes('1', '2'))
+
+        self.assertEqual([[b'{"a": 2}']],
+                         [c[0][1] for c in publish.call_args_list])
+
+    def test_should_not_remember_events_that_failed(self, kafka_producer):
+        processor = bulk_processor.EventsBulkProcessor()
+        publish = kafka_producer.return_value.publish
+        publish.side_effect = [IOError('down'), None]
+
+        self.assertRaises(falcon.HTTPServiceUnavailable,
+                          processor.send_message, [{'a': 1}],
+                          self._envelopes('1'))
+        processor.send_message([{'a': 1}], self._envelopes('1'))
+
+        self.assertEqual(2, publish.call_count)
@@ -0,0 +1,48 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from monasca_events_api.app.core import model
+from monasca_events_api.app.model import envelope
+from monasca_events_api.tests.unit import base
+
+
+class TestEnvelope(base.BaseTestCase):
+
+    def test_should_keep_documented_members(self):
+        timestamp = model.BulkTimestamp('2017-06-01T09:15:00Z')
+        received = envelope.Envelope.from_dict(
+            {'event': {'event_type': 'x'}, 'project_id': 'p',
+             'dimensions': {'a': 'b'}, 'extra': 1}, timestamp)
+
+        self.assertEqual({'event_type': 'x'}, received.event)
+        self.assertEqual('x', received.event_type)
+        self.assertEqual('p', received.project_id)
+        self.assertEqual({'a': 'b'}, received.dimensions)
+        self.assertEqual('2017-06-01T09:15:00Z', received.timestamp)
+        self.assertFalse(hasattr(received, '__dict__'))
+
+    def test_should_get_members_by_name(self):
+        received = envelope.Envelope({}, 'p')
+        self.assertEqual('p', received.get('project_id'))
+        self.assertEqual({}, received.get('dimensions', {}))
+        self.assertIsNone(received.get('timestamp'))
+        self.assertIsNone(received.get('extra'))
+
+    def test_should_share_dimension_keys(self):
+        first = envelope.Envelope({}, dimensions={u''.join('hostname'): 'a'})
+        second = envelope.Envelope({}, dimensions={u''.join('hostname'): 'b'})
+        if str is bytes:
+            self.skipTest('unicode keys are not interned on python 2')
+        self.assertIs(list(first.dimensions)[0],
+                      list(second.dimensions)[0])
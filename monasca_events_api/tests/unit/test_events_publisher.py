@@ -0,0 +1,158 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import falcon
+import mock
+
+from monasca_events_api.app.common import events_publisher
+from monasca_events_api.app.common import metrics
+from monasca_events_api.app.common import producers
+from monasca_events_api.tests.unit import base
+
+
+@mock.patch('monasca_events_api.app.common.producers.'
+            'producer.KafkaProducer')
+class TestEventPublisher(base.BaseTestCase):
+
+    def test_should_publish_to_each_topic(self, kafka_producer):
+        self.conf_override(topics=['a', 'b'], group='events_publisher')
+        publisher = events_publisher.EventPublisher()
+        publisher.send_message({'event_type': 'x'})
+
+        calls = kafka_producer.return_value.publish.call_args_list
+        self.assertEqual(['a', 'b'], [c[0][0] for c in calls])
+
+    def test_should_publish_concurrently(self, kafka_producer):
+        self.conf_override(topics=['a', 'b', 'c'],
+                           concurrent_fanout=True,
+                           group='events_publisher')
+        publisher = events_publisher.EventPublisher()
+
+        publisher.send_message({'event_type': 'x'})
+
+        calls = kafka_producer.return_value.publish.call_args_list
+        self.assertEqual({'a', 'b', 'c'}, {c[0][0] for c in calls})
+
+    def test_should_report_failed_topics(self, kafka_producer):
+        self.conf_override(topics=['a', 'b', 'c'],
+                           concurrent_fanout=True,
+                           group='events_publisher')
+        publisher = events_publisher.EventPublisher()
+
+        def publish(topic, messages, key):
+            if topic != 'b':
+                raise Exception('down')
+
+        kafka_producer.return_value.publish.side_effect = publish
+
+        ex = self.assertRaises(falcon.HTTPServiceUnavailable,
+                               publisher._publish, [b'{}'])
+        self.assertIn('a, c', ex.description)
+        kafka_producer.return_value.publish.assert_any_call(
+            'b', [b'{}'], None)
+
+    def test_should_share_producers_between_publishers(self,
+                                                       kafka_producer):
+        for _ in range(3):
+            events_publisher.EventPublisher().send_message({'a': 'b'})
+        self.assertEqual(1, kafka_producer.call_count)
+
+    def test_should_split_bulk_into_batches(self, kafka_producer):
+        self.conf_override(max_request_size=1024, group='events_publisher')
+        publisher = events_publisher.EventPublisher()
+        messages = [b'x' * 300] * 7
+
+        batches = list(publisher._split_into_batches(messages))
+
+        self.assertEqual([3, 3, 1], [len(b) for b in batches])
+        for batch in batches:
+            self.assertLessEqual(
+                sum(len(m) + events_publisher._KAFKA_META_DATA_SIZE
+                    for m in batch), 1024)
+
+    def test_should_drop_message_exceeding_request_size(self,
+                                                        kafka_producer):
+        self.conf_override(max_request_size=1024, group='events_publisher')
+        publisher = events_publisher.EventPublisher()
+
+        publisher.send_message([{'a': 'x' * 2048}, {'a': 'y'}])
+
+        kafka_producer.return_value.publish.assert_called_once_with(
+            'monevents', [b'{"a": "y"}'], None)
+
+    def test_should_apply_topic_acks(self, kafka_producer):
+        self.conf_override(topics=['audit', 'telemetry'],
+                           acks='1',
+                           topic_acks={'audit': 'all', 'telemetry': '0'},
+                           group='events_publisher')
+        publisher = events_publisher.EventPublisher()
+        reports = []
+        publisher.add_delivery_callback(reports.append)
+        req_acks = []
+        kafka_producer.return_value.publish.side_effect = (
+            lambda *_: req_acks.append(
+                kafka_producer.return_value._producer.req_acks))
+
+        publisher.send_message({'a': 'b'})
+
+        self.assertEqual([('audit', 'all'), ('telemetry', '0')],
+                         [(r.topic, r.acks) for r in reports])
+        self.assertEqual([producers.ACKS['all'], producers.ACKS['0']],
+                         req_acks)
+        # producer is released with the level it has been created with
+        self.assertEqual(producers.ACKS['1'],
+                         kafka_producer.return_value._producer.req_acks)
+
+    def test_should_only_strengthen_acks(self, kafka_producer):
+        self.conf_override(topics=['audit', 'telemetry'],
+                           topic_acks={'audit': 'all', 'telemetry': '0'},
+                           group='events_publisher')
+        publisher = events_publisher.EventPublisher()
+        reports = []
+        publisher.add_delivery_callback(reports.append)
+
+        publisher.send_message({'a': 'b'}, acks='1')
+
+        self.assertEqual(['all', '1'], [r.acks for r in reports])
+
+    def test_should_reject_invalid_topic_acks(self, _):
+        self.conf_override(topic_acks={'monevents': '2'},
+                           group='events_publisher')
+        self.assertRaises(ValueError, events_publisher.EventPublisher)
+
+    def test_should_count_deliveries(self, kafka_producer):
+        self.conf_override(topics=['a', 'b'], group='events_publisher')
+        publisher = events_publisher.EventPublisher()
+
+        def publish(topic, messages, key):
+            if topic == 'b':
+                raise IOError('down')
+
+        kafka_producer.return_value.publish.side_effect = publish
+
+        self.assertRaises(falcon.HTTPServiceUnavailable,
+                          publisher._publish, [b'1', b'2'])
+        self.assertEqual({'delivered': {'a': 2},
+                          'delivery_failed': {'b': 2}},
+                         metrics.snapshot())
+
+    def test_should_merge_bulks_when_lingering(self, kafka_producer):
+        self.conf_override(linger_ms=10, group='events_publisher')
+        publisher = events_publisher.EventPublisher()
+
+        publisher.send_message({'a': 'b'})
+
+        self.assertIsNotNone(publisher._coalescer)
+        kafka_producer.return_value.publish.assert_called_once_with(
+            'monevents', [b'{"a": "b"}'], None)
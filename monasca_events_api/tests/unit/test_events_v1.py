@@ -12,17 +12,27 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import gzip
+import io
 import os
+import unittest
+import zlib
 
 import falcon
 import mock
 import ujson as json
 
+from monasca_events_api.app.common import binary_codec
+from monasca_events_api.app.controller.v1 import body_validation
 from monasca_events_api.app.controller.v1 import events
 from monasca_events_api.tests.unit import base
 
 
 ENDPOINT = '/events'
+# timestamp of the sample bodies attached to the events
+_ATTACHED = {'timestamp': '2012-10-29T13:42:11Z+0200',
+             'timestamp_utc': '2012-10-29T11:42:11.000Z',
+             'timestamp_ms': 1351510931000}
 
 
 def _init_resource(test):
@@ -75,6 +85,27 @@ class TestEventsApi(base.BaseApiTestCase):
         )
         self.assertEqual(falcon.HTTP_200, self.srmock.status)
 
+    def test_should_accept_simple_event_when_async(self, bulk_processor):
+        self.conf_override(async_publish=True, group='events_publisher')
+        events_resource = _init_resource(self)
+        events_resource._processor = bulk_processor
+        unit_test_patch = os.path.dirname(__file__)
+        json_file_path = 'event_template_json/req_simple_event.json'
+        patch_to_req_simple_event_file = os.path.join(unit_test_patch,
+                                                      json_file_path)
+        with open(patch_to_req_simple_event_file, 'r') as fi:
+            body = fi.read()
+        self.simulate_request(
+            path=ENDPOINT,
+            method='POST',
+            headers={
+                'Content-Type': 'application/json',
+                'X_ROLES': 'monasca'
+            },
+            body=body
+        )
+        self.assertEqual(falcon.HTTP_202, self.srmock.status)
+
     def test_should_fail_empty_body(self, bulk_processor):
         events_resource = _init_resource(self)
         events_resource._processor = bulk_processor
@@ -125,6 +156,466 @@ class TestEventsApi(base.BaseApiTestCase):
         )
         self.assertEqual(falcon.HTTP_422, self.srmock.status)
 
+    def test_should_pass_raw_events_when_passthrough(self, bulk_processor):
+        self.conf_override(passthrough_ingestion=True, group='serialization')
+        events_resource = _init_resource(self)
+        events_resource._processor = bulk_processor
+        unit_test_patch = os.path.dirname(__file__)
+        json_file_path = 'event_template_json/req_multiple_events.json'
+        req_multiple_events_json = os.path.join(unit_test_patch,
+                                                json_file_path)
+        with open(req_multiple_events_json, 'r') as fi:
+            body = fi.read()
+        self.simulate_request(
+            path=ENDPOINT,
+            method='POST',
+            headers={
+                'Content-Type': 'application/json',
+                'X_ROLES': 'monasca'
+            },
+            body=body
+        )
+        self.assertEqual(falcon.HTTP_200, self.srmock.status)
+
+        messages, envelopes, acks, results = (
+            bulk_processor.send_message.call_args[0])
+        expected = json.loads(body)
+        self.assertEqual(len(expected['events']), len(messages))
+        for message, envelope in zip(messages, expected['events']):
+            event = dict(envelope['event'], **_ATTACHED)
+            self.assertEqual(event, json.loads(message))
+        self.assertIsNone(acks)
+        self.assertIsNone(results)
+
+    def test_should_pass_requested_acks(self, bulk_processor):
+        events_resource = _init_resource(self)
+        events_resource._processor = bulk_processor
+        unit_test_patch = os.path.dirname(__file__)
+        json_file_path = 'event_template_json/req_simple_event.json'
+        patch_to_req_simple_event_file = os.path.join(unit_test_patch,
+                                                      json_file_path)
+        with open(patch_to_req_simple_event_file, 'r') as fi:
+            body = fi.read()
+        self.simulate_request(
+            path=ENDPOINT,
+            method='POST',
+            headers={
+                'Content-Type': 'application/json',
+                'X_ROLES': 'monasca',
+                'X-Events-Acks': 'all'
+            },
+            body=body
+        )
+        self.assertEqual(falcon.HTTP_200, self.srmock.status)
+        self.assertEqual('all', bulk_processor.send_message.call_args[0][2])
+
+    def test_should_fail_invalid_acks(self, bulk_processor):
+        events_resource = _init_resource(self)
+        events_resource._processor = bulk_processor
+        self.simulate_request(
+            path=ENDPOINT,
+            method='POST',
+            headers={
+                'Content-Type': 'application/json',
+                'X_ROLES': 'monasca',
+                'X-Events-Acks': '2'
+            },
+            body='{}'
+        )
+        self.assertEqual(falcon.HTTP_400, self.srmock.status)
+        bulk_processor.send_message.assert_not_called()
+
+    def test_should_fail_missing_events_when_passthrough(
+            self, bulk_processor):
+        self.conf_override(passthrough_ingestion=True, group='serialization')
+        events_resource = _init_resource(self)
+        events_resource._processor = bulk_processor
+        body = {'timestamp': '2012-10-29T13:42:11Z+0200'}
+        self.simulate_request(
+            path=ENDPOINT,
+            method='POST',
+            headers={
+                'Content-Type': 'application/json',
+                'X_ROLES': 'monasca'
+            },
+            body=json.dumps(body)
+        )
+        self.assertEqual(falcon.HTTP_422, self.srmock.status)
+
+
+@mock.patch('monasca_events_api.app.common.producers.'
+            'producer.KafkaProducer')
+class TestPerEventResults(base.BaseApiTestCase):
+
+    BODY = {
+        'timestamp': '2012-10-29T13:42:11Z+0200',
+        'events': [
+            {'project_id': 'p', 'event': {'event_type': 'a'}},
+            {'project_id': 'p'},
+            {'project_id': 'p', 'event': 'b'},
+            {'project_id': 'p', 'event': {'event_type': 'c'}}
+        ]
+    }
+
+    def _post(self, mode='per-event'):
+        _init_resource(self)
+        body = self.simulate_request(
+            path=ENDPOINT,
+            method='POST',
+            headers={
+                'Content-Type': 'application/json',
+                'X_ROLES': 'monasca',
+                'X-Events-Results': mode
+            },
+            body=json.dumps(self.BODY)
+        )
+        return json.loads(body[0]) if body else None
+
+    def test_should_reject_malformed_events(self, kafka_producer):
+        result = self._post()
+
+        self.assertEqual(falcon.HTTP_207, self.srmock.status)
+        self.assertEqual(
+            {'accepted': 2, 'rejected': 2, 'failed': 0,
+             'results': [
+                 {'status': 'accepted'},
+                 {'status': 'rejected',
+                  'reason': 'Event envelope without event'},
+                 {'status': 'rejected', 'reason': 'Event is not an object'},
+                 {'status': 'accepted'}]},
+            result)
+        published = kafka_producer.return_value.publish.call_args[0][1]
+        self.assertEqual(['a', 'c'],
+                         [json.loads(m)['event_type'] for m in published])
+
+    def test_should_reject_malformed_raw_events(self, _):
+        self.conf_override(passthrough_ingestion=True, group='serialization')
+
+        result = self._post()
+
+        self.assertEqual(falcon.HTTP_207, self.srmock.status)
+        self.assertEqual(['accepted', 'rejected', 'rejected', 'accepted'],
+                         [r['status'] for r in result['results']])
+
+    def test_should_report_events_failed_to_publish(self, kafka_producer):
+        kafka_producer.return_value.publish.side_effect = IOError('down')
+
+        result = self._post()
+
+        self.assertEqual(falcon.HTTP_207, self.srmock.status)
+        self.assertEqual((0, 2, 2), (result['accepted'], result['rejected'],
+                                     result['failed']))
+        self.assertEqual('failed', result['results'][0]['status'])
+
+    def test_should_stream_events(self, kafka_producer):
+        self.conf_override(streaming_ingestion=True,
+                           streaming_chunk_size=8,
+                           group='serialization')
+
+        result = self._post()
+
+        self.assertEqual(falcon.HTTP_207, self.srmock.status)
+        self.assertEqual(['accepted', 'rejected', 'rejected', 'accepted'],
+                         [r['status'] for r in result['results']])
+        published = kafka_producer.return_value.publish.call_args[0][1]
+        self.assertEqual(['a', 'c'],
+                         [json.loads(m)['event_type'] for m in published])
+
+    def test_should_publish_streamed_events_in_parts(self, kafka_producer):
+        self.conf_override(streaming_ingestion=True, group='serialization')
+        self.conf_override(max_request_size=1024, group='events_publisher')
+        self.BODY = dict(self.BODY, events=[
+            {'project_id': 'p',
+             'event': {'event_type': 'a', 'payload': 'x' * 280}}] * 7)
+
+        self._post(mode='bulk')
+
+        self.assertEqual(falcon.HTTP_200, self.srmock.status)
+        # parts of 4 and 3 events, each split into kafka requests
+        self.assertEqual(
+            [2, 2, 2, 1], [len(c[0][1]) for c in
+                           kafka_producer.return_value.publish.call_args_list])
+
+    def test_should_reject_bulk_without_per_event_results(self, _):
+        self._post(mode='bulk')
+        self.assertEqual(falcon.HTTP_422, self.srmock.status)
+
+    def test_should_fail_invalid_results_mode(self, kafka_producer):
+        self._post(mode='none')
+        self.assertEqual(falcon.HTTP_400, self.srmock.status)
+        kafka_producer.return_value.publish.assert_not_called()
+
+
+def _gzip(data):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+@mock.patch('monasca_events_api.app.common.producers.'
+            'producer.KafkaProducer')
+class TestCompressedBody(base.BaseApiTestCase):
+
+    BODY = json.dumps({
+        'timestamp': '2012-10-29T13:42:11Z+0200',
+        'events': [{'project_id': 'p', 'event': {'event_type': 'a'}},
+                   {'project_id': 'p', 'event': {'event_type': 'b'}}]
+    }).encode('utf-8')
+
+    def _post(self, body, encoding):
+        _init_resource(self)
+        self.simulate_request(
+            path=ENDPOINT,
+            method='POST',
+            headers={
+                'Content-Type': 'application/json',
+                'Content-Encoding': encoding,
+                'X_ROLES': 'monasca'
+            },
+            body=body
+        )
+
+    def _published(self, kafka_producer):
+        published = kafka_producer.return_value.publish.call_args[0][1]
+        return [json.loads(m)['event_type'] for m in published]
+
+    def test_should_decompress_gzip_body(self, kafka_producer):
+        self._post(_gzip(self.BODY), 'gzip')
+
+        self.assertEqual(falcon.HTTP_200, self.srmock.status)
+        self.assertEqual(['a', 'b'], self._published(kafka_producer))
+
+    def test_should_decompress_deflate_body_when_passthrough(
+            self, kafka_producer):
+        self.conf_override(passthrough_ingestion=True, group='serialization')
+
+        self._post(zlib.compress(self.BODY), 'deflate')
+
+        self.assertEqual(falcon.HTTP_200, self.srmock.status)
+        self.assertEqual(['a', 'b'], self._published(kafka_producer))
+
+    def test_should_decompress_streamed_body(self, kafka_producer):
+        self.conf_override(streaming_ingestion=True,
+                           streaming_chunk_size=8,
+                           group='serialization')
+
+        self._post(_gzip(self.BODY), 'gzip')
+
+        self.assertEqual(falcon.HTTP_200, self.srmock.status)
+        self.assertEqual(['a', 'b'], self._published(kafka_producer))
+
+    def test_should_reject_too_large_decompressed_body(self,
+                                                       kafka_producer):
+        self.conf_override(max_decompressed_size=len(self.BODY) - 1,
+                           group='serialization')
+
+        self._post(_gzip(self.BODY), 'gzip')
+
+        self.assertEqual(falcon.HTTP_413, self.srmock.status)
+        kafka_producer.return_value.publish.assert_not_called()
+
+    def test_should_reject_too_large_streamed_body(self, kafka_producer):
+        self.conf_override(streaming_ingestion=True,
+                           max_decompressed_size=len(self.BODY) - 1,
+                           group='serialization')
+
+        self._post(_gzip(self.BODY), 'gzip')
+
+        self.assertEqual(falcon.HTTP_413, self.srmock.status)
+
+    def test_should_reject_corrupted_body(self, kafka_producer):
+        self._post(_gzip(self.BODY)[:-10], 'gzip')
+        self.assertEqual(falcon.HTTP_400, self.srmock.status)
+
+    def test_should_reject_unsupported_encoding(self, kafka_producer):
+        self._post(self.BODY, 'br')
+        self.assertEqual(falcon.HTTP_415, self.srmock.status)
+
+
+@mock.patch('monasca_events_api.app.common.producers.'
+            'producer.KafkaProducer')
+class TestNdjsonBody(base.BaseApiTestCase):
+
+    BODY = (b'{"timestamp": "2012-10-29T13:42:11Z+0200"}\n'
+            b'{"project_id": "p", "event": {"event_type": "a"}}\n'
+            b'{"event": \n'
+            b'{"project_id": "p", "event": {"event_type": "c"}}\n')
+
+    def _post(self, body=None, results=None, query_string=None):
+        _init_resource(self)
+        headers = {
+            'Content-Type': 'application/x-ndjson',
+            'X_ROLES': 'monasca'
+        }
+        if results:
+            headers['X-Events-Results'] = results
+        body = self.simulate_request(
+            path=ENDPOINT,
+            method='POST',
+            headers=headers,
+            query_string=query_string,
+            body=self.BODY if body is None else body
+        )
+        return json.loads(body[0]) if body and body[0] else None
+
+    def test_should_reject_malformed_lines_one_by_one(self, kafka_producer):
+        result = self._post()
+
+        self.assertEqual(falcon.HTTP_207, self.srmock.status)
+        self.assertEqual(['accepted', 'rejected', 'accepted'],
+                         [r['status'] for r in result['results']])
+        published = kafka_producer.return_value.publish.call_args[0][1]
+        self.assertEqual([dict(_ATTACHED, event_type='a'),
+                          dict(_ATTACHED, event_type='c')],
+                         [json.loads(m) for m in published])
+
+    def test_should_take_timestamp_from_query_string(self, kafka_producer):
+        self.conf_override(passthrough_ingestion=True, group='serialization')
+
+        self._post(b'{"project_id": "p", "event": {"event_type": "a"}}',
+                   query_string='timestamp=2017-06-01T09:15:00Z')
+
+        self.assertEqual(falcon.HTTP_207, self.srmock.status)
+        kafka_producer.return_value.publish.assert_called_once_with(
+            'monevents', [b'{"event_type": "a",'
+                          b'"timestamp":"2017-06-01T09:15:00Z",'
+                          b'"timestamp_utc":"2017-06-01T09:15:00.000Z",'
+                          b'"timestamp_ms":1496308500000}'], None)
+
+    def test_should_fail_invalid_timestamp(self, kafka_producer):
+        self._post(b'{"project_id": "p", "event": {"event_type": "a"}}',
+                   query_string='timestamp=yesterday')
+        self.assertEqual(falcon.HTTP_422, self.srmock.status)
+        kafka_producer.return_value.publish.assert_not_called()
+
+    def test_should_reject_whole_bulk_when_requested(self, _):
+        self._post(results='bulk')
+        self.assertEqual(falcon.HTTP_400, self.srmock.status)
+
+    def test_should_fail_missing_timestamp(self, kafka_producer):
+        self._post(b'{"project_id": "p", "event": {"event_type": "a"}}')
+        self.assertEqual(falcon.HTTP_422, self.srmock.status)
+        kafka_producer.return_value.publish.assert_not_called()
+
+
+_MSGPACK = binary_codec.get_codec(binary_codec.MSGPACK_CONTENT_TYPE)
+
+
+@unittest.skipIf(_MSGPACK is None, 'msgpack is not installed')
+@mock.patch('monasca_events_api.app.common.producers.'
+            'producer.KafkaProducer')
+class TestBinaryBody(base.BaseApiTestCase):
+
+    BODY = {
+        'timestamp': '2012-10-29T13:42:11Z+0200',
+        'events': [{'project_id': 'p', 'event': {'event_type': 'a'}}]
+    }
+
+    BYTES_BODY = {
+        'timestamp': '2012-10-29T13:42:11Z+0200',
+        'events': [{'project_id': 'p', 'event': {'event_type': 'a'}},
+                   {'project_id': 'p', 'event': {'event_type': 'b',
+                                                 'payload': [b'\x00']}}]
+    }
+
+    def _post(self, body, results=None,
+              content_type=binary_codec.MSGPACK_CONTENT_TYPE):
+        _init_resource(self)
+        headers = {
+            'Content-Type': content_type,
+            'X_ROLES': 'monasca'
+        }
+        if results:
+            headers['X-Events-Results'] = results
+        body = self.simulate_request(
+            path=ENDPOINT,
+            method='POST',
+            headers=headers,
+            body=body
+        )
+        return json.loads(body[0]) if body and body[0] else None
+
+    def test_should_forward_msgpack_events_as_json(self, kafka_producer):
+        self._post(_MSGPACK.dumps(self.BODY))
+
+        self.assertEqual(falcon.HTTP_200, self.srmock.status)
+        published = kafka_producer.return_value.publish.call_args[0][1]
+        self.assertEqual([dict(_ATTACHED, event_type='a')],
+                         [json.loads(m) for m in published])
+
+    def test_should_forward_msgpack_events_as_msgpack(self,
+                                                      kafka_producer):
+        self.conf_override(forward_binary=True, group='serialization')
+
+        self._post(_MSGPACK.dumps(self.BODY))
+
+        self.assertEqual(falcon.HTTP_200, self.srmock.status)
+        published = kafka_producer.return_value.publish.call_args[0][1]
+        self.assertEqual([dict(_ATTACHED, event_type='a')],
+                         [_MSGPACK.loads(m) for m in published])
+
+    def test_should_reject_bulk_holding_bytes(self, kafka_producer):
+        self._post(_MSGPACK.dumps(self.BYTES_BODY))
+
+        self.assertEqual(falcon.HTTP_422, self.srmock.status)
+        kafka_producer.return_value.publish.assert_not_called()
+
+    def test_should_forward_cbor_events_as_json(self, kafka_producer):
+        cbor = binary_codec.get_codec(binary_codec.CBOR_CONTENT_TYPE)
+
+        self._post(cbor.dumps(self.BODY),
+                   content_type=binary_codec.CBOR_CONTENT_TYPE)
+
+        self.assertEqual(falcon.HTTP_200, self.srmock.status)
+        published = kafka_producer.return_value.publish.call_args[0][1]
+        self.assertEqual([dict(_ATTACHED, event_type='a')],
+                         [json.loads(m) for m in published])
+
+    def test_should_reject_cbor_bulk_holding_bytes(self, kafka_producer):
+        cbor = binary_codec.get_codec(binary_codec.CBOR_CONTENT_TYPE)
+
+        self._post(cbor.dumps(self.BYTES_BODY),
+                   content_type=binary_codec.CBOR_CONTENT_TYPE)
+
+        self.assertEqual(falcon.HTTP_422, self.srmock.status)
+        kafka_producer.return_value.publish.assert_not_called()
+
+    def test_should_reject_events_holding_bytes(self, kafka_producer):
+        result = self._post(_MSGPACK.dumps(self.BYTES_BODY), 'per-event')
+
+        self.assertEqual(falcon.HTTP_207, self.srmock.status)
+        self.assertEqual([{'status': 'accepted'},
+                          {'status': 'rejected',
+                           'reason': body_validation.EVENT_HOLDS_BYTES}],
+                         result['results'])
+        published = kafka_producer.return_value.publish.call_args[0][1]
+        self.assertEqual([dict(_ATTACHED, event_type='a')],
+                         [json.loads(m) for m in published])
+
+    def test_should_forward_bytes_as_msgpack(self, kafka_producer):
+        self.conf_override(forward_binary=True, group='serialization')
+
+        self._post(_MSGPACK.dumps(self.BYTES_BODY))
+
+        self.assertEqual(falcon.HTTP_200, self.srmock.status)
+        published = kafka_producer.return_value.publish.call_args[0][1]
+        self.assertEqual([b'\x00'], _MSGPACK.loads(published[1])['payload'])
+
+    def test_should_fail_invalid_body(self, kafka_producer):
+        self._post(_MSGPACK.dumps(self.BODY)[:-1])
+        self.assertEqual(falcon.HTTP_400, self.srmock.status)
+
+    def test_should_fail_missing_events(self, kafka_producer):
+        self._post(_MSGPACK.dumps({'timestamp': 't'}))
+        self.assertEqual(falcon.HTTP_422, self.srmock.status)
+
+    @mock.patch('monasca_events_api.app.common.binary_codec.get_codec',
+                return_value=None)
+    def test_should_fail_when_library_is_missing(self, _, kafka_producer):
+        self._post(_MSGPACK.dumps(self.BODY))
+        self.assertEqual(falcon.HTTP_415, self.srmock.status)
+
 
 class TestApiEventsVersion(base.BaseApiTestCase):
     @mock.patch('monasca_events_api.app.controller.v1.'
@@ -54,6 +54,26 @@ class TestApiHealthChecks(base.BaseApiTestCase):
         ret = json.loads(ret)
         self.assertIn('kafka', ret)
         self.assertEqual('OK', ret.get('kafka'))
+        self.assertNotIn('circuit_breaker', ret)
+
+    @mock.patch('monasca_events_api.app.healthcheck.'
+                'kafka_check.KafkaHealthCheck')
+    def test_should_report_circuit_breaker_state(self, kafka_check):
+        self.conf_override(enabled=True, group='circuit_breaker')
+        kafka_check.healthcheck.return_value = healthcheck.CheckResult(True,
+                                                                       'OK')
+        self.resource._kafka_check = kafka_check
+
+        ret = self.simulate_request(ENDPOINT,
+                                    headers={
+                                        'Content-Type': 'application/json'
+                                    },
+                                    decode='utf8',
+                                    method='GET')
+
+        ret = json.loads(ret)
+        self.assertEqual({'state': 'closed', 'retry_after': 0},
+                         ret.get('circuit_breaker'))
 
     @mock.patch('monasca_events_api.app.healthcheck.'
                 'kafka_check.KafkaHealthCheck')
@@ -75,3 +95,36 @@ class TestApiHealthChecks(base.BaseApiTestCase):
         ret = json.loads(ret)
         self.assertIn('kafka', ret)
         self.assertEqual(err_str, ret.get('kafka'))
+
+
+@mock.patch('monasca_events_api.app.common.producers.'
+            'producer.KafkaProducer')
+class TestKafkaHealthCheck(base.BaseTestCase):
+
+    def test_should_reuse_connection(self, kafka_producer):
+        kafka_client = kafka_producer.return_value._kafka
+        kafka_client.has_metadata_for_topic.return_value = True
+        check = healthcheck.KafkaHealthCheck()
+
+        for _ in range(3):
+            self.assertTrue(check.healthcheck().healthy)
+
+        self.assertEqual(1, kafka_producer.call_count)
+        self.assertEqual(3, kafka_client.load_metadata_for_topics.call_count)
+
+    def test_should_report_missing_topic(self, kafka_producer):
+        kafka_client = kafka_producer.return_value._kafka
+        kafka_client.has_metadata_for_topic.return_value = False
+
+        result = healthcheck.KafkaHealthCheck().healthcheck()
+
+        self.assertFalse(result.healthy)
+        self.assertEqual('Kafka: Topic monevents not found', result.message)
+
+    def test_should_report_unavailable_kafka(self, kafka_producer):
+        kafka_producer.side_effect = IOError('connection refused')
+
+        result = healthcheck.KafkaHealthCheck().healthcheck()
+
+        self.assertFalse(result.healthy)
+        self.assertIn('Could not connect to kafka', result.message)
@@ -0,0 +1,66 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+
+import mock
+from oslo_utils import importutils
+
+from monasca_events_api.app.common import json_codec
+from monasca_events_api.tests.unit import base
+
+_DOCUMENT = {
+    'event_type': u'compute.instance.create.end',
+    'payload': {'display_name': u'\u015bwiat/server', 'vcpus': 2,
+                'deleted_at': None, 'locked': False}
+}
+
+
+class TestJsonCodec(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestJsonCodec, self).setUp()
+        json_codec._CODECS.clear()
+        self.addCleanup(json_codec._CODECS.clear)
+
+    def _check_codec(self, codec):
+        encoded = codec.dumps(_DOCUMENT)
+        self.assertIsInstance(encoded, bytes)
+        self.assertEqual(_DOCUMENT, json.loads(encoded.decode('utf-8')))
+        self.assertEqual(_DOCUMENT, codec.loads(encoded))
+        self.assertRaises(ValueError, codec.loads, b'{"a":')
+        self.assertRaises(ValueError, codec.loads, b'')
+
+    def test_should_use_stdlib_by_default(self):
+        codec = json_codec.get_codec()
+        self.assertEqual('json', codec.name)
+        self._check_codec(codec)
+
+    def test_should_use_configured_codec(self):
+        for name in ('orjson', 'ujson', 'rapidjson'):
+            if importutils.try_import(name) is None:
+                continue
+            self.conf_override(json_codec=name, group='serialization')
+            codec = json_codec.get_codec()
+            self.assertEqual(name, codec.name)
+            self._check_codec(codec)
+
+    @mock.patch('monasca_events_api.app.common.json_codec.'
+                'importutils.try_import', return_value=None)
+    def test_should_fall_back_to_stdlib(self, _):
+        self.conf_override(json_codec='orjson', group='serialization')
+        self.assertEqual('json', json_codec.get_codec().name)
+
+    def test_should_cache_codec(self):
+        self.assertIs(json_codec.get_codec(), json_codec.get_codec())
@@ -0,0 +1,336 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import io
+import json
+
+from voluptuous import MultipleInvalid
+
+from monasca_events_api.app.common import bulk_results
+from monasca_events_api.app.common import json_codec
+from monasca_events_api.app.common import json_scanner
+from monasca_events_api.app.core import model
+from monasca_events_api.tests.unit import base
+
+
+_TIMESTAMP = '2017-06-01T09:15:00Z'
+_ATTACHED = {'timestamp': _TIMESTAMP,
+             'timestamp_utc': '2017-06-01T09:15:00.000Z',
+             'timestamp_ms': 1496308500000}
+
+
+def _members(envelope):
+    return (envelope.event, envelope.project_id, envelope.dimensions,
+            envelope.timestamp)
+
+
+def _unique_keys(pairs):
+    keys = [key for key, _ in pairs]
+    if len(keys) != len(set(keys)):
+        raise ValueError('Duplicated keys %s' % keys)
+    return dict(pairs)
+
+
+class TestJsonScanner(base.BaseTestCase):
+
+    def test_should_skip_values(self):
+        for value in (b'"a\\"}]"', b'{"a": ["}", {"b": null}]}',
+                      b'[1, 2.5e3, true]', b'-0.5', b'false'):
+            self.assertEqual(len(value),
+                             json_scanner.skip_value(value + b' ', 0))
+
+    def test_should_detect_mismatched_brackets(self):
+        self.assertRaises(ValueError, json_scanner.skip_value,
+                          b'{"a": [1}]', 0)
+
+    def test_should_detect_incomplete_document(self):
+        for value in (b'{"a": [1]', b'"abc', b'12'):
+            self.assertRaises(json_scanner.IncompleteDocument,
+                              json_scanner.skip_value, value, 0)
+
+    def test_should_scan_members(self):
+        buf = b'{ "a" : {"x": 1}, "b\\u0105": "c" } '
+        members = []
+
+        def scan_member(key, start):
+            end = json_scanner.skip_value(buf, start)
+            members.append((key, buf[start:end]))
+            return end
+
+        self.assertEqual(len(buf) - 1,
+                         json_scanner.scan_object(buf, 0, scan_member))
+        self.assertEqual([(u'a', b'{"x": 1}'), (u'b\u0105', b'"c"')],
+                         members)
+
+    def test_should_scan_items(self):
+        buf = b'[ {}, [1] ,"x"] '
+        items = []
+
+        def scan_item(start):
+            end = json_scanner.skip_value(buf, start)
+            items.append(buf[start:end])
+            return end
+
+        self.assertEqual(len(buf) - 1,
+                         json_scanner.scan_array(buf, 0, scan_item))
+        self.assertEqual([b'{}', b'[1]', b'"x"'], items)
+
+    def test_should_detect_missing_separator(self):
+        self.assertRaises(ValueError, json_scanner.scan_array,
+                          b'[1 2]', 0)
+
+
+class TestTimestampedEvent(base.BaseTestCase):
+
+    def test_should_attach_timestamp_without_copying_event(self):
+        event = {'event_type': 'x', 'payload': {'k': [1]}}
+        body = {'timestamp': '2017-06-01T09:15:00Z',
+                'events': [{'project_id': 'p', 'event': event},
+                           {'project_id': 'p', 'event': {}}]}
+
+        messages = model.prepare_message_to_sent(body)
+
+        self.assertIs(event, messages[0].event)
+        self.assertIs(messages[0].timestamp, messages[1].timestamp)
+        self.assertEqual(dict(event, **_ATTACHED), messages[0])
+        self.assertNotIn('timestamp', event)
+
+    def test_should_serialize_with_timestamp(self):
+        codec = json_codec.get_codec()
+        timestamp = model.BulkTimestamp('2017-06-01T09:15:00Z')
+        for event in ({'event_type': 'x', 'payload': {'k': [1]}}, {},
+                      {'timestamp': 'overridden', 'a': 1},
+                      {'timestamp_utc': 'x', 'timestamp_ms': 0}):
+            message = model.TimestampedEvent(event, timestamp)
+            self.assertEqual(dict(event, **_ATTACHED),
+                             json.loads(message.serialize(codec)
+                                        .decode('utf-8')))
+
+
+class TestPrepareRawMessage(base.BaseTestCase):
+
+    def test_should_splice_timestamp_into_events(self):
+        body = (b'{"timestamp": "2017-06-01T09:15:00Z", "events": ['
+                b'{"project_id": "p1", "dimensions": {"a": "b"},'
+                b' "event": {"event_type": "x", "payload": {"k": [1]}}},'
+                b'{"event": {"a": 1}, "project_id": "p2", "event": { }}]}')
+
+        messages, envelopes = model.prepare_raw_message_to_sent(body)
+
+        self.assertEqual([dict(_ATTACHED, event_type='x', payload={'k': [1]}),
+                          _ATTACHED],
+                         [json.loads(m.decode('utf-8')) for m in messages])
+        self.assertEqual([({'event_type': 'x'}, 'p1', {'a': 'b'}, _TIMESTAMP),
+                          ({}, 'p2', None, _TIMESTAMP)],
+                         [_members(e) for e in envelopes])
+
+    def test_should_replace_attached_members_of_event(self):
+        body = (b'{"timestamp": "2017-06-01T09:15:00Z", "events": ['
+                b'{"project_id": "p", "event": {"event_type": "a", '
+                b'"timestamp": "old", "payload": {"timestamp": 1}}},'
+                b'{"project_id": "p", "event": {"timestamp_ms": 1}},'
+                b'{"project_id": "p", "event": {"timest\\u0061mp": 1}},'
+                b'{"project_id": "p", "event": {"payload": '
+                b'{"timestamp": 1}}}]}')
+        for event_members in (('event_type',), ('event_type', 'a')):
+            messages, _ = model.prepare_raw_message_to_sent(body,
+                                                            event_members)
+
+            self.assertEqual([dict(_ATTACHED, event_type='a',
+                                   payload={'timestamp': 1}),
+                              _ATTACHED, _ATTACHED,
+                              dict(_ATTACHED, payload={'timestamp': 1})],
+                             [json.loads(m.decode('utf-8'),
+                                         object_pairs_hook=_unique_keys)
+                              for m in messages])
+
+    def test_should_decode_requested_event_members(self):
+        body = (b'{"timestamp": "2017-06-01T09:15:00Z", "events": ['
+                b'{"project_id": "p", '
+                b'"event": {"event_type": "x", "message_id": "m1"}},'
+                b'{"project_id": "p", '
+                b'"event": {"message_id": 1, "event_type": "y"}}]}')
+
+        _, envelopes = model.prepare_raw_message_to_sent(
+            body, ('event_type', 'message_id'))
+
+        self.assertEqual([{'event_type': 'x', 'message_id': 'm1'},
+                          {'event_type': 'y'}],
+                         [e.event for e in envelopes])
+
+    def test_should_reject_missing_timestamp(self):
+        self.assertRaises(MultipleInvalid,
+                          model.prepare_raw_message_to_sent,
+                          b'{"events": []}')
+
+    def test_should_reject_invalid_envelopes(self):
+        for envelope in (b'1', b'{"project_id": "p"}',
+                         b'{"project_id": "p", "event": []}',
+                         b'{"event": {}}',
+                         b'{"project_id": 1, "event": {}}',
+                         b'{"project_id": "p", "event": {}, '
+                         b'"dimensions": {"a": 1}}'):
+            self.assertRaises(MultipleInvalid,
+                              model.prepare_raw_message_to_sent,
+                              b'{"timestamp": "t", "events": [%s]}'
+                              % envelope)
+
+    def test_should_reject_invalid_timestamp(self):
+        for timestamp in (b'"t"', b'"2017-02-30T09:15:00Z"', b'1'):
+            self.assertRaises(MultipleInvalid,
+                              model.prepare_raw_message_to_sent,
+                              b'{"timestamp": %s, "events": []}' % timestamp)
+
+    def test_should_reject_trailing_data(self):
+        self.assertRaises(ValueError,
+                          model.prepare_raw_message_to_sent,
+                          b'{"timestamp": "t", "events": []} {}')
+
+
+class TestEventStream(base.BaseTestCase):
+
+    BODY = (b'{ "timestamp" : "2017-06-01T09:15:00Z" , "events" : [ '
+            b'{"project_id": "p1", "event": {"event_type": "x", "v": 1.5}},'
+            b' {"event": {}, "project_id": "p2"} ] }')
+
+    @staticmethod
+    def _read(body, chunk_size=3, **kwargs):
+        return list(model.EventStream(io.BytesIO(body),
+                                      chunk_size=chunk_size, **kwargs))
+
+    def test_should_read_events_in_chunks(self):
+        expected = model.prepare_message_to_sent(json.loads(self.BODY))
+        for chunk_size in (1, 2, 7, 1024):
+            events = self._read(self.BODY, chunk_size)
+            self.assertEqual(expected, [e[0] for e in events])
+
+    def test_should_read_raw_events_in_chunks(self):
+        expected, envelopes = model.prepare_raw_message_to_sent(self.BODY)
+        for chunk_size in (1, 2, 7, 1024):
+            events = self._read(self.BODY, chunk_size, passthrough=True)
+            self.assertEqual(expected, [e[0] for e in events])
+            self.assertEqual([_members(e) for e in envelopes],
+                             [_members(e[1]) for e in events])
+
+    def test_should_hold_events_until_timestamp_is_read(self):
+        body = (b'{"events": [{"project_id": "p", "event": {"a": 1}}], '
+                b'"timestamp": "2017-06-01T09:15:00Z"}')
+        self.assertEqual([dict(_ATTACHED, a=1)],
+                         [e[0] for e in self._read(body)])
+
+    def test_should_reject_malformed_body(self):
+        for body in (b'',
+                     b'{"timestamp": "2017-06-01T09:15:00Z", "events": [',
+                     b'{"timestamp": "2017-06-01T09:15:00Z", "events": []} '
+                     b'{}'):
+            self.assertRaises(ValueError, self._read, body)
+
+    def test_should_reject_missing_or_invalid_members(self):
+        for body in (b'{"timestamp": "2017-06-01T09:15:00Z"}',
+                     b'{"timestamp": 1, "events": []}',
+                     b'{"timestamp": "t", "events": []}',
+                     b'{"timestamp": "t", "events": {}}',
+                     b'{"timestamp": "t", "events": [{"a": 1}]}',
+                     b'{"timestamp": "t", "events": [{"event": {}}]}'):
+            for passthrough in (False, True):
+                self.assertRaises(MultipleInvalid, self._read, body,
+                                  passthrough=passthrough)
+
+    def test_should_reject_malformed_events_one_by_one(self):
+        body = (b'{"timestamp": "2017-06-01T09:15:00Z", "events": '
+                b'[1, {"project_id": "p", "event": {}}, {}]}')
+        for passthrough in (False, True):
+            results = bulk_results.BulkResults()
+            events = self._read(body, passthrough=passthrough,
+                                results=results)
+            self.assertEqual([None, None], [events[0][0], events[2][0]])
+            self.assertEqual(['rejected', 'accepted', 'rejected'],
+                             [r['status'] for r in
+                              results.to_dict(3)['results']])
+
+
+class TestNdjsonStream(base.BaseTestCase):
+
+    BODY = (b'{"timestamp": "2017-06-01T09:15:00Z"}\n'
+            b'{"project_id": "p1", "event": {"event_type": "x", "v": 1.5}}\n'
+            b'\n'
+            b'{"event": {}, "project_id": "p2"}\r\n')
+
+    @staticmethod
+    def _read(body, chunk_size=3, **kwargs):
+        return list(model.NdjsonStream(io.BytesIO(body),
+                                       chunk_size=chunk_size, **kwargs))
+
+    def test_should_read_lines_in_chunks(self):
+        expected = [dict(_ATTACHED, event_type='x', v=1.5), _ATTACHED]
+        for chunk_size in (1, 2, 7, 1024):
+            events = self._read(self.BODY, chunk_size)
+            self.assertEqual(expected, [e[0] for e in events])
+
+    def test_should_read_raw_lines_in_chunks(self):
+        expected = [b'{"event_type": "x", "v": 1.5,'
+                    b'"timestamp":"2017-06-01T09:15:00Z",'
+                    b'"timestamp_utc":"2017-06-01T09:15:00.000Z",'
+                    b'"timestamp_ms":1496308500000}',
+                    b'{"timestamp":"2017-06-01T09:15:00Z",'
+                    b'"timestamp_utc":"2017-06-01T09:15:00.000Z",'
+                    b'"timestamp_ms":1496308500000}']
+        for chunk_size in (1, 2, 7, 1024):
+            events = self._read(self.BODY, chunk_size, passthrough=True)
+            self.assertEqual(expected, [e[0] for e in events])
+            self.assertEqual(({'event_type': 'x'}, 'p1', None, _TIMESTAMP),
+                             _members(events[0][1]))
+
+    def test_should_use_given_timestamp(self):
+        body = (b'{"project_id": "p", "event": {"a": 1}}\n'
+                b'{"project_id": "p", "event": {"a": 2}}')
+        events = self._read(body, timestamp=_TIMESTAMP)
+        self.assertEqual([dict(_ATTACHED, a=1), dict(_ATTACHED, a=2)],
+                         [e[0] for e in events])
+
+    def test_should_reject_missing_or_invalid_timestamp(self):
+        for body in (b'', b'{"project_id": "p", "event": {}}',
+                     b'{"timestamp": 1}', b'{"timestamp": "t"}'):
+            self.assertRaises(MultipleInvalid, self._read, body)
+
+    def test_should_reject_malformed_line(self):
+        for line in (b'{"event": ', b'{"project_id": "p", "event": {}} {}'):
+            for passthrough in (False, True):
+                self.assertRaises(ValueError, self._read, line,
+                                  timestamp=_TIMESTAMP,
+                                  passthrough=passthrough)
+
+    def test_should_reject_invalid_envelope(self):
+        for passthrough in (False, True):
+            self.assertRaises(MultipleInvalid, self._read,
+                              b'{"project_id": "p", "a": 1}',
+                              timestamp=_TIMESTAMP,
+                              passthrough=passthrough)
+
+    def test_should_reject_malformed_lines_one_by_one(self):
+        body = (b'{"event": \n{"project_id": "p", "event": {}}\n[1]\n'
+                b'{"project_id": "p", "event": 1}\n{"e')
+        for passthrough in (False, True):
+            results = bulk_results.BulkResults()
+            stream = model.NdjsonStream(io.BytesIO(body),
+                                        timestamp=_TIMESTAMP,
+                                        passthrough=passthrough,
+                                        results=results, chunk_size=4)
+            events = list(stream)
+            self.assertEqual(5, stream.count)
+            self.assertIsNotNone(events[1][0])
+            self.assertEqual(['rejected', 'accepted', 'rejected',
+                              'rejected', 'rejected'],
+                             [r['status'] for r in
+                              results.to_dict(5)['results']])
@@ -0,0 +1,99 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import mock
+from monasca_common.kafka_lib.partitioner import hashed
+
+from monasca_events_api.app.common import partitioning
+from monasca_events_api.app.controller.v1 import bulk_processor
+from monasca_events_api.app.model import envelope
+from monasca_events_api.tests.unit import base
+
+_ENVELOPE = envelope.Envelope.from_dict({
+    'dimensions': {'service': 'compute', 'hostname': 'node-1'},
+    'project_id': 'abc',
+    'event': {
+        'event_type': 'instance.reboot.end',
+        'payload': {
+            'nova_object.data': {
+                'uuid': '178b0921-8f85-4257-88b6-2e743b5a975c',
+                'vcpus': 1
+            }
+        }
+    }
+})
+
+
+class TestKeyExtractor(base.BaseTestCase):
+
+    def test_should_not_key_by_default(self):
+        self.assertIsNone(partitioning.create_key_extractor(None))
+
+    def test_should_extract_project_id(self):
+        extractor = partitioning.create_key_extractor('project_id')
+        self.assertEqual('abc', extractor(_ENVELOPE))
+
+    def test_should_extract_instance_uuid(self):
+        extractor = partitioning.create_key_extractor('instance')
+        self.assertEqual('178b0921-8f85-4257-88b6-2e743b5a975c',
+                         extractor(_ENVELOPE))
+
+    def test_should_extract_dotted_path(self):
+        extractor = partitioning.create_key_extractor(
+            'event.payload.nova_object.data.vcpus')
+        self.assertEqual('1', extractor(_ENVELOPE))
+
+    def test_should_return_none_for_missing_path(self):
+        extractor = partitioning.create_key_extractor('event.missing')
+        self.assertIsNone(extractor(_ENVELOPE))
+
+    def test_should_extract_dimensions(self):
+        extractor = partitioning.create_key_extractor('dimensions')
+        self.assertEqual('hostname=node-1,service=compute',
+                         extractor(_ENVELOPE))
+
+
+class TestCachedMurmur2Partitioner(base.BaseTestCase):
+
+    def test_should_match_murmur2_partitioner(self):
+        partitions = list(range(12))
+        expected = hashed.Murmur2Partitioner(partitions)
+        cached = partitioning.CachedMurmur2Partitioner(partitions)
+        for key in (b'a', b'abc', b'6f70656e737461636b20342065766572'):
+            self.assertEqual(expected.partition(key), cached.partition(key))
+            self.assertEqual(expected.partition(key), cached.partition(key))
+        self.assertEqual(3, len(cached._cache))
+
+
+@mock.patch('monasca_events_api.app.common.producers.'
+            'producer.KafkaProducer')
+class TestKeyedBulkProcessor(base.BaseTestCase):
+
+    def test_should_publish_groups_by_key(self, kafka_producer):
+        self.conf_override(partition_key='project_id',
+                           group='events_publisher')
+        processor = bulk_processor.EventsBulkProcessor()
+
+        envelopes = [{'project_id': 'a'}, {'project_id': 'b'},
+                     {'project_id': 'a'}]
+        processor.send_message([{'e': 1}, {'e': 2}, {'e': 3}], envelopes)
+
+        publish = kafka_producer.return_value.publish
+        self.assertEqual([
+            mock.call('monevents', [b'{"e": 1}', b'{"e": 3}'], 'a'),
+            mock.call('monevents', [b'{"e": 2}'], 'b'),
+        ], publish.call_args_list)
+        self.assertEqual(partitioning.CachedMurmur2Partitioner,
+                         kafka_producer.return_value._producer.
+                         partitioner_class)
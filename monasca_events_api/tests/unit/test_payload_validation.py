@@ -0,0 +1,165 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+
+import fixtures
+import mock
+from voluptuous import MultipleInvalid
+
+from monasca_events_api.app.common import bulk_results
+from monasca_events_api.app.common import metrics
+from monasca_events_api.app.common import payload_validation
+from monasca_events_api.app.controller.v1 import body_validation
+from monasca_events_api.app.controller.v1 import events
+from monasca_events_api.app.core import model
+from monasca_events_api.tests.unit import base
+
+
+def _compile_required(schema):
+    """Compiles schema listing members payload data must have."""
+    required = schema['required']
+
+    def validate(payload):
+        data = (payload or {}).get('nova_object.data', {})
+        for name in required:
+            if name not in data:
+                return '%s is required' % name
+        return None
+    return validate
+
+
+def _event(event_type='instance.create.end', version='1.1', **data):
+    return {'event_type': event_type,
+            'payload': {'nova_object.version': version,
+                        'nova_object.data': data}}
+
+
+class TestPayloadValidator(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestPayloadValidator, self).setUp()
+        self.schema_dir = self.useFixture(fixtures.TempDir()).path
+        self._write('instance.create.end/1.1.json', {'required': ['uuid']})
+        self._write('instance.create.end.json', {'required': ['host']})
+        self.compile_schema = mock.Mock(side_effect=_compile_required)
+
+    def _write(self, name, schema):
+        path = os.path.join(self.schema_dir, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as schema_file:
+            json.dump(schema, schema_file)
+
+    def _create(self, cache_size=10, sample_rate=1.0):
+        return payload_validation.PayloadValidator(
+            self.schema_dir, cache_size, sample_rate, self.compile_schema)
+
+    def test_should_validate_against_schema_of_version(self):
+        validator = self._create()
+        self.assertIsNone(validator.validate(_event(uuid='u')))
+        self.assertIn('uuid is required',
+                      validator.validate(_event(host='h')))
+        self.assertEqual({'valid': 1, 'invalid': 1},
+                         metrics.snapshot()[payload_validation.METRIC])
+
+    def test_should_fall_back_to_schema_of_event_type(self):
+        validator = self._create()
+        self.assertIsNone(validator.validate(_event(version='2.0', host='h')))
+        self.assertIsNotNone(validator.validate(_event(version='2.0')))
+        self.assertIsNotNone(validator.validate(
+            {'event_type': 'instance.create.end'}))
+
+    def test_should_skip_events_without_schema(self):
+        validator = self._create()
+        for event in (_event('instance.delete.end'), _event('../x'),
+                      _event('/etc/x'), {'event_type': 1}, {}):
+            self.assertIsNone(validator.validate(event))
+
+    def test_should_compile_schema_once(self):
+        validator = self._create()
+        for _ in range(3):
+            validator.validate(_event(uuid='u'))
+            validator.validate(_event('instance.delete.end'))
+        self.assertEqual(1, self.compile_schema.call_count)
+
+    def test_should_bound_cache(self):
+        validator = self._create(cache_size=1)
+        validator.validate(_event(uuid='u'))
+        validator.validate(_event(version='2.0', host='h'))
+        validator.validate(_event(uuid='u'))
+        self.assertEqual(3, self.compile_schema.call_count)
+
+    def test_should_sample_events(self):
+        validator = self._create(sample_rate=0.0)
+        self.assertIsNone(validator.validate(_event()))
+        self.compile_schema.assert_not_called()
+
+    def test_should_ignore_invalid_schema(self):
+        self._write('instance.update.json', {})
+        validator = self._create()
+        self.assertIsNone(validator.validate(_event('instance.update')))
+
+    def test_should_compile_jsonschema(self):
+        validate = payload_validation.compile_jsonschema(
+            {'type': 'object', 'required': ['nova_object.data']})
+        self.assertIsNone(validate({'nova_object.data': {}}))
+        self.assertIsNotNone(validate({}))
+
+    def test_should_not_validate_when_disabled(self):
+        self.assertIsNone(payload_validation.get_validator())
+
+    @mock.patch('monasca_events_api.app.common.payload_validation.'
+                'jsonschema', None)
+    @mock.patch('monasca_events_api.app.common.producers.'
+                'producer.KafkaProducer')
+    def test_should_fail_without_jsonschema(self, _):
+        self.conf_override(enabled=True, group='payload_validation')
+        self.assertRaises(RuntimeError, events.Events)
+
+
+class TestPayloadValidationOfBody(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestPayloadValidationOfBody, self).setUp()
+        schema_dir = self.useFixture(fixtures.TempDir()).path
+        with open(os.path.join(schema_dir, 'a.json'), 'w') as schema_file:
+            json.dump({'required': ['uuid']}, schema_file)
+        validator = payload_validation.PayloadValidator(
+            schema_dir, 10, compile_schema=_compile_required)
+        self.useFixture(fixtures.MockPatch(
+            'monasca_events_api.app.common.payload_validation.'
+            'get_validator', return_value=validator))
+        self.body = {
+            'timestamp': '2017-06-01T09:15:00Z',
+            'events': [{'project_id': 'p', 'event': _event('a', uuid='u')},
+                       {'project_id': 'p', 'event': _event('a')}]
+        }
+
+    def test_should_reject_bulk_with_invalid_payload(self):
+        ex = self.assertRaises(MultipleInvalid, body_validation.validate_body,
+                               self.body)
+        self.assertEqual(['events', 1, 'event'], ex.path)
+
+    def test_should_reject_invalid_payloads_one_by_one(self):
+        results = bulk_results.BulkResults()
+        body_validation.validate_body(self.body, results)
+
+        events = model.prepare_message_to_sent(self.body, results)
+
+        self.assertIsNone(events[1])
+        self.assertEqual(['accepted', 'rejected'],
+                         [r['status'] for r in
+                          results.to_dict(2)['results']])
@@ -0,0 +1,118 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+
+import mock
+from monasca_common.kafka_lib import protocol
+
+from monasca_events_api.app.common import producers
+from monasca_events_api.tests.unit import base
+
+
+@mock.patch('monasca_events_api.app.common.producers.'
+            'producer.KafkaProducer')
+class TestProducers(base.BaseTestCase):
+
+    def test_should_not_compress_by_default(self, kafka_producer):
+        kafka_lib_producer = kafka_producer.return_value._producer
+        kafka_lib_producer.codec = protocol.CODEC_NONE
+
+        producers.create_producer()
+
+        self.assertEqual(protocol.CODEC_NONE, kafka_lib_producer.codec)
+
+    def test_should_configure_gzip(self, kafka_producer):
+        self.conf_override(compression_codec='gzip',
+                           compression_level=3,
+                           group='events_publisher')
+
+        producers.create_producer()
+
+        kafka_lib_producer = kafka_producer.return_value._producer
+        self.assertEqual(protocol.CODEC_GZIP, kafka_lib_producer.codec)
+        self.assertEqual(3, kafka_lib_producer.codec_compresslevel)
+
+    @mock.patch('monasca_events_api.app.common.producers.'
+                'codec.has_snappy', return_value=False)
+    def test_should_fail_without_snappy(self, _, __):
+        self.conf_override(compression_codec='snappy',
+                           group='events_publisher')
+        self.assertRaises(RuntimeError, producers.create_producer)
+
+
+class TestProducerPool(base.BaseTestCase):
+
+    def test_should_reuse_released_producer(self):
+        factory = mock.Mock(side_effect=lambda: mock.Mock())
+        pool = producers.ProducerPool(factory, size=2, timeout=0)
+
+        with pool.producer() as first:
+            pass
+        with pool.producer() as second:
+            pass
+
+        self.assertIs(first, second)
+        self.assertEqual(1, factory.call_count)
+
+    def test_should_restore_acks_of_released_producer(self):
+        pool = producers.ProducerPool(mock.Mock, size=1, timeout=0,
+                                      on_checkin=producers.reset_acks)
+
+        with pool.producer() as kafka_producer:
+            producers.set_acks(kafka_producer, producers.ACKS_ALL)
+            self.assertEqual(producers.ACKS[producers.ACKS_ALL],
+                             kafka_producer._producer.req_acks)
+
+        self.assertEqual(producers.ACKS['1'],
+                         kafka_producer._producer.req_acks)
+
+    def test_should_time_out_when_exhausted(self):
+        pool = producers.ProducerPool(mock.Mock, size=1, timeout=0.01)
+        with pool.producer():
+            self.assertRaises(producers.ProducerPoolTimeout,
+                              pool._checkout)
+
+    def test_should_discard_producer_after_failure(self):
+        factory = mock.Mock(side_effect=lambda: mock.Mock())
+        pool = producers.ProducerPool(factory, size=1, timeout=0)
+
+        try:
+            with pool.producer() as failed:
+                raise IOError('connection reset')
+        except IOError:
+            pass
+        with pool.producer() as kafka_producer:
+            self.assertIsNot(failed, kafka_producer)
+
+        failed._kafka.close.assert_called_once_with()
+        self.assertEqual(1, pool.size)
+
+    def test_should_release_slot_when_connect_fails(self):
+        pool = producers.ProducerPool(mock.Mock(side_effect=IOError),
+                                      size=1, timeout=0)
+        self.assertRaises(IOError, pool._checkout)
+        self.assertEqual(0, pool.size)
+
+    def test_should_abandon_producers_after_fork(self):
+        pool = producers.ProducerPool(mock.Mock, size=1, timeout=0)
+        with pool.producer() as parent_producer:
+            pass
+
+        with mock.patch.object(os, 'getpid', return_value=-1):
+            with pool.producer() as child_producer:
+                pass
+
+        self.assertIsNot(parent_producer, child_producer)
+        parent_producer._kafka.close.assert_not_called()
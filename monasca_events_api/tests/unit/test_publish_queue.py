@@ -0,0 +1,113 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+
+import falcon
+import mock
+
+from monasca_events_api.app.common import publish_queue
+from monasca_events_api.app.controller.v1 import bulk_processor
+from monasca_events_api.tests.unit import base
+
+
+class TestPublishQueue(base.BaseTestCase):
+
+    def _create_queue(self, publish_func=None, **kwargs):
+        params = {
+            'publish_func': publish_func or mock.Mock(),
+            'max_size': 2,
+            'max_bytes': 100,
+        }
+        params.update(kwargs)
+        queue = publish_queue.PublishQueue(**params)
+        # do not start real workers, bulks remain in the queue
+        queue._ensure_workers = mock.Mock()
+        return queue
+
+    def test_should_track_size_and_bytes(self):
+        queue = self._create_queue()
+        queue.put([b'12345', b'123'])
+        self.assertEqual(1, queue.size)
+        self.assertEqual(8, queue.bytes)
+
+    def test_should_ignore_empty_bulk(self):
+        queue = self._create_queue()
+        queue.put([])
+        self.assertEqual(0, queue.size)
+
+    def test_should_reject_bulk_larger_than_capacity(self):
+        queue = self._create_queue(max_bytes=4)
+        self.assertRaises(publish_queue.QueueFullException,
+                          queue.put, [b'12345'])
+
+    def test_should_reject_when_full(self):
+        queue = self._create_queue()
+        queue.put([b'1'])
+        queue.put([b'2'])
+        self.assertRaises(publish_queue.QueueFullException,
+                          queue.put, [b'3'])
+        self.assertEqual(2, queue.size)
+
+    def test_should_reject_when_byte_budget_exhausted(self):
+        queue = self._create_queue(max_size=10, max_bytes=10)
+        queue.put([b'123456'])
+        self.assertRaises(publish_queue.QueueFullException,
+                          queue.put, [b'123456'])
+
+    def test_should_drop_oldest_when_full(self):
+        queue = self._create_queue(
+            overflow_policy=publish_queue.OVERFLOW_DROP_OLDEST)
+        queue.put([b'1'])
+        queue.put([b'2'])
+        queue.put([b'3'])
+        self.assertEqual(2, queue.size)
+        self.assertEqual(1, queue.dropped)
+        self.assertEqual([b'2'], queue._bulks[0][0])
+
+    def test_should_time_out_when_blocked(self):
+        queue = self._create_queue(
+            overflow_policy=publish_queue.OVERFLOW_BLOCK,
+            block_timeout=0.01)
+        queue.put([b'1'])
+        queue.put([b'2'])
+        self.assertRaises(publish_queue.QueueFullException,
+                          queue.put, [b'3'])
+
+    def test_should_publish_in_background(self):
+        published = threading.Event()
+        publish_func = mock.Mock(side_effect=lambda *args: published.set())
+        queue = publish_queue.PublishQueue(publish_func=publish_func,
+                                           max_size=2,
+                                           max_bytes=100)
+        queue.put([b'1', b'2'], 'key', 'all', ('a',))
+        self.assertTrue(published.wait(5))
+        publish_func.assert_called_once_with([b'1', b'2'], 'key', 'all',
+                                             ('a',))
+
+
+class TestAsyncBulkProcessor(base.BaseTestCase):
+
+    @mock.patch('monasca_events_api.app.common.producers.'
+                'producer.KafkaProducer')
+    def test_should_return_503_when_queue_is_full(self, _):
+        self.conf_override(async_publish=True,
+                           queue_max_size=1,
+                           group='events_publisher')
+        processor = bulk_processor.EventsBulkProcessor()
+        processor._queue._ensure_workers = mock.Mock()
+
+        processor.send_message([{'event_type': 'a'}])
+        self.assertRaises(falcon.HTTPServiceUnavailable,
+                          processor.send_message, [{'event_type': 'b'}])
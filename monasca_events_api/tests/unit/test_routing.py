@@ -0,0 +1,106 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import mock
+
+from monasca_events_api.app.common import routing
+from monasca_events_api.app.controller.v1 import bulk_processor
+from monasca_events_api.tests.unit import base
+
+
+class TestRouter(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestRouter, self).setUp()
+        self.router = routing.create_router(
+            ['monevents'],
+            ['compute:event_type=compute.instance.*',
+             'compute:event_type=compute.metrics.update',
+             'image:event_type=image.*',
+             'audit:project_id=admin',
+             'audit:dimensions.service=identity',
+             'everything:event_type=*'])
+
+    def test_should_list_routed_topics(self):
+        self.assertEqual(['monevents', 'compute', 'image', 'audit',
+                          'everything'], self.router.topics)
+
+    def test_should_route_by_event_type(self):
+        self.assertEqual(('monevents', 'compute', 'everything'),
+                         self.router.route('compute.instance.create.end'))
+        self.assertEqual(('monevents', 'compute', 'everything'),
+                         self.router.route('compute.metrics.update'))
+        self.assertEqual(('monevents', 'image', 'everything'),
+                         self.router.route('image.upload'))
+
+    def test_should_require_segment_after_prefix(self):
+        self.assertEqual(('monevents', 'everything'),
+                         self.router.route('compute.instance'))
+        self.assertEqual(('monevents', 'everything'),
+                         self.router.route('images.upload'))
+
+    def test_should_route_by_project_and_dimensions(self):
+        self.assertEqual(('monevents', 'audit', 'everything'),
+                         self.router.route('x', project_id='admin'))
+        self.assertEqual(('monevents', 'audit', 'everything'),
+                         self.router.route('x', dimensions={
+                             'service': 'identity'}))
+
+    def test_should_not_create_router_without_routes(self):
+        self.assertIsNone(routing.create_router(['monevents'], []))
+
+    def test_should_reject_invalid_routes(self):
+        for route in ('audit', 'audit:event_type', 'audit:host=x',
+                      'audit:event_type=compute.*.end',
+                      'audit:event_type=comp*'):
+            self.assertRaises(ValueError, routing.create_router,
+                              ['monevents'], [route])
+
+
+@mock.patch('monasca_events_api.app.common.producers.'
+            'producer.KafkaProducer')
+class TestRoutedBulkProcessor(base.BaseTestCase):
+
+    def test_should_publish_events_to_routed_topics(self, kafka_producer):
+        self.conf_override(topics=['monevents'],
+                           routes=['compute:event_type=compute.*',
+                                   'image:event_type=image.*'],
+                           group='events_publisher')
+        processor = bulk_processor.EventsBulkProcessor()
+        events = [{'event_type': 'compute.instance.create'},
+                  {'event_type': 'image.upload'},
+                  {'event_type': 'identity.authenticate'}]
+
+        processor.send_message(events, [{'event': e} for e in events])
+
+        published = [(c[0][0], c[0][1]) for c in
+                     kafka_producer.return_value.publish.call_args_list]
+        self.assertEqual(
+            [('monevents', [b'{"event_type": "compute.instance.create"}']),
+             ('compute', [b'{"event_type": "compute.instance.create"}']),
+             ('monevents', [b'{"event_type": "image.upload"}']),
+             ('image', [b'{"event_type": "image.upload"}']),
+             ('monevents', [b'{"event_type": "identity.authenticate"}'])],
+            published)
+
+    def test_should_skip_unrouted_events(self, kafka_producer):
+        self.conf_override(topics=['compute'],
+                           routes=['compute:event_type=compute.*'],
+                           group='events_publisher')
+        processor = bulk_processor.EventsBulkProcessor()
+        events = [{'event_type': 'image.upload'}]
+
+        processor.send_message(events, [{'event': e} for e in events])
+
+        kafka_producer.return_value.publish.assert_not_called()
@@ -0,0 +1,246 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import time
+
+import falcon
+import fixtures
+import mock
+
+from monasca_events_api.app.common import events_publisher
+from monasca_events_api.app.common import spool
+from monasca_events_api.tests.unit import base
+
+
+class TestSpoolRecord(base.BaseTestCase):
+
+    def test_should_encode_and_decode_record(self):
+        record = spool.encode_record([b'{"a":1}', b'', b'xyz'], 'key',
+                                     created=42, topics=('a', 'b'))
+        messages, key, topics, created, next_offset = spool.decode_record(
+            record, 0)
+        self.assertEqual([b'{"a":1}', b'', b'xyz'], messages)
+        self.assertEqual('key', key)
+        self.assertEqual(('a', 'b'), topics)
+        self.assertEqual(42, created)
+        self.assertEqual(len(record), next_offset)
+
+    def test_should_decode_record_without_key(self):
+        record = spool.encode_record([b'{"a":1}'])
+        self.assertIsNone(spool.decode_record(record, 0)[1])
+        self.assertIsNone(spool.decode_record(record, 0)[2])
+
+    def test_should_not_decode_torn_record(self):
+        record = spool.encode_record([b'{"a":1}'])
+        self.assertIsNone(spool.decode_record(record[:-1], 0))
+
+    def test_should_not_decode_corrupted_record(self):
+        record = bytearray(spool.encode_record([b'{"a":1}']))
+        record[-1] ^= 0xff
+        self.assertIsNone(spool.decode_record(bytes(record), 0))
+
+    def test_should_reject_unknown_record_version(self):
+        record = bytearray(spool.encode_record([b'{"a":1}']))
+        record[0] = 0xff
+        self.assertRaises(spool.UnknownRecordVersionException,
+                          spool.decode_record, bytes(record), 0)
+
+
+class TestSpool(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestSpool, self).setUp()
+        self.directory = self.useFixture(fixtures.TempDir()).path
+        self.publish_func = mock.Mock()
+
+    def _create_spool(self, **kwargs):
+        s = spool.Spool(self.directory, self.publish_func, **kwargs)
+        s._start_drainer = mock.Mock()
+        return s
+
+    def _drain(self, s):
+        while s.has_pending():
+            if not s._replay_next():
+                break
+
+    def test_should_replay_in_order(self):
+        s = self._create_spool()
+        s.append([b'1'])
+        s.append([b'2', b'3'], 'key', ('a',))
+        self.assertTrue(s.has_pending())
+
+        self._drain(s)
+
+        self.assertFalse(s.has_pending())
+        self.assertEqual([mock.call([b'1'], None, None),
+                          mock.call([b'2', b'3'], 'key', ('a',))],
+                         self.publish_func.call_args_list)
+
+    def test_should_retry_after_failure(self):
+        s = self._create_spool()
+        s.append([b'1'])
+        self.publish_func.side_effect = [Exception('down'), None]
+
+        self.assertFalse(s._replay_next())
+        self.assertTrue(s.has_pending())
+        self.assertTrue(s._replay_next())
+        self.assertFalse(s.has_pending())
+
+    @mock.patch('monasca_events_api.app.common.spool.time.sleep')
+    def test_should_keep_draining_after_error(self, sleep):
+        class _Stop(BaseException):
+            pass
+
+        s = self._create_spool(retry_interval=7)
+        s.append([b'1'])
+        errors = [OSError('io')]
+        read_next = s._read_next
+
+        def _read_next():
+            if errors:
+                raise errors.pop()
+            return read_next()
+
+        s._read_next = _read_next
+        self.publish_func.side_effect = _Stop
+
+        self.assertRaises(_Stop, s._drain)
+
+        sleep.assert_called_once_with(7)
+        self.publish_func.assert_called_once_with([b'1'], None, None)
+
+    def test_should_roll_and_remove_segments(self):
+        s = self._create_spool(segment_size=64)
+        for i in range(5):
+            s.append([b'x' * 30])
+        self.assertEqual(5, len(s._segments))
+
+        self._drain(s)
+
+        self.assertEqual(5, self.publish_func.call_count)
+        self.assertEqual(1, len(s._segments))
+
+    def test_should_reject_when_full(self):
+        s = self._create_spool(max_bytes=100)
+        s.append([b'x' * 50])
+        self.assertRaises(spool.SpoolFullException,
+                          s.append, [b'x' * 50])
+
+    def test_should_discard_old_records(self):
+        s = self._create_spool(max_age=1)
+        s.append([b'1'])
+        with mock.patch('time.time', return_value=time.time() + 10):
+            self.assertTrue(s._replay_next())
+        self.assertEqual(1, s.discarded)
+        self.assertFalse(self.publish_func.called)
+
+    def test_should_recover_after_crash(self):
+        s = self._create_spool()
+        s.append([b'1'])
+        s.append([b'2'])
+        s.append([b'3'])
+        self.assertTrue(s._replay_next())
+        segment_path = s._segment_path(s._segments[-1])
+        s._writer.close()
+        os.close(s._lock_fd)
+        with open(segment_path, 'ab') as f:
+            f.write(spool.encode_record([b'torn'])[:-3])
+
+        recovered = self._create_spool()
+        self._drain(recovered)
+
+        self.assertEqual([mock.call([b'1'], None, None),
+                          mock.call([b'2'], None, None),
+                          mock.call([b'3'], None, None)],
+                         self.publish_func.call_args_list)
+
+    def test_should_claim_separate_directories(self):
+        first = self._create_spool(max_workers=2)
+        second = self._create_spool(max_workers=2)
+        first.has_pending()
+        second._claim()
+        self.assertNotEqual(first._path, second._path)
+        third = self._create_spool(max_workers=2)
+        self.assertRaises(spool.SpoolFullException, third._claim)
+
+    def test_should_replay_orphaned_directories(self):
+        orphan = os.path.join(self.directory, '5')
+        os.makedirs(orphan)
+        with open(os.path.join(orphan, '%020d.seg' % 0), 'wb') as f:
+            f.write(spool.encode_record([b'1']))
+            f.write(spool.encode_record([b'2'], 'key', topics=('a',)))
+        s = self._create_spool(max_workers=2)
+        self.assertFalse(s.has_pending())
+
+        s._drain_orphans()
+
+        self.assertEqual([mock.call([b'1'], None, None),
+                          mock.call([b'2'], 'key', ('a',))],
+                         self.publish_func.call_args_list)
+        s._drain_orphans()
+        self.assertEqual(2, self.publish_func.call_count)
+
+
+@mock.patch('monasca_events_api.app.common.producers.'
+            'producer.KafkaProducer')
+class TestSpoolingPublisher(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestSpoolingPublisher, self).setUp()
+        directory = self.useFixture(fixtures.TempDir()).path
+        self.conf_override(enabled=True, directory=directory, group='spool')
+
+    def test_should_spool_when_kafka_unavailable(self, kafka_producer):
+        kafka_producer.return_value.publish.side_effect = Exception('down')
+        publisher = events_publisher.EventPublisher()
+        publisher._spool._start_drainer = mock.Mock()
+
+        publisher.send_message({'event_type': 'x'})
+        self.assertTrue(publisher._spool.has_pending())
+
+        # keep order, do not bypass spool while it is not empty
+        kafka_producer.return_value.publish.side_effect = None
+        publisher.send_message({'event_type': 'y'})
+        self.assertEqual(1, kafka_producer.return_value.publish.call_count)
+
+        while publisher._spool.has_pending():
+            publisher._spool._replay_next()
+        published = [c[0][1] for c in
+                     kafka_producer.return_value.publish.call_args_list[1:]]
+        self.assertEqual([[b'{"event_type": "x"}'],
+                          [b'{"event_type": "y"}']], published)
+
+    @mock.patch('monasca_events_api.app.common.spool.Spool._claim',
+                side_effect=spool.SpoolFullException('no directory'))
+    def test_should_publish_when_spool_unavailable(self, _, kafka_producer):
+        publisher = events_publisher.EventPublisher()
+        publisher._spool._start_drainer = mock.Mock()
+
+        publisher.send_message({'event_type': 'x'})
+        kafka_producer.return_value.publish.assert_called_once_with(
+            'monevents', [b'{"event_type": "x"}'], None)
+
+        kafka_producer.return_value.publish.side_effect = Exception('down')
+        self.assertRaises(falcon.HTTPServiceUnavailable,
+                          publisher.send_message, {'event_type': 'y'})
+
+    def test_should_return_503_when_spool_full(self, kafka_producer):
+        self.conf_override(max_bytes=1024, group='spool')
+        kafka_producer.return_value.publish.side_effect = Exception('down')
+        publisher = events_publisher.EventPublisher()
+        publisher._spool._start_drainer = mock.Mock()
+
+        self.assertRaises(falcon.HTTPServiceUnavailable,
+                          publisher.send_message, {'x': 'y' * 2048})
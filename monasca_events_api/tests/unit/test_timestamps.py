@@ -0,0 +1,59 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+
+import mock
+
+from monasca_events_api.app.common import timestamps
+from monasca_events_api.tests.unit import base
+
+
+class TestTimestamps(base.BaseTestCase):
+
+    def test_should_normalize_to_utc(self):
+        for value, normalized, epoch_ms in (
+                ('1970-01-01T00:00:00Z', '1970-01-01T00:00:00.000Z', 0),
+                ('2017-06-01T09:15:00', '2017-06-01T09:15:00.000Z',
+                 1496308500000),
+                ('2017-06-01 09:15:00.1239+0000',
+                 '2017-06-01T09:15:00.123Z', 1496308500123),
+                ('2017-06-01T00:15:00-01:30', '2017-06-01T01:45:00.000Z',
+                 1496281500000),
+                ('2012-10-29T13:42:11+0200', '2012-10-29T11:42:11.000Z',
+                 1351510931000),
+                ('2012-10-29T13:42:11Z+0200', '2012-10-29T11:42:11.000Z',
+                 1351510931000)):
+            self.assertEqual((normalized, epoch_ms),
+                             timestamps.parse(value))
+
+    def test_should_reject_invalid_timestamps(self):
+        for value in ('t', '2017-06-01', '2017-02-29T09:15:00Z',
+                      '2017-06-01T24:00:00Z', '2017-06-01T09:15:00Zulu',
+                      '0001-01-01T00:00:00+0100', 1496308500, None):
+            self.assertRaises(ValueError, timestamps.parse, value)
+
+    @mock.patch('monasca_events_api.app.common.timestamps._CACHE',
+                collections.OrderedDict())
+    @mock.patch('monasca_events_api.app.common.timestamps._CACHE_SIZE', 2)
+    def test_should_parse_recent_timestamps_once(self):
+        values = ['2017-06-01T09:15:0%dZ' % i for i in range(3)]
+        with mock.patch.object(timestamps, '_parse',
+                               wraps=timestamps._parse) as parse:
+            for value in values[:2] + values[:1] * 3 + values[2:]:
+                timestamps.parse(value)
+            self.assertEqual(3, parse.call_count)
+            # the least recently used one has been forgotten
+            timestamps.parse(values[1])
+            self.assertEqual(4, parse.call_count)
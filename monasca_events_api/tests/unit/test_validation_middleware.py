@@ -19,8 +19,9 @@ from monasca_events_api.tests.unit import base
 
 
 class FakeRequest(object):
-    def __init__(self, content=None, length=0):
+    def __init__(self, content=None, length=0, encoding=None):
         self.content_type = content if content else None
+        self.headers = {'Content-Encoding': encoding} if encoding else {}
         self.content_length = (length if length is not None and length > 0
                                else None)
 
@@ -45,3 +46,17 @@ class TestValidation(base.BaseTestCase):
         self.assertRaises(falcon.HTTPUnsupportedMediaType,
                           vm._validate_content_type,
                           req)
+
+    def test_should_validate_supported_content_encoding(self):
+        for encoding in (None, 'identity', 'gzip', 'deflate'):
+            vm._validate_content_encoding(FakeRequest(encoding=encoding))
+
+    def test_should_fail_unsupported_content_encoding(self):
+        req = FakeRequest(encoding='br')
+        self.assertRaises(falcon.HTTPUnsupportedMediaType,
+                          vm._validate_content_encoding,
+                          req)
+
+    def test_should_validate_ndjson_content_type(self):
+        req = FakeRequest('application/x-ndjson')
+        vm._validate_content_type(req)
@@ -0,0 +1,72 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compares binary content types with JSON request bodies.
+
+For JSON (every installed codec of [serialization]json_codec),
+application/msgpack and application/cbor benchmark reports size of the
+request body and how many events per second can be decoded out of it,
+using the sample notifications.
+
+Usage::
+
+    tox -e venv -- python tools/benchmarks/binary_codecs.py
+"""
+
+import argparse
+import json
+
+import corpus
+
+from monasca_events_api.app.common import binary_codec
+from monasca_events_api.app.common import json_codec
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--bulk-size', type=int, default=100,
+                        help='Number of events in request body')
+    parser.add_argument('--repeat', type=int, default=50,
+                        help='How many times each body is decoded')
+    args = parser.parse_args()
+
+    body = corpus.create_bulk(args.bulk_size)
+    raw_body = json.dumps(body).encode('utf-8')
+    total = args.bulk_size * args.repeat
+
+    print('Bulk of %d events' % args.bulk_size)
+    print('%-20s %12s %16s' % ('content type', 'body bytes', 'decode ev/s'))
+    for name in ('json', 'orjson', 'ujson', 'rapidjson'):
+        codec = json_codec.get_codec(name)
+        if codec.name != name:
+            continue
+        decode, _ = corpus.measure(lambda: codec.loads(raw_body),
+                                   args.repeat)
+        print('%-20s %12d %16d' % ('json (%s)' % name, len(raw_body),
+                                   total / decode))
+
+    for content_type in binary_codec.CONTENT_TYPES:
+        codec = binary_codec.get_codec(content_type)
+        if codec is None:
+            print('%-20s %12s' % (content_type, 'not installed'))
+            continue
+        encoded = codec.dumps(body)
+        decode, _ = corpus.measure(lambda: codec.loads(encoded),
+                                   args.repeat)
+        print('%-20s %12d %16d' % (content_type, len(encoded),
+                                   total / decode))
+
+
+if __name__ == '__main__':
+    main()
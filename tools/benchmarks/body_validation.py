@@ -0,0 +1,74 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compares body validation with equivalent voluptuous schema.
+
+For bulks of 1, 100 and 10000 sample notifications benchmark reports
+how many bodies per second are validated by
+:py:func:`body_validation.validate_body` and by voluptuous schema
+checking the same envelope requirements.
+
+Usage::
+
+    tox -e venv -- python tools/benchmarks/body_validation.py
+"""
+
+import argparse
+
+import six
+from voluptuous import All
+from voluptuous import Any
+from voluptuous import Extra
+from voluptuous import Required
+from voluptuous import Schema
+
+import corpus
+
+from monasca_events_api.app.controller.v1 import body_validation
+
+_STRING = Any(*six.string_types)
+
+VOLUPTUOUS_SCHEMA = Schema({
+    Required('timestamp'): _STRING,
+    Required('events'): [All({
+        Required('event'): dict,
+        Required('project_id'): _STRING,
+        'dimensions': Any(None, {_STRING: _STRING}),
+        Extra: object
+    })]
+})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--events', type=int, default=100000,
+                        help='Number of events validated per bulk size')
+    args = parser.parse_args()
+
+    print('%-10s %16s %16s %8s' % ('bulk size', 'voluptuous ev/s',
+                                   'compiled ev/s', 'speedup'))
+    for size in (1, 100, 10000):
+        body = corpus.create_bulk(size)
+        repeat = max(1, args.events // size)
+        total = size * repeat
+        schema, _ = corpus.measure(lambda: VOLUPTUOUS_SCHEMA(body), repeat)
+        compiled, _ = corpus.measure(
+            lambda: body_validation.validate_body(body), repeat)
+        print('%-10d %16d %16d %7.1fx' % (size, total / schema,
+                                          total / compiled,
+                                          schema / compiled))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compares compression codecs applied to batches of events.
+
+For every codec supported by ``[events_publisher]compression_codec``
+benchmark reports the number of bytes kafka message set takes on the
+wire and the CPU time needed to build it. lz4 and zstd are reported
+for reference only, if respective libraries are installed, since the
+kafka protocol implementation used by the producer does not support
+them.
+
+Usage::
+
+    tox -e venv -- python tools/benchmarks/compression_codecs.py
+"""
+
+import argparse
+
+from monasca_common.kafka_lib import codec
+from monasca_common.kafka_lib import protocol
+
+import corpus
+
+from monasca_events_api.app.common import json_codec
+from monasca_events_api.app.core import model
+
+
+def _message_set(messages, codec_id, compresslevel=None):
+    message_set = protocol.create_message_set(
+        [(m, None) for m in messages], codec_id, None, compresslevel)
+    return protocol.KafkaProtocol._encode_message_set(message_set)
+
+
+def _codecs():
+    codecs = [('none', lambda m: _message_set(m, protocol.CODEC_NONE))]
+    for level in (1, 6, 9):
+        codecs.append(('gzip-%d' % level,
+                       lambda m, lvl=level: _message_set(
+                           m, protocol.CODEC_GZIP, lvl)))
+    if codec.has_snappy():
+        codecs.append(('snappy',
+                       lambda m: _message_set(m, protocol.CODEC_SNAPPY)))
+    try:
+        import lz4.frame
+        codecs.append(('lz4 (reference)',
+                       lambda m: lz4.frame.compress(
+                           _message_set(m, protocol.CODEC_NONE))))
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        compressor = zstandard.ZstdCompressor()
+        codecs.append(('zstd (reference)',
+                       lambda m: compressor.compress(
+                           _message_set(m, protocol.CODEC_NONE))))
+    except ImportError:
+        pass
+    return codecs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--bulk-size', type=int, default=100,
+                        help='Number of events in produced batch')
+    parser.add_argument('--repeat', type=int, default=50,
+                        help='How many times each batch is compressed')
+    args = parser.parse_args()
+
+    body = corpus.create_bulk(args.bulk_size)
+    encoder = json_codec.get_codec('json')
+    messages = [m.serialize(encoder)
+                for m in model.prepare_message_to_sent(body)]
+    raw_size = sum(len(m) for m in messages)
+
+    print('Batch of %d events, %d bytes of JSON'
+          % (args.bulk_size, raw_size))
+    print('%-18s %12s %8s %16s' % ('codec', 'wire bytes', 'ratio',
+                                   'cpu ms / batch'))
+    for name, encode in _codecs():
+        wire_size = len(encode(messages))
+        _, cpu = corpus.measure(lambda: encode(messages), args.repeat)
+        print('%-18s %12d %8.2f %16.3f' % (name, wire_size,
+                                           float(raw_size) / wire_size,
+                                           cpu * 1000 / args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Representative notification corpus shared by the benchmarks.
+
+Corpus is built out of the versioned notifications kept in
+``doc/api-samples/v1``.
+"""
+
+import glob
+import json
+import os
+import time
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           os.pardir, os.pardir, 'doc', 'api-samples', 'v1')
+
+try:
+    cpu_time = time.process_time
+except AttributeError:  # python 2
+    cpu_time = time.clock
+
+
+def load_samples(samples_dir=SAMPLES_DIR):
+    """Loads request bodies of all samples.
+
+    :return: list of decoded request bodies
+    """
+    bodies = []
+    for path in sorted(glob.glob(os.path.join(samples_dir, '*.json'))):
+        with open(path) as f:
+            body = json.load(f)
+        if body.get('events'):
+            bodies.append(body)
+    return bodies
+
+
+def create_bulk(size, samples_dir=SAMPLES_DIR):
+    """Creates request body with given number of events.
+
+    Events of the samples are repeated until bulk reaches requested size.
+
+    :param int size: number of events in the bulk
+    :return: request body
+    :rtype: dict
+    """
+    envelopes = []
+    for body in load_samples(samples_dir):
+        envelopes.extend(body['events'])
+    timestamp = load_samples(samples_dir)[0]['timestamp']
+    return {
+        'timestamp': timestamp,
+        'events': [envelopes[i % len(envelopes)] for i in range(size)]
+    }
+
+
+def measure(func, repeat):
+    """Measures wall and cpu time of func called repeat times.
+
+    :return: tuple of wall and cpu time in seconds
+    """
+    wall_start, cpu_start = time.time(), cpu_time()
+    for _ in range(repeat):
+        func()
+    return time.time() - wall_start, cpu_time() - cpu_start
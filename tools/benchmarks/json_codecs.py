@@ -0,0 +1,70 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compares JSON codecs available for [serialization]json_codec.
+
+For every installed codec benchmark reports how many events per second
+can be decoded out of request body and encoded as kafka messages,
+using the sample notifications.
+
+Usage::
+
+    tox -e venv -- python tools/benchmarks/json_codecs.py
+"""
+
+import argparse
+import json
+
+import corpus
+
+from monasca_events_api.app.common import json_codec
+from monasca_events_api.app.core import model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--bulk-size', type=int, default=100,
+                        help='Number of events in request body')
+    parser.add_argument('--repeat', type=int, default=50,
+                        help='How many times each body is processed')
+    args = parser.parse_args()
+
+    body = corpus.create_bulk(args.bulk_size)
+    raw_body = json.dumps(body).encode('utf-8')
+    events = model.prepare_message_to_sent(body)
+    total = args.bulk_size * args.repeat
+
+    print('Bulk of %d events, %d bytes' % (args.bulk_size, len(raw_body)))
+    print('%-10s %16s %16s %16s' % ('codec', 'decode ev/s', 'encode ev/s',
+                                    'both ev/s'))
+    for name in ('json', 'orjson', 'ujson', 'rapidjson'):
+        codec = json_codec.get_codec(name)
+        if codec.name != name:
+            print('%-10s %16s' % (name, 'not installed'))
+            continue
+
+        def _encode():
+            for event in events:
+                event.serialize(codec)
+
+        decode, _ = corpus.measure(lambda: codec.loads(raw_body),
+                                   args.repeat)
+        encode, _ = corpus.measure(_encode, args.repeat)
+        print('%-10s %16d %16d %16d' % (name, total / decode,
+                                        total / encode,
+                                        total / (decode + encode)))
+
+
+if __name__ == '__main__':
+    main()
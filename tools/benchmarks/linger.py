@@ -0,0 +1,108 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Measures throughput of small bulks merged by the coalescer.
+
+Concurrent clients keep sending bulks of a few events. Every produce
+request takes fixed round trip time, as it does when talking to the
+broker, and the producer serves one request at a time. Benchmark
+reports events published per second and number of produce requests
+without merging and with merging for given linger values.
+
+Usage::
+
+    tox -e venv -- python tools/benchmarks/linger.py
+"""
+
+import argparse
+import threading
+import time
+
+import corpus
+
+from monasca_events_api.app.common import coalescer
+from monasca_events_api.app.common import json_codec
+from monasca_events_api.app.core import model
+
+
+class _Broker(object):
+
+    def __init__(self, round_trip):
+        self.round_trip = round_trip
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def publish(self, messages, key=None, acks=None, topics=None):
+        with self._lock:
+            self.requests += 1
+            time.sleep(self.round_trip)
+
+
+def _run(publish, bulk, clients, duration):
+    stop = time.time() + duration
+    sent = [0] * clients
+
+    def client(index):
+        while time.time() < stop:
+            publish(bulk)
+            sent[index] += len(bulk)
+
+    threads = [threading.Thread(target=client, args=(i,))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(sent) / float(duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--bulk-size', type=int, default=2,
+                        help='Number of events in each bulk')
+    parser.add_argument('--clients', type=int, default=32,
+                        help='Number of concurrent clients')
+    parser.add_argument('--round-trip', type=float, default=2.0,
+                        help='Duration (in ms) of each produce request')
+    parser.add_argument('--duration', type=float, default=3.0,
+                        help='Duration (in s) of each run')
+    parser.add_argument('--linger', type=int, nargs='+', default=[1, 5],
+                        help='Linger values (in ms) to measure')
+    parser.add_argument('--max-batch-bytes', type=int, default=256 * 1024,
+                        help='Size of batches published without lingering')
+    args = parser.parse_args()
+
+    encoder = json_codec.get_codec('json')
+    bulk = [m.serialize(encoder) for m in
+            model.prepare_message_to_sent(corpus.create_bulk(
+                args.bulk_size))]
+
+    print('%d clients sending bulks of %d events, %.1f ms round trip'
+          % (args.clients, args.bulk_size, args.round_trip))
+    print('%-12s %14s %18s' % ('linger ms', 'events / s', 'events / request'))
+    for linger in [0] + args.linger:
+        broker = _Broker(args.round_trip / 1000.0)
+        if linger:
+            publish = coalescer.Coalescer(broker.publish, linger / 1000.0,
+                                          args.max_batch_bytes).submit
+        else:
+            publish = broker.publish
+        throughput = _run(publish, bulk, args.clients, args.duration)
+        print('%-12d %14.0f %18.1f'
+              % (linger, throughput,
+                 throughput * args.duration / max(broker.requests, 1)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# Copyright 2017 FUJITSU LIMITED
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compares attaching the timestamp by copying events with event views.
+
+For bulks of 1, 100 and 10000 sample notifications benchmark reports
+how many events per second are prepared and serialized when each event
+is copied and updated with the timestamp of the bulk, and when it is
+wrapped in :py:class:`model.TimestampedEvent`. Peak memory allocated
+while preparing a bulk is reported if tracemalloc is available.
+
+Usage::
+
+    tox -e venv -- python tools/benchmarks/prepare_events.py
+"""
+
+import argparse
+
+try:
+    import tracemalloc
+except ImportError:  # python 2
+    tracemalloc = None
+
+import corpus
+
+from monasca_events_api.app.common import json_codec
+from monasca_events_api.app.core import model
+
+
+def copy_events(body):
+    timestamp = body['timestamp']
+    final_body = []
+    for events in body['events']:
+        ev = events['event'].copy()
+        ev.update({'timestamp': timestamp})
+        final_body.append(ev)
+    return final_body
+
+
+def peak_memory(func, body):
+    if tracemalloc is None:
+        return 0
+    tracemalloc.start()
+    messages = func(body)  # noqa
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--events', type=int, default=100000,
+                        help='Number of events prepared per bulk size')
+    parser.add_argument('--rounds', type=int, default=5,
+                        help='How many times each variant is measured')
+    parser.add_argument('--codec', default='json',
+                        help='JSON codec serializing events')
+    args = parser.parse_args()
+    codec = json_codec.get_codec(args.codec)
+
+    def _copied(body):
+        for message in copy_events(body):
+            codec.dumps(message)
+
+    def _viewed(body):
+        for message in model.prepare_message_to_sent(body):
+            message.serialize(codec)
+
+    print('Codec %s' % codec.name)
+    print('%-10s %14s %14s %8s %14s %14s' % ('bulk size', 'copy ev/s',
+                                             'view ev/s', 'speedup',
+                                             'copy peak kB',
+                                             'view peak kB'))
+    for size in (1, 100, 10000):
+        body = corpus.create_bulk(size)
+        repeat = max(1, args.events // size)
+        total = size * repeat
+        # best of rounds alternating both, to even out noise
+        copied = viewed = float('inf')
+        for _ in range(args.rounds):
+            copied = min(copied,
+                         corpus.measure(lambda: _copied(body), repeat)[0])
+            viewed = min(viewed,
+                         corpus.measure(lambda: _viewed(body), repeat)[0])
+        print('%-10d %14d %14d %7.2fx %14d %14d' % (
+            size, total / copied, total / viewed, copied / viewed,
+            peak_memory(copy_events, body) // 1024,
+            peak_memory(model.prepare_message_to_sent, body) // 1024))
+
+
+if __name__ == '__main__':
+    main()